@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from jobs import load_jobs, validate_job
+from logs import LOG_FORMATS, LOG_LEVELS, configure_logging, get_logger, job_context
+from pipeline import drain, job_records, open_sink
+
+log = get_logger("async_engine")
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter for asyncio code.
+
+    Allows bursts of up to capacity requests and refills at rate tokens per
+    second. pause() stops handing out tokens for a while, e.g. when the host
+    answers with Retry-After.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds):
+        """Hand out no tokens for the next seconds."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+
+    Attempt n (starting at 1) waits a random time between 0 and
+    min(max_delay, base_delay * 2 ** (n - 1)), or the server's Retry-After
+    if that is longer.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Seconds to wait before the next attempt.
+
+        Args:
+            attempt (int): Number of the attempt that just failed
+            retry_after (float, optional): Seconds requested by the server
+
+        Returns:
+            float: Delay in seconds
+        """
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            return max(backoff, retry_after)
+        return backoff
+
+
+def parse_retry_after(value):
+    """
+    Convert a Retry-After header value to seconds.
+
+    Args:
+        value (str): Either a number of seconds or an HTTP date
+
+    Returns:
+        float or None: Seconds to wait, or None if the value can't be parsed
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_retryable(data):
+    """
+    Decide whether a failed result is worth another attempt.
+
+    The HTTP backend and the browser scraper mark their errors with
+    "retryable"; input the site rejected is not retried. Older results
+    without the flag are judged by their error message.
+    """
+    if "retryable" in data:
+        return data["retryable"]
+    return not str(data.get("error", "")).startswith("Alert interrupted")
+
+
+class HttpJobRunner:
+    """Runs jobs with the direct HTTP backend over one pooled session."""
+
+    def __init__(self, endpoint=None, pool_size=10):
+        from http_backend import SWI_DATA_ENDPOINT, create_http_session
+
+        self.endpoint = endpoint or SWI_DATA_ENDPOINT
+        self.host = urlparse(self.endpoint).netloc
+        self.session = create_http_session(pool_size=pool_size)
+
+    def __call__(self, job):
+        from http_backend import fetch_soil_wetness_data
+
+        with job_context(job_id=job.get("job_id"), longitude=job["longitude"], latitude=job["latitude"]):
+            return fetch_soil_wetness_data(job["longitude"], job["latitude"], job["start_date"], job["end_date"],
+                                           session=self.session, endpoint=self.endpoint)
+
+    def close(self):
+        self.session.close()
+
+
+class BrowserJobRunner:
+    """Runs jobs in pooled Chrome sessions from a DriverManager."""
+
+    def __init__(self, pool_size=2, recycle_after=50, capture=None, browser_profile="default"):
+        from driver_manager import SWI_URL, DriverManager
+
+        self.host = urlparse(SWI_URL).netloc
+        self.manager = DriverManager(max_sessions=pool_size, max_jobs_per_session=recycle_after,
+                                     browser_profile=browser_profile)
+        self.capture = capture
+
+    def __call__(self, job):
+        from scrape_mosdac import scrape_soil_wetness_data
+
+        with job_context(job_id=job.get("job_id"), longitude=job["longitude"], latitude=job["latitude"]):
+            # The scraper takes its browser from the manager, so it can replace one that dies mid-query
+            return scrape_soil_wetness_data(job["longitude"], job["latitude"], job["start_date"], job["end_date"],
+                                            driver_manager=self.manager, capture=self.capture)
+
+    def close(self):
+        self.manager.shutdown()
+
+
+class AsyncScrapeEngine:
+    """
+    Runs many scraping jobs concurrently on an asyncio event loop.
+
+    Each job runs in a worker thread (both backends are blocking), with at
+    most concurrency jobs in flight. Requests to each host pass through a
+    token bucket, and failed jobs are retried with exponential backoff and
+    jitter, honouring Retry-After when the server sends it.
+
+        engine = AsyncScrapeEngine(HttpJobRunner(), concurrency=8, rate_per_host=2)
+        async for result in engine.run(jobs):
+            ...
+    """
+
+    def __init__(self, runner, concurrency=4, rate_per_host=1.0, burst=None, retry=None):
+        self.runner = runner
+        self.concurrency = concurrency
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.retry = retry or RetryPolicy()
+        self._buckets = {}
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def _bucket(self, host):
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate_per_host, self.burst)
+        return self._buckets[host]
+
+    async def _run_job(self, job):
+        started = time.perf_counter()
+        problem = validate_job(job)
+        if problem:
+            return {"job": job, "status": "invalid", "error": problem, "attempts": 0, "elapsed_seconds": 0.0}
+
+        loop = asyncio.get_running_loop()
+        bucket = self._bucket(self.runner.host)
+        attempt = 0
+        while True:
+            attempt += 1
+            await bucket.acquire()
+            try:
+                data = await loop.run_in_executor(self._executor, self.runner, job)
+            except Exception as e:
+                data = {"error": str(e)}
+
+            if "error" not in data:
+                status = "ok"
+                break
+            if attempt >= self.retry.max_attempts or not is_retryable(data):
+                status = "error"
+                break
+
+            retry_after = parse_retry_after(data.get("retry_after"))
+            if retry_after:
+                bucket.pause(retry_after)
+            delay = self.retry.delay(attempt, retry_after)
+            with job_context(job_id=job.get("job_id"), longitude=job["longitude"], latitude=job["latitude"]):
+                log.warning(f"Job failed ({data['error']}), retrying in {delay:.1f}s",
+                            extra={"fields": {"attempt": attempt, "retry_in_seconds": round(delay, 3)}})
+            await asyncio.sleep(delay)
+
+        result = {"job": job, "status": status, "attempts": attempt,
+                  "elapsed_seconds": round(time.perf_counter() - started, 3), "data": data}
+        if status == "error":
+            result["error"] = data["error"]
+        return result
+
+    async def run(self, jobs):
+        """
+        Run jobs and yield their results as they finish.
+
+        Args:
+            jobs (iterable): Job dicts (see jobs.load_jobs)
+
+        Yields:
+            dict: Result with job, status, attempts, elapsed_seconds and data
+        """
+        pending = asyncio.Queue()
+        results = asyncio.Queue()
+        count = 0
+        for job in jobs:
+            pending.put_nowait(job)
+            count += 1
+
+        async def worker():
+            while True:
+                try:
+                    job = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    result = await self._run_job(job)
+                except Exception as e:
+                    result = {"job": job, "status": "error", "error": str(e), "attempts": 0}
+                await results.put(result)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, count))]
+        try:
+            for _ in range(count):
+                yield await results.get()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def close(self):
+        """Stop the worker threads and release the backend's sessions."""
+        self._executor.shutdown(wait=True)
+        self.runner.close()
+
+
+async def _collect(engine, jobs, output_path=None, sinks=()):
+    counts = {}
+    started = time.perf_counter()
+    out = open(output_path, "a", encoding="utf-8") if output_path else None
+    try:
+        async for result in engine.run(jobs):
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            if out:
+                record = dict(result["job"])
+                record.update({k: v for k, v in result.items() if k != "job"})
+                out.write(json.dumps(record) + "\n")
+            drain(job_records(result["job"], result), sinks)
+    finally:
+        if out:
+            out.close()
+    elapsed = time.perf_counter() - started
+    return {"jobs": sum(counts.values()), "by_status": counts, "elapsed_seconds": round(elapsed, 3),
+            "jobs_per_second": round(sum(counts.values()) / elapsed, 2) if elapsed else None}
+
+
+def run_self_test(job_count=500, concurrency=16, rate=1000.0, latency=0.0):
+    """
+    Measure sustained jobs/second of the HTTP path against a local fake server.
+
+    Args:
+        job_count (int): Number of jobs to run
+        concurrency (int): Jobs in flight at once
+        rate (float): Token bucket rate for the local host
+        latency (float): Seconds the fake server waits before answering
+
+    Returns:
+        dict: Job counts by status, elapsed seconds and jobs per second
+    """
+    from replay_server import ReplayServer
+
+    body = json.dumps({"dates": ["2023-01-01", "2023-01-02"], "values": [0.31, 0.33]})
+    recordings = [{"method": "POST", "path": "/swi/timeseries", "latency": latency,
+                   "headers": {"Content-Type": "application/json"}, "body": body}]
+    jobs = [{"job_id": str(i), "longitude": "77.88", "latitude": "23.47",
+             "start_date": "01/01/2023", "end_date": "02/01/2023"} for i in range(job_count)]
+
+    with ReplayServer(recordings) as server:
+        runner = HttpJobRunner(endpoint=server.url + "/swi/timeseries", pool_size=concurrency)
+        engine = AsyncScrapeEngine(runner, concurrency=concurrency, rate_per_host=rate, burst=concurrency)
+        try:
+            return asyncio.run(_collect(engine, jobs))
+        finally:
+            engine.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scraping jobs concurrently with rate limiting and retries.")
+    parser.add_argument("jobs_file", nargs="?", help="CSV or JSONL file with longitude, latitude, start_date, end_date")
+    parser.add_argument("--backend", choices=("http", "browser"), default="http")
+    parser.add_argument("--endpoint", metavar="URL",
+                        help="SWI data endpoint for the http backend (e.g. a replay_server.py URL)")
+    parser.add_argument("--browser-profile", choices=("default", "fast"), default="default",
+                        help="Chrome settings for the browser backend")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Maximum jobs in flight")
+    parser.add_argument("--rate", type=float, default=1.0, help="Requests per second allowed per host")
+    parser.add_argument("--max-attempts", type=int, default=4, help="Attempts per job before giving up")
+    parser.add_argument("-o", "--output", default="async_results.jsonl", help="JSONL file to append results to")
+    parser.add_argument("--sink", action="append", default=[], metavar="TARGET",
+                        help="Stream observations and job records to a .csv, .sqlite, .jsonl or .parquet "
+                             "target, or - for stdout (repeatable)")
+    parser.add_argument("--self-test", action="store_true",
+                        help="Measure jobs/second against a local fake server instead of the live site")
+    parser.add_argument("--self-test-jobs", type=int, default=500)
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="info",
+                        help="Least severe log records to write to stderr")
+    parser.add_argument("--log-format", choices=LOG_FORMATS, default="json",
+                        help="Write log records as JSON lines or plain text")
+    args = parser.parse_args()
+    configure_logging(args.log_level, args.log_format)
+
+    if args.self_test:
+        print(json.dumps(run_self_test(args.self_test_jobs, args.concurrency, max(args.rate, 1000.0))))
+        return
+    if not args.jobs_file:
+        parser.error("jobs_file is required unless --self-test is given")
+
+    if args.backend == "http":
+        runner = HttpJobRunner(endpoint=args.endpoint, pool_size=args.concurrency)
+    else:
+        runner = BrowserJobRunner(pool_size=args.concurrency, browser_profile=args.browser_profile)
+    engine = AsyncScrapeEngine(runner, concurrency=args.concurrency, rate_per_host=args.rate,
+                               retry=RetryPolicy(max_attempts=args.max_attempts))
+    sinks = [open_sink(target) for target in args.sink]
+    try:
+        summary = asyncio.run(_collect(engine, load_jobs(args.jobs_file), args.output, sinks))
+    finally:
+        engine.close()
+        for sink in sinks:
+            sink.close()
+    print(f"Finished: {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+import argparse
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from capture import CAPTURE_MODES, CapturePolicy
+from chunking import CHUNK_SIZES, DEFAULT_CHUNK_ATTEMPTS, fetch_in_chunks
+from driver_manager import BROWSER_PROFILES, DriverManager
+from grid import fan_out, plan_fetches
+from job_queue import JobQueue
+from jobs import load_jobs, validate_job
+from logs import LOG_FORMATS, LOG_LEVELS, configure_logging, get_logger, job_context
+from metrics import MetricsRegistry
+from pipeline import drain, job_records, open_sink
+from result_cache import ResultCache, fetch_with_cache
+
+log = get_logger("batch")
+
+
+class Fetcher:
+    """
+    Fetches queries with the chosen backend, optionally through the result cache.
+
+    Owns the browser pool, HTTP session and cache connection it uses, so a
+    worker process can build its own. With chunk set, long ranges are split
+    into calendar chunks fetched in parallel over the pool's sessions, each
+    going through the cache on its own.
+    """
+
+    def __init__(self, backend="browser", pool_size=2, recycle_after=50, capture=None, cache_path=None,
+                 profile_root=None, endpoint=None, browser_profile="default", chunk=None,
+                 chunk_attempts=DEFAULT_CHUNK_ATTEMPTS):
+        self.backend = backend
+        self.endpoint = endpoint
+        self.pool_size = pool_size
+        self.chunk = chunk
+        self.chunk_attempts = chunk_attempts
+        self.capture = capture or CapturePolicy()
+        self.manager = DriverManager(max_sessions=pool_size, max_jobs_per_session=recycle_after,
+                                     profile_root=profile_root, browser_profile=browser_profile)
+        self.http_session = None
+        if backend in ("http", "auto"):
+            from http_backend import create_http_session
+            self.http_session = create_http_session(pool_size=pool_size)
+        self.cache = ResultCache(cache_path) if cache_path else None
+
+    def fetch(self, longitude, latitude, start_date, end_date):
+        # The backends are imported on first use, so jobs answered from the
+        # cache never load requests, selenium or pandas
+        data = None
+        if self.http_session is not None:
+            from http_backend import fetch_soil_wetness_data, has_table_data
+            data = fetch_soil_wetness_data(longitude, latitude, start_date, end_date, session=self.http_session,
+                                           endpoint=self.endpoint)
+        if self.backend == "browser" or (self.backend == "auto" and not has_table_data(data)):
+            from scrape_mosdac import scrape_soil_wetness_data
+            # The scraper takes its browser from the manager, so it can replace one that dies mid-query
+            data = scrape_soil_wetness_data(longitude, latitude, start_date, end_date,
+                                            driver_manager=self.manager, capture=self.capture)
+        return data
+
+    def __call__(self, plan):
+        """
+        Fetch one planned query (see grid.plan_fetches).
+
+        Returns:
+            tuple: (result dict, elapsed seconds). Failures are returned as
+            results with an "error" key rather than raised.
+        """
+        query = (plan["longitude"], plan["latitude"], plan["start_date"], plan["end_date"])
+        job_ids = [str(job["job_id"]) for job in plan.get("jobs", [])]
+        started = time.time()
+        with job_context(job_id=",".join(job_ids) or None, longitude=plan["longitude"],
+                         latitude=plan["latitude"]):
+            try:
+                fetch = self.fetch
+                if self.cache is not None:
+                    fetch = functools.partial(fetch_with_cache, self.cache, fetch)
+                if self.chunk:
+                    data = fetch_in_chunks(fetch, *query, chunk=self.chunk, workers=self.pool_size,
+                                           max_attempts=self.chunk_attempts)
+                else:
+                    data = fetch(*query)
+            except Exception as e:
+                log.exception(f"Fetch failed: {str(e)}")
+                data = {"error": str(e)}
+        return data, round(time.time() - started, 3)
+
+    def close(self):
+        log.info("Closing browser sessions...")
+        self.manager.shutdown()
+        if self.http_session is not None:
+            self.http_session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+def _run_threaded(fetcher, fetches, pool_size, on_start):
+    """Run fetches on a thread pool, yielding (plan, data, elapsed) as each finishes."""
+    def run(plan):
+        on_start(plan)
+        return fetcher(plan)
+
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        futures = {executor.submit(run, f): f for f in fetches}
+        for future in as_completed(futures):
+            data, elapsed = future.result()
+            yield futures[future], data, elapsed
+
+
+def run_batch(jobs, pool_size=2, output_path="batch_results.jsonl", recycle_after=50, backend="browser",
+              endpoint=None, cache_path=None, dedupe=True, capture=None, parquet_dir=None, sinks=(), queue_path=None,
+              processes=None, browser_profile="default", metrics_path=None, prometheus_path=None,
+              chunk=None, chunk_attempts=DEFAULT_CHUNK_ATTEMPTS, report=True):
+    """
+    Run many scraping jobs through a fixed-size pool of browser sessions.
+
+    Jobs share a DriverManager holding pool_size warm Chrome sessions, so a
+    batch pays the browser startup cost once per session rather than once
+    per job. Results are appended to a JSONL file as each job finishes.
+
+    Args:
+        jobs (list): Job dicts as returned by load_jobs
+        pool_size (int): Number of browser sessions to run at once
+        output_path (str): JSONL file that receives one line per job
+        recycle_after (int): Jobs a browser runs before it is replaced
+        backend (str): "browser" to drive Chrome, "http" to call the SWI data
+            endpoint directly, or "auto" to try HTTP first and fall back to
+            the browser for jobs it can't answer
+        endpoint (str, optional): SWI data endpoint URL for the "http" and
+            "auto" backends (default: http_backend.SWI_DATA_ENDPOINT)
+        cache_path (str, optional): SQLite result cache to answer jobs from;
+            only the days missing from it are fetched
+        dedupe (bool): Snap points to the SWI grid and merge jobs in the same
+            pixel with overlapping dates into one fetch, whose result is then
+            split back out to each job
+        capture (CapturePolicy, optional): Which screenshots and page source
+            browser jobs keep. Defaults to CapturePolicy(), which writes the
+            page state of failed jobs only, each to its own folder
+        parquet_dir (str, optional): Also append the daily values of every
+            successful job to a Parquet dataset in this folder, partitioned
+            by grid cell and year (see parquet_sink.py)
+        sinks (iterable): Extra outputs (see pipeline.open_sink) that receive
+            each job's daily observations and a job record as soon as the
+            job finishes
+        queue_path (str, optional): SQLite job queue that checkpoints each
+            job's state. Jobs already done (or dead-lettered) in it are
+            skipped, jobs left running by an interrupted run are run again,
+            and failed jobs are retried until they run out of attempts
+        processes (int, optional): Run the fetches in this many worker
+            processes instead of threads (see process_pool.py). Each worker
+            has its own browser, profile folder and artifact folder, and
+            pool_size is ignored
+        browser_profile (str): Chrome settings for browser jobs: "default",
+            or "fast" for headless browsers that skip images, fonts, map
+            tiles and analytics (see driver_manager.BROWSER_PROFILES)
+        metrics_path (str, optional): JSONL file that receives a trace
+            record (step timings, events, outcome) for every fetch
+        prometheus_path (str, optional): File to write the batch's stage
+            timings and event counters to in the Prometheus text format
+        chunk (str, optional): Split each fetch's date range into "month",
+            "season" or "year" chunks that are fetched in parallel over the
+            pool's sessions and stitched back together (see chunking.py)
+        chunk_attempts (int): Tries per chunk; a failed chunk is retried
+            without refetching the rest of the range
+        report (bool): Print the summary and the stage latency report to
+            stdout when the batch ends. Callers that want stdout for their
+            own machine-readable output (swi_cli.py) turn it off
+
+    Returns:
+        dict: Counts of jobs by status and total elapsed seconds (plus
+        per-worker throughput in process mode), and under "metrics" the
+        p50/p95 of every stage and the event counters
+    """
+    queue = JobQueue(queue_path) if queue_path else None
+    metrics = MetricsRegistry(metrics_path)
+    capture = capture or CapturePolicy()
+    sinks = [open_sink(target) for target in sinks]
+    parquet = None
+    if parquet_dir:
+        from parquet_sink import ParquetSink
+        parquet = ParquetSink(parquet_dir)
+        sinks.append(parquet)
+
+    def job_result(job, data, elapsed):
+        status = "error" if "error" in data else "ok"
+        result = {"status": status, "elapsed_seconds": elapsed}
+        if "error" in data:
+            result["error"] = data["error"]
+        # Keep the output set small; the full HTML is not needed per job
+        result["data"] = {k: v for k, v in data.items() if k != "page_source"}
+        return result
+
+    def mark_running(plan):
+        if queue is not None:
+            queue.mark_running(plan["jobs"])
+
+    counts = {}
+    batch_started = time.time()
+
+    def write_record(out, job, result):
+        record = dict(job)
+        record.update(result)
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+        drain(job_records(job, result), sinks)
+        with job_context(job_id=job["job_id"], longitude=job["longitude"], latitude=job["latitude"]):
+            log.info(f"Job {record['status']} in {record['elapsed_seconds']}s",
+                     extra={"fields": {"status": record["status"], "elapsed_seconds": record["elapsed_seconds"]}})
+
+    fetcher = None
+    runner = None
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            valid_jobs = []
+            for job in jobs:
+                problem = validate_job(job)
+                if problem:
+                    write_record(out, job, {"status": "invalid", "error": problem, "elapsed_seconds": 0.0})
+                else:
+                    valid_jobs.append(job)
+
+            if queue is not None:
+                added = queue.enqueue(valid_jobs)
+                recovered = queue.recover()
+                valid_jobs = queue.runnable()
+                log.info(f"Job queue: {added} new jobs, {recovered} interrupted jobs to rerun, "
+                         f"{len(valid_jobs)} jobs left to run")
+
+            if dedupe:
+                fetches = plan_fetches(valid_jobs)
+            else:
+                fetches = [dict(job, jobs=[job]) for job in valid_jobs]
+
+            if processes:
+                from process_pool import ShardedRunner
+                log.info(f"Running {len(valid_jobs)} jobs as {len(fetches)} fetches in {processes} worker processes...")
+                runner = ShardedRunner(processes, backend=backend, recycle_after=recycle_after, capture=capture,
+                                       cache_path=cache_path, endpoint=endpoint, browser_profile=browser_profile,
+                                       chunk=chunk, chunk_attempts=chunk_attempts)
+                results = runner.run(fetches, on_start=mark_running)
+            else:
+                log.info(f"Running {len(valid_jobs)} jobs as {len(fetches)} fetches with {pool_size} sessions...")
+                fetcher = Fetcher(backend, pool_size, recycle_after, capture, cache_path, endpoint=endpoint,
+                                  browser_profile=browser_profile, chunk=chunk, chunk_attempts=chunk_attempts)
+                results = _run_threaded(fetcher, fetches, pool_size, mark_running)
+
+            for plan, data, elapsed in results:
+                metrics.record_fetch(plan, data, elapsed)
+                for job in plan["jobs"]:
+                    job_data = fan_out(data, job) if dedupe else data
+                    write_record(out, job, job_result(job, job_data, elapsed))
+                    # Checkpoint only once the job's output is written
+                    if queue is not None:
+                        queue.record_result(job, job_data)
+    finally:
+        cache_info = None
+        if fetcher is not None:
+            cache_info = fetcher.cache.info() if fetcher.cache is not None else None
+            fetcher.close()
+        for sink in sinks:
+            sink.close()
+        metrics.close()
+        if prometheus_path:
+            metrics.write_prometheus(prometheus_path)
+
+    summary = {"jobs": len(jobs), "fetches": len(fetches), "by_status": counts,
+               "elapsed_seconds": round(time.time() - batch_started, 3)}
+    if runner is not None:
+        summary["workers"] = runner.worker_stats
+    if cache_info is not None:
+        summary["cache"] = cache_info
+    if parquet is not None:
+        summary["parquet"] = {"rows": parquet.rows_written, "files": parquet.files_written}
+    if queue is not None:
+        summary["queue"] = queue.counts()
+        queue.close()
+    if report:
+        print(f"Batch finished: {summary}")
+        metrics.report()
+    else:
+        log.info("Batch finished", extra={"fields": {"summary": summary}})
+    summary["metrics"] = metrics.summary()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape soil wetness index data for many points from a job file.")
+    parser.add_argument("jobs_file", help="CSV or JSONL file with longitude, latitude, start_date, end_date")
+    parser.add_argument("-n", "--pool-size", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Number of browser sessions to run at once")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl",
+                        help="JSONL file to append per-job results to")
+    parser.add_argument("--recycle-after", type=int, default=50,
+                        help="Replace each browser after this many jobs")
+    parser.add_argument("--backend", choices=("browser", "http", "auto"), default="browser",
+                        help="Drive Chrome, call the SWI data endpoint directly, or try HTTP then Chrome")
+    parser.add_argument("--endpoint", metavar="URL",
+                        help="SWI data endpoint for the http and auto backends (e.g. a replay_server.py URL)")
+    parser.add_argument("--browser-profile", choices=BROWSER_PROFILES, default="default",
+                        help="Chrome settings; 'fast' runs headless and skips images, fonts, map tiles and analytics")
+    parser.add_argument("--cache", metavar="PATH",
+                        help="SQLite result cache; only days missing from it are fetched")
+    parser.add_argument("--no-dedupe", action="store_true",
+                        help="Fetch every job as given instead of merging jobs in the same grid pixel")
+    parser.add_argument("--capture", choices=CAPTURE_MODES, default="on_error",
+                        help="Which jobs save screenshots and page source")
+    parser.add_argument("--sample-rate", type=float, default=0.05,
+                        help="Share of jobs fully captured with --capture sampled")
+    parser.add_argument("--artifacts-dir", default="artifacts",
+                        help="Folder that receives one subfolder of screenshots per captured job")
+    parser.add_argument("--parquet", metavar="DIR",
+                        help="Also append daily values to a Parquet dataset partitioned by grid cell and year")
+    parser.add_argument("--sink", action="append", default=[], metavar="TARGET",
+                        help="Stream daily observations and job records to a .csv, .sqlite, .jsonl "
+                             "or .parquet target, or - for stdout (repeatable)")
+    parser.add_argument("--queue", metavar="PATH",
+                        help="SQLite job queue to checkpoint progress in; rerun with the same queue to resume")
+    parser.add_argument("-p", "--processes", type=int, nargs="?", const=0, metavar="N",
+                        help="Run in N worker processes, each with its own browser and profile "
+                             "(default N: half the CPU cores)")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Append a trace record (step timings, events, outcome) per fetch to this JSONL file")
+    parser.add_argument("--prometheus", metavar="PATH",
+                        help="Write stage timings and event counters in the Prometheus text format")
+    parser.add_argument("--chunk", choices=CHUNK_SIZES,
+                        help="Split long date ranges into calendar chunks fetched in parallel and stitched together")
+    parser.add_argument("--chunk-attempts", type=int, default=DEFAULT_CHUNK_ATTEMPTS,
+                        help="Tries per chunk before it is reported as failed")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="info",
+                        help="Least severe log records to write; 'debug' also dumps form details, which costs "
+                             "extra browser calls")
+    parser.add_argument("--log-format", choices=LOG_FORMATS, default="json",
+                        help="Write log records to stderr as JSON lines or plain text")
+    args = parser.parse_args()
+    configure_logging(args.log_level, args.log_format)
+    processes = args.processes
+    if processes == 0:
+        from process_pool import default_worker_count
+        processes = default_worker_count()
+
+    jobs = load_jobs(args.jobs_file)
+    run_batch(jobs, pool_size=args.pool_size, output_path=args.output, recycle_after=args.recycle_after,
+              backend=args.backend, endpoint=args.endpoint, cache_path=args.cache, dedupe=not args.no_dedupe,
+              capture=CapturePolicy(args.capture, args.sample_rate, args.artifacts_dir),
+              parquet_dir=args.parquet, sinks=args.sink, queue_path=args.queue,
+              processes=processes, browser_profile=args.browser_profile, metrics_path=args.metrics,
+              prometheus_path=args.prometheus, chunk=args.chunk, chunk_attempts=args.chunk_attempts)
+
+
+if __name__ == "__main__":
+    main()
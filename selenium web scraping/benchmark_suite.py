@@ -0,0 +1,403 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from extractors import parse_html_tables
+from metrics import summarize
+from pipeline import drain, job_records, open_sink
+from replay_server import DATA_PATH, PAGE_PATH, ReplayServer, synthetic_series
+
+SUITES = ("parsing", "sinks", "http", "browser")
+# The browser suite needs Chrome, so it only runs when asked for
+DEFAULT_SUITES = ("parsing", "sinks", "http")
+SINK_TARGETS = {"jsonl": "records.jsonl", "csv": "records.csv", "sqlite": "records.sqlite",
+                "parquet": "records.parquet"}
+
+# Metrics where a higher value is worse / better, matched on the last part of
+# their name; everything else (counts, sizes) is not compared
+LOWER_IS_BETTER = ("mean", "p50", "p95", "startup_seconds", "cold_total_seconds", "peak_memory_mb")
+HIGHER_IS_BETTER = ("per_second",)
+# Changes smaller than these are noise, however large relative to a tiny baseline
+MIN_SECONDS_CHANGE = 0.005
+MIN_MEMORY_CHANGE_MB = 1.0
+
+VALID_POINT = ("77.88", "23.47")
+# Outside the SWI coverage; the stand-in answers it like the live site (alert / HTTP 400)
+BAD_POINT = ("150.00", "23.47")
+
+
+def summarize_stages(timings):
+    """Summarize a list of per-job timings dicts (step -> seconds) per step."""
+    stages = {}
+    for job_timings in timings:
+        for stage, seconds in job_timings.items():
+            stages.setdefault(stage, []).append(seconds)
+    return {stage: summarize(samples) for stage, samples in stages.items()}
+
+
+def peak_memory_mb(function):
+    """
+    Run a function with tracemalloc and return its result and peak Python memory in MB.
+
+    Tracing slows Python code down several times over, so timings are taken
+    in a separate, untraced run.
+    """
+    tracemalloc.start()
+    try:
+        result = function()
+        return result, round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+    finally:
+        tracemalloc.stop()
+
+
+def _date_range(days, start=datetime(2023, 1, 1)):
+    return start.strftime("%d/%m/%Y"), (start + timedelta(days=days - 1)).strftime("%d/%m/%Y")
+
+
+def synthetic_table_html(rows):
+    """Return a page holding one Date/SWI table with the given number of rows."""
+    start, end = _date_range(rows)
+    series = synthetic_series(*VALID_POINT, start, end)
+    cells = "".join(f"<tr><td>{day}</td><td>{value}</td></tr>" for day, value in zip(series["dates"], series["values"]))
+    return f"<html><body><div id='results'><table><tr><th>Date</th><th>SWI</th></tr>{cells}</table></div></body></html>"
+
+
+def bench_parsing(rows=3650, runs=20, html=None):
+    """
+    Time parse_html_tables on a result page.
+
+    Args:
+        rows (int): Table rows in the generated page
+        runs (int): Number of parses
+        html (str, optional): Page to parse instead, e.g. a saved page_source.html
+
+    Returns:
+        dict: Page size, rows found, parse seconds, rows per second and peak memory
+    """
+    html = html or synthetic_table_html(rows)
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        tables = parse_html_tables(html)
+        times.append(time.perf_counter() - started)
+    _, peak = peak_memory_mb(lambda: parse_html_tables(html))
+    row_count = sum(len(table["data"]) for table in tables)
+    seconds = summarize(times)
+    return {"html_bytes": len(html), "rows": row_count, "runs": runs, "seconds": seconds,
+            "rows_per_second": round(row_count / seconds["p50"], 1) if seconds["p50"] else None,
+            "peak_memory_mb": peak}
+
+
+def bench_sinks(jobs=200, days=365, targets=tuple(SINK_TARGETS)):
+    """
+    Time writing job results through each output sink.
+
+    Args:
+        jobs (int): Jobs to write
+        days (int): Daily values per job
+        targets (iterable): Sink kinds (keys of SINK_TARGETS)
+
+    Returns:
+        dict: Per sink: records written, seconds, records per second, bytes
+        on disk and peak memory; or "skipped" when the sink can't be opened
+    """
+    start, end = _date_range(days)
+    series = synthetic_series(*VALID_POINT, start, end)
+    table = {"headers": ["Date", "SWI"], "data": [[d, str(v)] for d, v in zip(series["dates"], series["values"])]}
+    result = {"status": "ok", "elapsed_seconds": 1.0, "data": {"table": table, "timings": {"total": 1.0}}}
+
+    def write_all(path):
+        sink = open_sink(path)
+        records = 0
+        for index in range(jobs):
+            job = {"job_id": str(index), "longitude": VALID_POINT[0], "latitude": VALID_POINT[1],
+                   "start_date": start, "end_date": end}
+            records += drain(job_records(job, result), [sink])
+        sink.close()
+        return records
+
+    work_dir = tempfile.mkdtemp(prefix="swi_bench_sinks_")
+    results = {}
+    try:
+        for kind in targets:
+            path = os.path.join(work_dir, SINK_TARGETS[kind])
+            started = time.perf_counter()
+            try:
+                records = write_all(path)
+            except ImportError as e:
+                results[kind] = {"skipped": str(e)}
+                continue
+            seconds = time.perf_counter() - started
+            _, peak = peak_memory_mb(lambda: write_all(os.path.join(work_dir, "traced_" + SINK_TARGETS[kind])))
+            results[kind] = {"records": records, "seconds": round(seconds, 4),
+                             "records_per_second": round(records / seconds, 1),
+                             "bytes": _size_on_disk(path), "peak_memory_mb": peak}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def _size_on_disk(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(folder, name))
+               for folder, _, names in os.walk(path) for name in names)
+
+
+def bench_http(jobs=200, concurrency=8, days=31, latency=0.05, jitter=0.0, failure_rate=0.0, bad_input_rate=0.05):
+    """
+    Run jobs through the HTTP backend against the local stand-in.
+
+    Args:
+        jobs (int): Jobs to run
+        concurrency (int): Jobs in flight at once
+        days (int): Days per query
+        latency (float): Seconds the stand-in waits before answering
+        jitter (float): Random extra latency, up to this many seconds
+        failure_rate (float): Fraction of requests the stand-in fails with HTTP 503
+        bad_input_rate (float): Fraction of jobs with coordinates outside the coverage
+
+    Returns:
+        dict: Job counts, jobs per second, per-stage latency, peak memory and
+        the stand-in's responses by status
+    """
+    from http_backend import create_http_session, fetch_soil_wetness_data
+
+    start, end = _date_range(days)
+    bad_every = int(1 / bad_input_rate) if bad_input_rate else 0
+    points = [BAD_POINT if bad_every and index % bad_every == bad_every - 1 else VALID_POINT for index in range(jobs)]
+
+    with ReplayServer([], synthetic=True, validate_input=True, latency=latency, jitter=jitter,
+                      failure_rate=failure_rate, seed=0) as server:
+        endpoint = server.url + DATA_PATH
+        session = create_http_session(pool_size=concurrency)
+
+        def run(point):
+            return fetch_soil_wetness_data(point[0], point[1], start, end, session=session, endpoint=endpoint)
+
+        def run_all():
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                return list(pool.map(run, points))
+
+        started = time.perf_counter()
+        results = run_all()
+        seconds = time.perf_counter() - started
+        statuses = server.status_counts
+        _, peak = peak_memory_mb(run_all)
+
+    ok = [data for data in results if "error" not in data]
+    return {"jobs": jobs, "concurrency": concurrency, "ok": len(ok), "errors": jobs - len(ok),
+            "seconds": round(seconds, 4), "jobs_per_second": round(jobs / seconds, 2),
+            "stages": summarize_stages(data["timings"] for data in ok),
+            "peak_memory_mb": peak,
+            "server_statuses": {str(status): count for status, count in sorted(statuses.items())}}
+
+
+def bench_browser(jobs=5, browser_profile="fast", days=31, latency=0.0, bad_inputs=1):
+    """
+    Run the browser scraper end to end against the stand-in's synthetic page.
+
+    The first job finds the form with the search cascades; later ones use
+    the locator cache, as repeated runs against the live site do.
+
+    Args:
+        jobs (int): Jobs to run with valid coordinates
+        browser_profile (str): "default" or "fast"
+        days (int): Days per query
+        latency (float): Seconds the stand-in waits before every response
+        bad_inputs (int): Extra jobs with coordinates that raise the
+            coordinate alert
+
+    Returns:
+        dict: Browser startup, the cold first job, per-stage latency of the
+        warm jobs, jobs per second and peak Python memory; or "skipped" when
+        Chrome can't be started
+    """
+    from driver_manager import DriverManager
+    from locators import LocatorCache
+    from scrape_mosdac import scrape_soil_wetness_data
+
+    start, end = _date_range(days)
+    with ReplayServer([], synthetic=True, validate_input=True, latency=latency, seed=0) as server:
+        site_url = server.url + PAGE_PATH
+        manager = DriverManager(1, browser_profile=browser_profile, site_url=site_url)
+        started = time.perf_counter()
+        try:
+            manager.warm_up(1)
+        except Exception as e:
+            return {"skipped": f"Could not start Chrome: {str(e)}"}
+        startup = time.perf_counter() - started
+
+        cache = LocatorCache(None)
+        timings, outcomes = [], {"ok": 0, "error": 0, "coordinate_alert": 0}
+        points = [VALID_POINT] * jobs + [BAD_POINT] * bad_inputs
+        def run_all():
+            for point in points:
+                with manager.session() as driver:
+                    data = scrape_soil_wetness_data(point[0], point[1], start, end, driver=driver,
+                                                    locator_cache=cache, site_url=site_url)
+                if data.get("coordinate_alert"):
+                    outcomes["coordinate_alert"] += 1
+                outcomes["error" if "error" in data or not data.get("table") else "ok"] += 1
+                timings.append(data.get("timings", {}))
+
+        # Time is spent in the browser, so tracing the Python side barely
+        # changes it; one traced run gives both
+        started = time.perf_counter()
+        try:
+            _, peak = peak_memory_mb(run_all)
+        finally:
+            manager.shutdown()
+        seconds = time.perf_counter() - started
+
+    return {"jobs": len(points), "browser_profile": browser_profile, **outcomes,
+            "startup_seconds": round(startup, 3),
+            "cold_total_seconds": timings[0].get("total") if timings else None,
+            "seconds": round(seconds, 4), "jobs_per_second": round(len(points) / seconds, 3),
+            "stages": summarize_stages(timings[1:jobs]), "peak_memory_mb": peak}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_suites(suites=DEFAULT_SUITES, options=None):
+    """
+    Run benchmark suites and collect their results in one document.
+
+    Args:
+        suites (iterable): Names from SUITES
+        options (dict, optional): Keyword arguments per suite, e.g.
+            {"http": {"jobs": 500}}
+
+    Returns:
+        dict: timestamp, commit, python, platform and results per suite
+    """
+    options = options or {}
+    runners = {"parsing": bench_parsing, "sinks": bench_sinks, "http": bench_http, "browser": bench_browser}
+    results = {}
+    for suite in suites:
+        print(f"Running {suite} benchmark...", file=sys.stderr)
+        results[suite] = runners[suite](**options.get(suite, {}))
+    return {"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"), "commit": _git_commit(),
+            "python": platform.python_version(), "platform": platform.platform(), "results": results}
+
+
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}.{key}" if prefix else key))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def compare_results(baseline, current, tolerance=0.1):
+    """
+    Find metrics that got worse by more than a tolerance.
+
+    Latencies and memory regress when they grow, throughput when it drops.
+    Counts and sizes are not compared, nor are latency and memory changes
+    below MIN_SECONDS_CHANGE and MIN_MEMORY_CHANGE_MB.
+
+    Args:
+        baseline (dict): Earlier run_suites document
+        current (dict): New run_suites document
+        tolerance (float): Allowed relative change (0.1 = 10%)
+
+    Returns:
+        list: {"metric", "baseline", "current", "change"} per regression,
+        change being the relative difference
+    """
+    before = _flatten(baseline.get("results", {}))
+    after = _flatten(current.get("results", {}))
+    regressions = []
+    for metric, new in sorted(after.items()):
+        old = before.get(metric)
+        name = metric.rsplit(".", 1)[-1]
+        if not old:
+            continue
+        change = (new - old) / old
+        floor = MIN_MEMORY_CHANGE_MB if name == "peak_memory_mb" else MIN_SECONDS_CHANGE
+        if name in LOWER_IS_BETTER and new - old < floor:
+            continue
+        worse = (name in LOWER_IS_BETTER and change > tolerance) or \
+                (name.endswith(HIGHER_IS_BETTER) and change < -tolerance)
+        if worse:
+            regressions.append({"metric": metric, "baseline": old, "current": new, "change": round(change, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark HTML parsing, output sinks, the HTTP backend and the "
+                                                 "browser scraper against a local stand-in for the SWI site.")
+    parser.add_argument("--suite", action="append", choices=SUITES,
+                        help=f"Suite to run (repeatable; default: {', '.join(DEFAULT_SUITES)})")
+    parser.add_argument("--jobs", type=int, help="Jobs per suite (sinks, http, browser)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Jobs in flight for the http suite")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the stand-in adds to each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency, up to this many seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Fraction of data requests the stand-in fails with HTTP 503")
+    parser.add_argument("--browser-profile", choices=("default", "fast"), default="fast")
+    parser.add_argument("--html", help="Saved page_source.html to use for the parsing suite")
+    parser.add_argument("-o", "--output", help="Also append the JSON result to this file")
+    parser.add_argument("--compare", help="JSONL file of earlier results; compare against its last line")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative slowdown for --compare")
+    args = parser.parse_args(argv)
+
+    options = {
+        "parsing": {},
+        "sinks": {},
+        "http": {"concurrency": args.concurrency, "latency": args.latency, "jitter": args.jitter,
+                 "failure_rate": args.failure_rate},
+        "browser": {"browser_profile": args.browser_profile, "latency": args.latency},
+    }
+    if args.html:
+        with open(args.html, "r", encoding="utf-8") as f:
+            options["parsing"]["html"] = f.read()
+    if args.jobs:
+        for suite in ("sinks", "http", "browser"):
+            options[suite]["jobs"] = args.jobs
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        baseline = json.loads(lines[-1]) if lines else None
+
+    # Progress and regressions go to stderr, so stdout holds only the JSON result
+    result = run_suites(args.suite or DEFAULT_SUITES, options)
+    line = json.dumps(result)
+    print(line)
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    if baseline is not None:
+        regressions = compare_results(baseline, result, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression['metric']} {regression['baseline']} -> {regression['current']} "
+                  f"({regression['change']:+.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
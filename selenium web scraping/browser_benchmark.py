@@ -0,0 +1,134 @@
+import argparse
+import functools
+import json
+import statistics
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from driver_manager import BROWSER_PROFILES, create_driver
+from waits import page_ready, wait_for
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalCopyServer:
+    """
+    Serves a saved copy of the SWI page from a local folder.
+
+    Record the copy once with, for example:
+
+        wget --page-requisites --convert-links --span-hosts --no-host-directories -P swi_copy https://mosdac.gov.in/swi/
+    """
+
+    def __init__(self, directory, host="127.0.0.1", port=0):
+        handler = functools.partial(_QuietHandler, directory=directory)
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def measure_page_ready(url, browser_profile, runs=10, timeout=30):
+    """
+    Time how long a page takes to become ready in one browser profile.
+
+    The first load is reported on its own; the rest reuse the same browser
+    and its cache, as a batch session would.
+
+    Args:
+        url (str): Page to load
+        browser_profile (str): "default" or "fast"
+        runs (int): Number of page loads
+        timeout (float): Maximum seconds to wait for each load
+
+    Returns:
+        dict: Browser startup seconds, the first (cold) load and summary
+        statistics of the warm loads, all in seconds
+    """
+    started = time.perf_counter()
+    driver = create_driver(browser_profile=browser_profile)
+    startup = time.perf_counter() - started
+    times = []
+    try:
+        for _ in range(runs):
+            driver.delete_all_cookies()
+            started = time.perf_counter()
+            driver.get(url)
+            wait_for(driver, page_ready, timeout, "page load", quiet=True)
+            times.append(time.perf_counter() - started)
+    finally:
+        driver.quit()
+
+    warm = sorted(times[1:]) or times
+    return {
+        "profile": browser_profile,
+        "runs": runs,
+        "startup_seconds": round(startup, 3),
+        "cold_seconds": round(times[0], 3),
+        "warm_median_seconds": round(statistics.median(warm), 3),
+        "warm_p95_seconds": round(warm[min(len(warm) - 1, int(len(warm) * 0.95))], 3),
+        "warm_mean_seconds": round(statistics.mean(warm), 3),
+    }
+
+
+def run_benchmark(directory, profiles=BROWSER_PROFILES, runs=10, page="index.html"):
+    """
+    Compare page-ready time across browser profiles on a local copy of the page.
+
+    Args:
+        directory (str): Folder holding the saved page
+        profiles (iterable): Browser profiles to compare
+        runs (int): Page loads per profile
+        page (str): Path of the page inside the folder
+
+    Returns:
+        dict: Results per profile, plus the fast profile's speedup over the
+        default one when both were measured
+    """
+    with LocalCopyServer(directory) as server:
+        url = f"{server.url}/{page}"
+        results = {profile: measure_page_ready(url, profile, runs) for profile in profiles}
+
+    summary = {"url_path": page, "profiles": results}
+    if "default" in results and "fast" in results and results["fast"]["warm_median_seconds"]:
+        summary["warm_speedup"] = round(results["default"]["warm_median_seconds"]
+                                        / results["fast"]["warm_median_seconds"], 2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page-ready time of the browser profiles "
+                                                 "on a locally saved copy of the SWI page.")
+    parser.add_argument("directory", help="Folder holding the saved page")
+    parser.add_argument("--page", default="index.html", help="Page to load, relative to the folder")
+    parser.add_argument("--runs", type=int, default=10, help="Page loads per profile")
+    parser.add_argument("--profile", action="append", choices=BROWSER_PROFILES,
+                        help="Profile to measure (repeatable; default: all)")
+    parser.add_argument("-o", "--output", help="Also append the JSON result to this file")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.directory, args.profile or BROWSER_PROFILES, args.runs, args.page)
+    line = json.dumps(result)
+    print(line)
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+import random
+import uuid
+from datetime import datetime
+
+from logs import get_logger
+
+log = get_logger("capture")
+
+CAPTURE_MODES = ("off", "on_error", "sampled", "always")
+DEFAULT_ARTIFACTS_DIR = "artifacts"
+
+
+class CapturePolicy:
+    """
+    Decides which debug artifacts (screenshots, page source) a job keeps.
+
+    Modes:
+        off       - never capture anything
+        on_error  - only capture the page state when a job fails
+        sampled   - capture everything for a random sample_rate share of
+                    jobs, and the error state for every failed job
+        always    - capture every step of every job
+    """
+
+    def __init__(self, mode="on_error", sample_rate=0.05, output_dir=DEFAULT_ARTIFACTS_DIR):
+        if mode not in CAPTURE_MODES:
+            raise ValueError(f"Unknown capture mode {mode!r}; expected one of {', '.join(CAPTURE_MODES)}")
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+
+    def recorder(self, job_dir=None):
+        """
+        Create the artifact recorder for one job.
+
+        Args:
+            job_dir (str, optional): Folder for this job's artifacts. Defaults
+                to a new, uniquely named folder under output_dir so that
+                concurrent jobs never overwrite each other's files.
+
+        Returns:
+            ArtifactRecorder: Recorder for the job
+        """
+        if job_dir is None:
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            job_dir = os.path.join(self.output_dir, f"job_{stamp}_{uuid.uuid4().hex[:8]}")
+        capture_steps = self.mode == "always" or (self.mode == "sampled" and random.random() < self.sample_rate)
+        return ArtifactRecorder(job_dir, capture_steps=capture_steps, capture_errors=self.mode != "off")
+
+
+class ArtifactRecorder:
+    """
+    Writes one job's screenshots straight into its own folder, as allowed by
+    the capture policy. The folder is only created once something is saved.
+    """
+
+    def __init__(self, job_dir, capture_steps=False, capture_errors=True):
+        self.job_dir = job_dir
+        self.capture_steps = capture_steps
+        self.capture_errors = capture_errors
+        self.screenshots = {}
+
+    def _save(self, driver, name):
+        """Screenshot into the job folder, removing the folder again if nothing ended up in it."""
+        path = os.path.join(self.job_dir, f"{name}.png")
+        os.makedirs(self.job_dir, exist_ok=True)
+        saved = False
+        try:
+            saved = driver.save_screenshot(path) is not False
+        finally:
+            if not saved and not os.listdir(self.job_dir):
+                os.rmdir(self.job_dir)
+        if not saved:
+            return None
+        log.debug(f"Saved {name} screenshot to {path}")
+        return path
+
+    def step(self, driver, name):
+        """
+        Screenshot a normal step of the job, if the policy captures steps.
+
+        Returns:
+            str or None: Path of the screenshot, or None if none was taken
+        """
+        if not self.capture_steps:
+            return None
+        path = self._save(driver, name)
+        if path:
+            self.screenshots[name] = path
+        return path
+
+    def error(self, driver, name="error_state"):
+        """
+        Screenshot the page after a failure, if the policy captures errors.
+
+        Returns:
+            str or None: Path of the screenshot, or None if none was taken
+        """
+        if not self.capture_errors:
+            return None
+        return self._save(driver, name)
+
+    def keep_page_source(self, error=False):
+        """Return True if the page HTML should be kept in the result."""
+        return self.capture_errors if error else self.capture_steps
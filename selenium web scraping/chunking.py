@@ -0,0 +1,171 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from logs import get_logger
+from metrics import add_fetch_stats
+from recovery import failure_fields
+from swi_series import daily_values_to_table, result_to_daily_values
+
+log = get_logger("chunking")
+
+CHUNK_SIZES = ("month", "season", "year")
+# First month of each India Meteorological Department season: winter
+# (Jan-Feb), pre-monsoon (Mar-May), monsoon (Jun-Sep), post-monsoon (Oct-Dec)
+SEASON_START_MONTHS = (1, 3, 6, 10)
+DEFAULT_CHUNK_ATTEMPTS = 3
+# Seconds before retrying a failed chunk, doubled on each further attempt
+RETRY_BASE_DELAY = 2.0
+
+
+def _to_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, "%d/%m/%Y").date()
+    return value
+
+
+def _next_chunk_start(day, chunk):
+    """Return the first day of the chunk after the one that contains day."""
+    if chunk == "month":
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    if chunk == "season":
+        later = [month for month in SEASON_START_MONTHS if month > day.month]
+        if later:
+            return date(day.year, later[0], 1)
+    return date(day.year + 1, 1, 1)
+
+
+def split_date_range(start_date, end_date, chunk="month"):
+    """
+    Split a date range into calendar months, seasons or years.
+
+    Chunks follow calendar boundaries, so the same stretch of days is always
+    split the same way and the first and last chunks may be partial.
+
+    Args:
+        start_date (str or date): Start date (DD/MM/YYYY if a string)
+        end_date (str or date): End date (DD/MM/YYYY if a string)
+        chunk (str): "month", "season" or "year"
+
+    Returns:
+        list: (start, end) date tuples, inclusive, in order
+    """
+    if chunk not in CHUNK_SIZES:
+        raise ValueError(f"Unknown chunk size {chunk!r}; expected one of {', '.join(CHUNK_SIZES)}")
+    start, end = _to_date(start_date), _to_date(end_date)
+    chunks = []
+    while start <= end:
+        following = _next_chunk_start(start, chunk)
+        chunk_end = min(end, date.fromordinal(following.toordinal() - 1))
+        chunks.append((start, chunk_end))
+        start = following
+    return chunks
+
+
+def _fetch_chunk(fetch, longitude, latitude, start, end, max_attempts, retry_delay):
+    """Fetch one chunk, retrying it on its own when it fails. Returns (data, attempts)."""
+    # Imported here: async_engine pulls in asyncio, which the CLI's startup doesn't need
+    from async_engine import is_retryable
+    first, last = start.strftime("%d/%m/%Y"), end.strftime("%d/%m/%Y")
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            data = fetch(longitude, latitude, first, last)
+        except Exception as e:
+            data = {"error": str(e)}
+        if "error" not in data or attempt >= max_attempts or not is_retryable(data):
+            return data, attempt
+        delay = retry_delay * 2 ** (attempt - 1)
+        log.warning(f"Chunk {first} to {last} failed ({data['error']}), retrying in {delay:.1f}s",
+                    extra={"fields": {"chunk": [first, last], "attempt": attempt}})
+        time.sleep(delay)
+
+
+def fetch_in_chunks(fetch, longitude, latitude, start_date, end_date, chunk="month", workers=2,
+                    max_attempts=DEFAULT_CHUNK_ATTEMPTS, retry_delay=RETRY_BASE_DELAY):
+    """
+    Fetch a long date range as calendar chunks in parallel and stitch the results.
+
+    The site handles a month or a season far better than several years in
+    one form post. Each chunk is fetched with fetch(), up to workers at a
+    time, and retried on its own when it fails, so one bad chunk never
+    costs the rest of the range. The chunks' daily values are merged into
+    one table sorted by date, with each day once.
+
+    Args:
+        fetch (callable): fetch(longitude, latitude, start_date, end_date)
+            returning a result dict like scrape_soil_wetness_data; dates are
+            passed as DD/MM/YYYY strings
+        longitude (str): Longitude value
+        latitude (str): Latitude value
+        start_date (str): Start date in format DD/MM/YYYY
+        end_date (str): End date in format DD/MM/YYYY
+        chunk (str): "month", "season" or "year"
+        workers (int): Chunks to fetch at once; match it to the browser
+            sessions (or HTTP connections) available
+        max_attempts (int): Tries per chunk before giving up on it
+        retry_delay (float): Seconds before the first retry of a chunk
+
+    Returns:
+        dict: Result with "table"/"all_tables" covering the range and
+        "chunks" listing each chunk's range, attempts and days, plus the
+        "timings" and "counters" of the fetches (summed over chunks). If
+        any chunk failed for good, "error" names the failed chunks and the
+        table holds the days the other chunks returned; "failure" and
+        "retryable" are set when every failed chunk failed the same way. A
+        range that fits
+        in one chunk is passed to fetch() unchanged.
+    """
+    chunks = split_date_range(start_date, end_date, chunk)
+    if len(chunks) <= 1:
+        return fetch(longitude, latitude, start_date, end_date)
+
+    log.info(f"Fetching {start_date} to {end_date} as {len(chunks)} {chunk} chunks")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as executor:
+        # Each chunk runs in a copy of this context, so its log records keep the job's fields
+        futures = [executor.submit(contextvars.copy_context().run, _fetch_chunk, fetch, longitude, latitude,
+                                   start, end, max_attempts, retry_delay)
+                   for start, end in chunks]
+        outcomes = [future.result() for future in futures]
+
+    merged = {}
+    stats = {}
+    report = []
+    failed = []
+    failures = set()
+    cache = {"cached_days": 0, "fetched_ranges": []}
+    result = {}
+    for (start, end), (data, attempts) in zip(chunks, outcomes):
+        add_fetch_stats(stats, data)
+        # Keep only the chunk's own days, in case the site pads the range
+        values = [(day, value) for day, value in result_to_daily_values(data) if start <= day <= end]
+        merged.update(values)
+        entry = {"start_date": start.strftime("%d/%m/%Y"), "end_date": end.strftime("%d/%m/%Y"),
+                 "attempts": attempts, "days": len(values)}
+        if "error" in data:
+            entry["error"] = data["error"]
+            failed.append(f"{entry['start_date']} to {entry['end_date']} ({data['error']})")
+            failures.add(data.get("failure"))
+        if data.get("coordinate_alert"):
+            result["coordinate_alert"] = data["coordinate_alert"]
+        if data.get("cache"):
+            cache["cached_days"] += data["cache"].get("cached_days", 0)
+            cache["fetched_ranges"] += data["cache"].get("fetched_ranges", [])
+        report.append(entry)
+
+    retries = sum(attempts - 1 for _, attempts in outcomes)
+    if retries:
+        stats.setdefault("counters", {})["chunk_retries"] = retries
+
+    # Days the site had no value for are not reported
+    table = daily_values_to_table(sorted((day, value) for day, value in merged.items() if value is not None))
+    result.update({"table": table, "all_tables": [table], "chunks": report})
+    result.update({key: value for key, value in stats.items() if value})
+    if any(data.get("cache") for data, _ in outcomes):
+        result["cache"] = cache
+    if failed:
+        failure = failures.pop() if len(failures) == 1 else None
+        result.update(failure_fields(failure, f"{len(failed)} of {len(chunks)} chunks failed: {'; '.join(failed)}"))
+    return result
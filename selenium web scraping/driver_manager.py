@@ -0,0 +1,317 @@
+import atexit
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from logs import get_logger
+
+# selenium and webdriver_manager are imported where a browser is actually
+# set up, so importing this module (e.g. for BROWSER_PROFILES) stays cheap
+
+log = get_logger("driver_manager")
+
+SWI_URL = "https://mosdac.gov.in/swi/"
+
+# "default" is a visible full-size browser for watching or debugging a run.
+# "fast" is tuned for throughput: headless, small viewport, eager page loads,
+# no images, fonts, map tiles or analytics, and a disk cache shared by every
+# session so static scripts and styles are only downloaded once.
+BROWSER_PROFILES = ("default", "fast")
+
+FAST_WINDOW_SIZE = "1280,800"
+SHARED_DISK_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mosdac_swi_chrome")
+
+# Requests the SWI form and its results don't need; blocked in the fast profile
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3",
+    "*.pbf", "*/tile/*", "*/tiles/*", "*tile.openstreetmap.org*", "*arcgisonline.com*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*",
+    "*hotjar.com*", "*clarity.ms*",
+]
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def get_chromedriver_path():
+    """
+    Resolve the chromedriver binary once and reuse it for every session.
+
+    ChromeDriverManager().install() checks the installed Chrome version and
+    the driver cache on every call, so it is only run the first time.
+
+    Returns:
+        str: Path to the chromedriver executable
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            from webdriver_manager.chrome import ChromeDriverManager
+
+            log.info("Resolving ChromeDriver binary...")
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+def build_chrome_options(user_data_dir=None, browser_profile="default"):
+    """
+    Build the Chrome options used for scraping sessions.
+
+    Args:
+        user_data_dir (str, optional): Profile folder for this browser, so
+            that browsers running side by side don't share a profile
+        browser_profile (str): "default" or "fast" (see BROWSER_PROFILES)
+    """
+    if browser_profile not in BROWSER_PROFILES:
+        raise ValueError(f"Unknown browser profile {browser_profile!r}; expected one of {', '.join(BROWSER_PROFILES)}")
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    if browser_profile == "fast":
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument(f"--window-size={FAST_WINDOW_SIZE}")
+        # Return from get() once the DOM is parsed; the scraper waits for the form itself
+        chrome_options.page_load_strategy = "eager"
+        chrome_options.add_argument(f"--disk-cache-dir={SHARED_DISK_CACHE_DIR}")
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_argument("--disable-extensions")
+        chrome_options.add_argument("--disable-background-networking")
+        chrome_options.add_argument("--mute-audio")
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+        })
+    else:
+        # Pass browser_profile="fast" to run Chrome headless
+        chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--disable-notifications")
+    chrome_options.add_argument("--disable-popup-blocking")
+    if user_data_dir:
+        chrome_options.add_argument(f"--user-data-dir={user_data_dir}")
+    return chrome_options
+
+
+def create_driver(user_data_dir=None, browser_profile="default"):
+    """
+    Start a new Chrome WebDriver configured for the MOSDAC website.
+
+    Args:
+        user_data_dir (str, optional): Profile folder for the browser
+        browser_profile (str): "default" or "fast" (see BROWSER_PROFILES)
+
+    Returns:
+        WebDriver: A running Chrome WebDriver instance
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    log.info("Initializing WebDriver...")
+    driver = webdriver.Chrome(service=Service(get_chromedriver_path()),
+                              options=build_chrome_options(user_data_dir, browser_profile))
+    if browser_profile == "fast":
+        # Fonts, map tiles and analytics can't be switched off with flags,
+        # so they are blocked at the network layer
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
+
+
+def is_driver_alive(driver):
+    """Return True if the browser behind a WebDriver still answers commands."""
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+def reset_driver(driver, site_url=SWI_URL):
+    """
+    Bring a used browser back to a clean SWI page for the next job.
+
+    Dismisses any open alert, clears cookies and web storage and navigates
+    back to the SWI page.
+
+    Args:
+        driver (WebDriver): The browser to reset
+        site_url (str): Page to navigate back to
+    """
+    try:
+        driver.switch_to.alert.accept()
+    except Exception:
+        pass  # No alert present
+    driver.delete_all_cookies()
+    driver.execute_script("try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}")
+    driver.get(site_url)
+
+
+class DriverManager:
+    """
+    Pool of warm Chrome sessions shared between scraping jobs.
+
+    Browsers are started on demand up to max_sessions and handed out with
+    acquire()/release() or the session() context manager. A released
+    browser is reset to a clean SWI page so the next job starts warm. A
+    browser is quit and replaced after max_jobs_per_session jobs, or as
+    soon as it stops responding.
+
+    With profile_root set, every browser gets its own temporary profile
+    folder under it, which is deleted when the browser is quit.
+    browser_profile picks the Chrome settings ("default" or "fast").
+    site_url is the page browsers are opened on and reset to.
+    """
+
+    def __init__(self, max_sessions=1, max_jobs_per_session=50, profile_root=None, browser_profile="default",
+                 site_url=SWI_URL):
+        self.max_sessions = max_sessions
+        self.max_jobs_per_session = max_jobs_per_session
+        self.profile_root = profile_root
+        self.browser_profile = browser_profile
+        self.site_url = site_url
+        self._profiles = {}
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_sessions)
+        self._job_counts = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _start_session(self):
+        profile = tempfile.mkdtemp(prefix="profile_", dir=self.profile_root) if self.profile_root else None
+        try:
+            driver = create_driver(profile, self.browser_profile)
+        except Exception:
+            if profile:
+                shutil.rmtree(profile, ignore_errors=True)
+            raise
+        with self._lock:
+            self._job_counts[id(driver)] = 0
+            self._profiles[id(driver)] = profile
+        driver.get(self.site_url)
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            self._job_counts.pop(id(driver), None)
+            profile = self._profiles.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            log.warning(f"Error closing browser: {str(e)}")
+        if profile:
+            shutil.rmtree(profile, ignore_errors=True)
+
+    def warm_up(self, count=None):
+        """
+        Start browsers ahead of time so the first jobs do not wait for them.
+
+        Args:
+            count (int, optional): Number of browsers to start (default: max_sessions)
+        """
+        count = self.max_sessions if count is None else min(count, self.max_sessions)
+        drivers = [self.acquire() for _ in range(count)]
+        for driver in drivers:
+            self._slots.release()
+            self._idle.put(driver)
+
+    def acquire(self):
+        """
+        Take a warm browser from the pool, starting one if none is idle.
+
+        Blocks while max_sessions browsers are already in use.
+
+        Returns:
+            WebDriver: A browser showing the SWI page
+        """
+        if self._closed:
+            raise RuntimeError("DriverManager has been shut down")
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._start_session()
+                if is_driver_alive(driver):
+                    return driver
+                log.warning("Discarding idle browser that stopped responding")
+                self._discard(driver)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, driver, crashed=False):
+        """
+        Return a browser to the pool after a job.
+
+        Args:
+            driver (WebDriver): Browser obtained from acquire()
+            crashed (bool): Set when the job failed in a way that may have
+                left the browser unusable; the browser is then replaced
+        """
+        try:
+            with self._lock:
+                jobs_done = self._job_counts.get(id(driver), 0) + 1
+                self._job_counts[id(driver)] = jobs_done
+
+            if self._closed or crashed or not is_driver_alive(driver):
+                self._discard(driver)
+                return
+            if jobs_done >= self.max_jobs_per_session:
+                log.info(f"Recycling browser after {jobs_done} jobs")
+                self._discard(driver)
+                return
+
+            try:
+                reset_driver(driver, self.site_url)
+            except Exception as e:
+                log.warning(f"Error resetting browser, recycling it: {str(e)}")
+                self._discard(driver)
+                return
+            self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def session(self):
+        """Context manager that acquires a browser and releases it afterwards."""
+        driver = self.acquire()
+        crashed = False
+        try:
+            yield driver
+        except Exception:
+            crashed = not is_driver_alive(driver)
+            raise
+        finally:
+            self.release(driver, crashed=crashed)
+
+    def shutdown(self):
+        """Quit every idle browser and stop handing out new ones."""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+
+_default_manager = None
+_default_manager_lock = threading.Lock()
+
+
+def get_default_manager():
+    """
+    Return the process-wide DriverManager used when no driver is passed in.
+
+    Its browsers are quit automatically when the interpreter exits.
+    """
+    global _default_manager
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = DriverManager()
+            atexit.register(_default_manager.shutdown)
+        return _default_manager
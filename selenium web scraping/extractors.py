@@ -0,0 +1,329 @@
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional; the standard library parser is used without it
+    lxml = None
+
+from swi_series import parse_date
+
+# Serialises every <table> on the page in a single round trip. Mirrors the
+# per-element WebDriver loop it replaces: rows are all <tr> descendants, a row
+# uses its <td> cells or else its <th> cells, and cell text is the rendered
+# (visible) text, like WebElement.text.
+TABLES_SCRIPT = """
+    function cellText(cell) {
+        if (!cell.getClientRects().length) return '';
+        return (cell.innerText || '').replace(/[ \\t\\r\\n]+/g, ' ').trim();
+    }
+    var tables = document.querySelectorAll('table');
+    var result = [];
+    for (var t = 0; t < tables.length; t++) {
+        var rows = tables[t].querySelectorAll('tr');
+        var out = [];
+        for (var r = 0; r < rows.length; r++) {
+            var cells = rows[r].querySelectorAll('td');
+            if (!cells.length) cells = rows[r].querySelectorAll('th');
+            var row = [];
+            for (var c = 0; c < cells.length; c++) row.push(cellText(cells[c]));
+            out.push(row);
+        }
+        result.push(out);
+    }
+    return result;
+"""
+
+
+# Reads the data behind the page's charts in a single round trip. Tries the
+# charting libraries' own data models first (Highcharts, Chart.js, Plotly,
+# ECharts) and falls back to data bound to SVG elements (d3). Each series
+# comes back as {name, source, points: [[x, y], ...]}; x is whatever the
+# library holds (a timestamp in ms, a date string or a category label).
+CHART_SERIES_SCRIPT = """
+    var series = [];
+    function add(name, source, xs, ys) {
+        var points = [];
+        for (var i = 0; i < ys.length; i++) {
+            var y = ys[i];
+            if (y !== null && typeof y === 'object') y = ('y' in y) ? y.y : y.value;
+            if (Array.isArray(y)) y = y[y.length - 1];
+            if (y === null || y === undefined || y === '' || isNaN(Number(y))) continue;
+            points.push([xs[i] === undefined ? i : xs[i], Number(y)]);
+        }
+        if (points.length) series.push({name: String(name || ''), source: source, points: points});
+    }
+    function toX(v) { return (v instanceof Date) ? v.getTime() : v; }
+
+    try {
+        if (window.Highcharts && Highcharts.charts) {
+            Highcharts.charts.forEach(function (chart) {
+                if (!chart) return;
+                chart.series.forEach(function (s) {
+                    var xs = [], ys = [];
+                    var pts = (s.options && s.options.data) || [];
+                    for (var i = 0; i < pts.length; i++) {
+                        var p = pts[i];
+                        if (Array.isArray(p)) { xs.push(toX(p[0])); ys.push(p[p.length - 1]); }
+                        else if (p !== null && typeof p === 'object') {
+                            xs.push(toX(p.x !== undefined ? p.x : (p.name || (s.xAxis && s.xAxis.categories && s.xAxis.categories[i]))));
+                            ys.push(p.y);
+                        } else {
+                            var cats = s.xAxis && s.xAxis.categories;
+                            var start = (s.options && s.options.pointStart) || 0;
+                            var step = (s.options && s.options.pointInterval) || 1;
+                            xs.push(cats && cats[i] !== undefined ? cats[i] : start + i * step);
+                            ys.push(p);
+                        }
+                    }
+                    add(s.name, 'highcharts', xs, ys);
+                });
+            });
+        }
+    } catch (e) {}
+
+    try {
+        if (window.Chart && Chart.instances) {
+            var instances = Chart.instances;
+            Object.keys(instances).forEach(function (key) {
+                var chart = instances[key];
+                var cfg = chart.data || (chart.config && chart.config.data) || {};
+                var labels = (cfg.labels || []).map(toX);
+                (cfg.datasets || []).forEach(function (ds) {
+                    var xs = [], ys = [];
+                    (ds.data || []).forEach(function (p, i) {
+                        if (p !== null && typeof p === 'object' && !Array.isArray(p)) { xs.push(toX(p.x !== undefined ? p.x : p.t)); ys.push(p.y); }
+                        else { xs.push(labels[i]); ys.push(p); }
+                    });
+                    add(ds.label, 'chartjs', xs, ys);
+                });
+            });
+        }
+    } catch (e) {}
+
+    try {
+        document.querySelectorAll('.js-plotly-plot').forEach(function (el) {
+            (el.data || []).forEach(function (trace) {
+                add(trace.name, 'plotly', Array.prototype.slice.call(trace.x || []).map(toX),
+                    Array.prototype.slice.call(trace.y || []));
+            });
+        });
+    } catch (e) {}
+
+    try {
+        if (window.echarts) {
+            document.querySelectorAll('[_echarts_instance_]').forEach(function (el) {
+                var option = echarts.getInstanceByDom(el).getOption();
+                var axis = (option.xAxis && option.xAxis[0] && option.xAxis[0].data) || [];
+                (option.series || []).forEach(function (s) {
+                    var xs = [], ys = [];
+                    (s.data || []).forEach(function (p, i) {
+                        if (Array.isArray(p)) { xs.push(toX(p[0])); ys.push(p[1]); }
+                        else if (Array.isArray(p && p.value)) { xs.push(toX(p.value[0])); ys.push(p.value[1]); }
+                        else { xs.push(axis[i]); ys.push(p); }
+                    });
+                    add(s.name, 'echarts', xs, ys);
+                });
+            });
+        }
+    } catch (e) {}
+
+    if (!series.length) {
+        try {
+            var xs = [], ys = [];
+            document.querySelectorAll('svg circle, svg rect, svg path').forEach(function (el) {
+                var d = el.__data__;
+                if (d === undefined || d === null) return;
+                if (Array.isArray(d) && d.length && typeof d[0] === 'object') {
+                    d.forEach(function (p) {
+                        var x = p.date !== undefined ? p.date : p.x;
+                        var y = p.value !== undefined ? p.value : p.y;
+                        if (x !== undefined) { xs.push(toX(x)); ys.push(y); }
+                    });
+                } else if (typeof d === 'object') {
+                    var x = d.date !== undefined ? d.date : d.x;
+                    var y = d.value !== undefined ? d.value : d.y;
+                    if (x !== undefined) { xs.push(toX(x)); ys.push(y); }
+                }
+            });
+            add('', 'svg', xs, ys);
+        } catch (e) {}
+    }
+
+    return {
+        elements: document.querySelectorAll('canvas').length + document.querySelectorAll('svg').length,
+        series: series
+    };
+"""
+
+
+def rows_to_tables(tables):
+    """
+    Turn lists of rows into the table dicts returned by the scrapers.
+
+    The first row of each table is taken as its headers. Empty rows are
+    dropped, and so are tables with neither headers nor data.
+
+    Args:
+        tables (list): One list of rows (lists of cell strings) per table
+
+    Returns:
+        list: Table dicts with table_index, headers and data keys
+    """
+    all_tables = []
+    for table_idx, rows in enumerate(tables):
+        headers = rows[0] if rows else []
+        table_data = [row for row in rows[1:] if row]
+        if headers or table_data:
+            all_tables.append({"table_index": table_idx, "headers": headers, "data": table_data})
+    return all_tables
+
+
+def select_primary_table(all_tables):
+    """Return the first table that has data rows, or the first table if none do."""
+    for table_info in all_tables:
+        if table_info["data"]:
+            return table_info
+    return all_tables[0] if all_tables else None
+
+
+def extract_tables(driver):
+    """
+    Extract every table on the current page with one execute_script call.
+
+    Args:
+        driver (WebDriver): Browser showing the page
+
+    Returns:
+        list: Table dicts with table_index, headers and data keys
+    """
+    return rows_to_tables(driver.execute_script(TABLES_SCRIPT) or [])
+
+
+def _chart_x_to_date(x):
+    """Convert a chart x value (epoch milliseconds or date text) to a date."""
+    if isinstance(x, bool):
+        return None
+    if isinstance(x, (int, float)):
+        # Chart libraries store datetime axes as epoch milliseconds
+        if x > 10 ** 11:
+            return datetime.fromtimestamp(x / 1000, tz=timezone.utc).date()
+        return None
+    return parse_date(x)
+
+
+def extract_chart_series(driver):
+    """
+    Read the data series behind the page's charts with one execute_script call.
+
+    Args:
+        driver (WebDriver): Browser showing the page
+
+    Returns:
+        tuple: (number of chart elements, list of series). Each series is a
+        dict with name, source (the chart library) and points, a list of
+        [ISO date, float] pairs sorted by date. Points whose x value isn't a
+        date are dropped; series with no dated points are left out.
+    """
+    raw = driver.execute_script(CHART_SERIES_SCRIPT) or {}
+    series = []
+    for item in raw.get("series", []):
+        points = {}
+        for x, y in item.get("points", []):
+            day = _chart_x_to_date(x)
+            if day is not None and y is not None:
+                points[day] = float(y)
+        if points:
+            series.append({
+                "name": item.get("name", ""),
+                "source": item.get("source", ""),
+                "points": [[day.isoformat(), value] for day, value in sorted(points.items())],
+            })
+    return raw.get("elements", 0), series
+
+
+class _TableParser(HTMLParser):
+    """
+    Collects the text of every cell of every <table> in an HTML document.
+
+    Copes with omitted </td> and </tr> tags. A table nested inside a cell is
+    collected as a separate table and the outer row resumes after it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.tables = []
+        self._stack = []
+        self._table = None
+        self._row = None
+        self._cell = None
+
+    def _close_cell(self):
+        if self._cell is not None:
+            self._row.append(" ".join("".join(self._cell).split()))
+            self._cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self._row is not None:
+            self.tables[self._table].append(self._row)
+            self._row = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self._stack.append((self._table, self._row, self._cell))
+            self._table, self._row, self._cell = len(self.tables), None, None
+            self.tables.append([])
+        elif tag == "tr" and self._table is not None:
+            self._close_row()
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._close_cell()
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th"):
+            if self._row is not None:
+                self._close_cell()
+        elif tag == "tr":
+            self._close_row()
+        elif tag == "table" and self._stack:
+            self._close_row()
+            self._table, self._row, self._cell = self._stack.pop()
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def _parse_with_lxml(html):
+    tables = []
+    for table in lxml.html.fromstring(html).iter("table"):
+        rows = []
+        for row in table.iter("tr"):
+            cells = [c for c in row.iter("td")] or [c for c in row.iter("th")]
+            rows.append([" ".join(c.text_content().split()) for c in cells])
+        tables.append(rows)
+    return tables
+
+
+def parse_html_tables(html):
+    """
+    Extract every table from an HTML document without a browser.
+
+    Uses lxml when it is installed and the standard library parser otherwise.
+    Useful for parsing a saved page_source offline.
+
+    Args:
+        html (str): HTML text
+
+    Returns:
+        list: Table dicts with table_index, headers and data keys
+    """
+    if lxml is not None and html.strip():
+        return rows_to_tables(_parse_with_lxml(html))
+
+    parser = _TableParser()
+    parser.feed(html)
+    parser.close()
+    return rows_to_tables(parser.tables)
@@ -0,0 +1,203 @@
+from datetime import datetime
+
+from logs import get_logger
+
+log = get_logger("form_fill")
+
+# Typed date formats to try, in order, while the page's format isn't known.
+# DD/MM/YYYY comes first since it is the format the SWI page itself shows.
+DATE_FORMATS = {
+    "DD/MM/YYYY": "%d/%m/%Y",
+    "YYYY-MM-DD": "%Y-%m-%d",
+    "DD-MM-YYYY": "%d-%m-%Y",
+    "MM/DD/YYYY": "%m/%d/%Y",
+}
+# The only format an <input type="date"> accepts
+NATIVE_DATE_FORMAT = "YYYY-MM-DD"
+
+FIELDS = ("longitude", "latitude", "start_date", "end_date")
+
+# Sets each [element, value] pair the way typing would: through the native
+# value setter (so framework-bound inputs notice), followed by bubbling input
+# and change events. Returns what each input holds afterwards, and its type,
+# so the caller can tell whether the page kept the value.
+FILL_SCRIPT = """
+    var setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+    return arguments[0].map(function (pair) {
+        var el = pair[0];
+        if (!el) return null;
+        if (el instanceof HTMLInputElement) { setter.call(el, pair[1]); } else { el.value = pair[1]; }
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+        return [el.value, el.type || ''];
+    });
+"""
+
+
+def _same_number(text, wanted):
+    try:
+        return float(text) == float(wanted)
+    except (TypeError, ValueError):
+        return False
+
+
+def _kept_date(text, wanted, pattern):
+    """
+    Tell whether an input kept wanted's date, typed in pattern.
+
+    Returns:
+        str or None: "typed" if the value was left as typed, which says
+        nothing about how the page read it (see check_date_format),
+        "reformatted" if the page rewrote it to a value that means wanted
+        in every known format it parses in, or None if it kept neither
+    """
+    text = (text or "").strip()
+    if text == wanted.strftime(pattern):
+        return "typed"
+    dates = set()
+    for other in DATE_FORMATS.values():
+        try:
+            dates.add(datetime.strptime(text, other).date())
+        except ValueError:
+            continue
+    return "reformatted" if dates == {wanted.date()} else None
+
+
+def _format_order(date_format, exclude=()):
+    names = [name for name in DATE_FORMATS if name not in exclude]
+    if date_format in names:
+        names.remove(date_format)
+        names.insert(0, date_format)
+    return names
+
+
+def fill_query_form(driver, inputs, longitude, latitude, start_date, end_date, date_format=None, exclude=()):
+    """
+    Set the coordinates and both dates in one call and check what the page kept.
+
+    The first call fills all four fields with the first date format to try
+    and reads the values back. Only if the page didn't keep the dates are
+    the other formats tried, one call each and on the date fields alone.
+    A text input that keeps the dates exactly as typed doesn't show how the
+    page read them, so unless the format is date_format (already confirmed
+    for the page), a native date input, or the page rewrote the dates, the
+    result is left unconfirmed for check_date_format to settle.
+
+    Args:
+        driver (WebDriver): Browser showing the open Time Series form
+        inputs (dict): "longitude", "latitude", "start_date" and "end_date"
+            mapped to their input elements (or None if not found)
+        longitude (str): Longitude value
+        latitude (str): Latitude value
+        start_date (datetime): Start date
+        end_date (datetime): End date
+        date_format (str, optional): DATE_FORMATS key known to work on this
+            page, tried first
+        exclude (iterable): DATE_FORMATS keys the page already rejected or
+            misread during this query, not tried again
+
+    Returns:
+        dict: coordinates_ok and dates_ok (whether the page kept the
+        values), date_format (the format it kept, or None), date_confirmed
+        (whether that format is known to be read as meant), values (what
+        the inputs hold) and script_calls
+    """
+    elements = [inputs.get(name) for name in FIELDS]
+    date_elements = elements[2:]
+    wanted = [str(longitude), str(latitude)]
+    values = dict.fromkeys(FIELDS)
+    result = {"coordinates_ok": False, "dates_ok": False, "date_format": None, "date_confirmed": False,
+              "script_calls": 0}
+
+    formats = _format_order(date_format, exclude)
+    tried = []
+    # With every format excluded, the first call sets the coordinates alone
+    while formats or result["script_calls"] == 0:
+        name = formats.pop(0) if formats else None
+        dates = []
+        if name is not None:
+            tried.append(name)
+            dates = [start_date.strftime(DATE_FORMATS[name]), end_date.strftime(DATE_FORMATS[name])]
+        if result["script_calls"] == 0:
+            pairs = [[element, value] for element, value in zip(elements, wanted + dates)]
+        else:
+            pairs = [[element, value] for element, value in zip(date_elements, dates)]
+        read_back = driver.execute_script(FILL_SCRIPT, pairs)
+        result["script_calls"] += 1
+
+        if result["script_calls"] == 1:
+            for field, item in zip(FIELDS[:2], read_back[:2]):
+                values[field] = item[0] if item else None
+            result["coordinates_ok"] = all(_same_number(values[field], value)
+                                           for field, value in zip(FIELDS[:2], wanted))
+        if name is None or None in date_elements:
+            # Without both date inputs there is no format to check
+            break
+        date_read_back = read_back[-2:]
+        for field, item in zip(FIELDS[2:], date_read_back):
+            values[field] = item[0] if item else None
+
+        pattern = DATE_FORMATS[name]
+        kept = [_kept_date(values["start_date"], start_date, pattern),
+                _kept_date(values["end_date"], end_date, pattern)]
+        native = all(item and item[1] == "date" for item in date_read_back)
+        if None not in kept:
+            result["dates_ok"] = True
+            result["date_format"] = name
+            result["date_confirmed"] = name == date_format or native or "reformatted" in kept
+            break
+        # A native date input only takes one format; go straight to it
+        if any(item and item[1] == "date" for item in date_read_back) and NATIVE_DATE_FORMAT in formats:
+            formats.remove(NATIVE_DATE_FORMAT)
+            formats.insert(0, NATIVE_DATE_FORMAT)
+
+    result["values"] = values
+    if result["dates_ok"]:
+        state = "confirmed" if result["date_confirmed"] else "kept as typed, not yet confirmed"
+        log.info(f"Form filled in {result['script_calls']} call(s); dates accepted as {result['date_format']} "
+                 f"({state})")
+    else:
+        log.warning(f"Form filled in {result['script_calls']} call(s); the page did not keep the dates "
+                    f"(tried {', '.join(tried) or 'no format left'})")
+    if not result["coordinates_ok"]:
+        log.warning(f"The page did not keep the coordinates: longitude={values['longitude']!r}, "
+                    f"latitude={values['latitude']!r}")
+    return result
+
+
+def check_date_format(date_format, days, start_date, end_date):
+    """
+    Judge from the dates of a returned series whether the page read a typed date format as meant.
+
+    A plain text input keeps whatever is typed, so the read-back can't tell
+    03/04 meant as 3 April from 03/04 read as 4 March. The series settles it.
+
+    Args:
+        date_format (str): DATE_FORMATS key the dates were typed in
+        days (list): Dates of the values the query returned
+        start_date (datetime): Start date asked for
+        end_date (datetime): End date asked for
+
+    Returns:
+        str: "wrong" if some day falls outside the requested range (the
+        page read other dates), "confirmed" if the days run exactly from
+        the start to the end date, or none of them fit the range the typed
+        dates would mean in another known format, and "unconfirmed"
+        otherwise (no days, or days that fit either reading)
+    """
+    wanted = [start_date.date(), end_date.date()]
+    if not days:
+        return "unconfirmed"
+    if not all(wanted[0] <= day <= wanted[1] for day in days):
+        return "wrong"
+    if [min(days), max(days)] == wanted:
+        return "confirmed"
+    typed = [start_date.strftime(DATE_FORMATS[date_format]), end_date.strftime(DATE_FORMATS[date_format])]
+    for pattern in DATE_FORMATS.values():
+        try:
+            first, last = (datetime.strptime(text, pattern).date() for text in typed)
+        except ValueError:
+            continue
+        if [first, last] != wanted and all(first <= day <= last for day in days):
+            return "unconfirmed"
+    return "confirmed"
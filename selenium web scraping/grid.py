@@ -0,0 +1,142 @@
+import math
+from datetime import datetime, timedelta
+
+from swi_series import daily_values_to_table, table_to_daily_values
+
+# Pixel size of the SWI product in degrees. Points inside the same pixel get
+# the same values from the site, so they only need to be fetched once.
+GRID_RESOLUTION = 0.05
+GRID_ORIGIN = (0.0, 0.0)
+
+# Area covered by the SWI product (Indian region): lon_min, lon_max, lat_min, lat_max
+GRID_BOUNDS = (60.0, 100.0, 0.0, 40.0)
+
+
+def validate_coordinates(longitude, latitude, bounds=GRID_BOUNDS):
+    """
+    Check that a coordinate pair is numeric and inside the product's coverage.
+
+    Args:
+        longitude (str or float): Longitude value
+        latitude (str or float): Latitude value
+        bounds (tuple): lon_min, lon_max, lat_min, lat_max
+
+    Returns:
+        str or None: A description of the problem, or None if the point is valid
+    """
+    try:
+        lon, lat = float(longitude), float(latitude)
+    except (TypeError, ValueError):
+        return f"Coordinates must be numbers: {longitude}, {latitude}"
+    if math.isnan(lon) or math.isnan(lat):
+        return f"Coordinates must be numbers: {longitude}, {latitude}"
+
+    lon_min, lon_max, lat_min, lat_max = bounds
+    if not lon_min <= lon <= lon_max:
+        return f"Longitude {lon} is outside the SWI coverage ({lon_min} to {lon_max})"
+    if not lat_min <= lat <= lat_max:
+        return f"Latitude {lat} is outside the SWI coverage ({lat_min} to {lat_max})"
+    return None
+
+
+def snap_to_grid(longitude, latitude, resolution=GRID_RESOLUTION):
+    """
+    Move a point to the centre of the grid pixel that contains it.
+
+    Args:
+        longitude (str or float): Longitude value
+        latitude (str or float): Latitude value
+        resolution (float): Pixel size in degrees
+
+    Returns:
+        tuple: (longitude, latitude) of the pixel centre, rounded to 6 decimals
+    """
+    origin_lon, origin_lat = GRID_ORIGIN
+    col = math.floor((float(longitude) - origin_lon) / resolution)
+    row = math.floor((float(latitude) - origin_lat) / resolution)
+    return (round(origin_lon + (col + 0.5) * resolution, 6), round(origin_lat + (row + 0.5) * resolution, 6))
+
+
+def format_coordinate(value, resolution=GRID_RESOLUTION):
+    """Format a snapped coordinate with just enough decimals for the resolution."""
+    decimals = max(0, -math.floor(math.log10(resolution))) + 1
+    return f"{value:.{decimals}f}"
+
+
+def _parse(date_text):
+    return datetime.strptime(date_text, "%d/%m/%Y").date()
+
+
+def plan_fetches(jobs, resolution=GRID_RESOLUTION):
+    """
+    Merge jobs that fall in the same grid pixel into as few fetches as possible.
+
+    Jobs are grouped by pixel; within a pixel, overlapping or adjacent date
+    ranges are merged into one range. Each resulting fetch lists the jobs it
+    answers.
+
+    Args:
+        jobs (list): Valid job dicts (see jobs.load_jobs)
+        resolution (float): Pixel size in degrees
+
+    Returns:
+        list: Fetch dicts with longitude, latitude, start_date and end_date
+        (the snapped pixel centre and merged range) and "jobs"
+    """
+    by_cell = {}
+    for job in jobs:
+        cell = snap_to_grid(job["longitude"], job["latitude"], resolution)
+        by_cell.setdefault(cell, []).append(job)
+
+    fetches = []
+    for (lon, lat), cell_jobs in by_cell.items():
+        cell_jobs = sorted(cell_jobs, key=lambda j: _parse(j["start_date"]))
+        current = None
+        for job in cell_jobs:
+            start, end = _parse(job["start_date"]), _parse(job["end_date"])
+            if current and start <= current["end"] + timedelta(days=1):
+                current["end"] = max(current["end"], end)
+                current["jobs"].append(job)
+            else:
+                current = {"start": start, "end": end, "jobs": [job]}
+                fetches.append((lon, lat, current))
+
+    return [{
+        "longitude": format_coordinate(lon, resolution),
+        "latitude": format_coordinate(lat, resolution),
+        "start_date": group["start"].strftime("%d/%m/%Y"),
+        "end_date": group["end"].strftime("%d/%m/%Y"),
+        "jobs": group["jobs"],
+    } for lon, lat, group in fetches]
+
+
+def fan_out(data, job):
+    """
+    Cut the result of a merged fetch down to one job's date range.
+
+    Args:
+        data (dict): Result of fetching the merged range
+        job (dict): One of the jobs the fetch answered
+
+    Returns:
+        dict: Copy of data whose table and chart series only hold the job's
+        days. A table with no recognisable date column is passed through
+        unchanged.
+    """
+    if "error" in data:
+        return data
+    start, end = _parse(job["start_date"]), _parse(job["end_date"])
+    result = dict(data)
+
+    values = table_to_daily_values(data.get("table"))
+    if values:
+        table = daily_values_to_table([(day, value) for day, value in values
+                                       if start <= day <= end and value is not None])
+        result["table"] = table
+        result["all_tables"] = [table]
+
+    if data.get("chart_series"):
+        first, last = start.isoformat(), end.isoformat()
+        result["chart_series"] = [dict(series, points=[p for p in series["points"] if first <= p[0] <= last])
+                                  for series in data["chart_series"]]
+    return result
@@ -0,0 +1,252 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from extractors import parse_html_tables, rows_to_tables, select_primary_table
+from logs import get_logger
+
+log = get_logger("http_backend")
+
+# Endpoint the SWI page's JavaScript posts the Time Series form to, and the
+# names it gives each field. Check these against the request shown in the
+# browser's network tab if the site changes; every value can also be passed
+# to fetch_soil_wetness_data directly.
+SWI_DATA_ENDPOINT = "https://mosdac.gov.in/swi/timeseries"
+REQUEST_METHOD = "POST"
+REQUEST_FIELDS = {
+    "longitude": "lon",
+    "latitude": "lat",
+    "start_date": "start_date",
+    "end_date": "end_date",
+}
+REQUEST_DATE_FORMAT = "%d/%m/%Y"
+REQUEST_TIMEOUT = 30
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "application/json, text/html, text/csv, */*",
+    "X-Requested-With": "XMLHttpRequest",
+}
+
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class HttpBackendError(Exception):
+    """Raised when the SWI endpoint returns an error or a response we can't parse."""
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.status_code in RETRYABLE_STATUS_CODES
+
+
+def create_http_session(pool_size=10):
+    """
+    Create a requests session that keeps connections to the SWI host open.
+
+    Args:
+        pool_size (int): Maximum number of pooled connections per host
+
+    Returns:
+        requests.Session: Session to pass to fetch_soil_wetness_data
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def parse_json_series(payload):
+    """
+    Convert a JSON time series into a single table.
+
+    Accepts the common time series shapes: a list of row objects
+    (e.g. [{"date": ..., "swi": ...}]), a list of row lists with a header
+    row, parallel arrays ({"dates": [...], "values": [...]}), or any of
+    those wrapped in a "data" key.
+
+    Args:
+        payload: Decoded JSON
+
+    Returns:
+        list: Table dicts with table_index, headers and data keys
+    """
+    if isinstance(payload, dict) and "data" in payload and not {"dates", "values"} <= payload.keys():
+        payload = payload["data"]
+
+    if isinstance(payload, dict) and {"dates", "values"} <= payload.keys():
+        rows = [[str(d), str(v)] for d, v in zip(payload["dates"], payload["values"])]
+        return rows_to_tables([[["Date", "SWI"]] + rows]) if rows else []
+
+    if isinstance(payload, list) and payload and isinstance(payload[0], dict):
+        headers = list(payload[0].keys())
+        rows = [[str(item.get(h, "")) for h in headers] for item in payload]
+        return rows_to_tables([[headers] + rows])
+
+    if isinstance(payload, list) and payload and isinstance(payload[0], list):
+        return rows_to_tables([[[str(c) for c in row] for row in payload]])
+
+    raise HttpBackendError(f"Unrecognised JSON response shape: {type(payload).__name__}")
+
+
+def parse_response(content_type, body):
+    """
+    Parse an SWI endpoint response into table dicts.
+
+    Args:
+        content_type (str): Value of the Content-Type header
+        body (str): Response text
+
+    Returns:
+        list: Table dicts with table_index, headers and data keys
+    """
+    content_type = (content_type or "").lower()
+    stripped = body.lstrip()
+    if "json" in content_type or stripped.startswith(("{", "[")):
+        try:
+            return parse_json_series(json.loads(body))
+        except ValueError as e:
+            raise HttpBackendError(f"Invalid JSON response: {str(e)}")
+    if "html" in content_type or stripped.startswith("<"):
+        return parse_html_tables(body)
+    if "csv" in content_type or "text/plain" in content_type:
+        rows = [row for row in csv.reader(io.StringIO(body)) if row]
+        return rows_to_tables([rows])
+    raise HttpBackendError(f"Unsupported response content type: {content_type}")
+
+
+def build_request_fields(longitude, latitude, start_date, end_date, fields=None, date_format=None):
+    """Map the query onto the form field names and date format the endpoint expects."""
+    fields = fields or REQUEST_FIELDS
+    date_format = date_format or REQUEST_DATE_FORMAT
+    start = datetime.strptime(start_date, "%d/%m/%Y")
+    end = datetime.strptime(end_date, "%d/%m/%Y")
+    return {
+        fields["longitude"]: str(longitude),
+        fields["latitude"]: str(latitude),
+        fields["start_date"]: start.strftime(date_format),
+        fields["end_date"]: end.strftime(date_format),
+    }
+
+
+def fetch_soil_wetness_data(longitude, latitude, start_date, end_date, session=None,
+                            endpoint=None, method=None, timeout=REQUEST_TIMEOUT, fields=None, date_format=None):
+    """
+    Fetch soil wetness index data straight from the SWI data endpoint.
+
+    Sends the request the SWI page's JavaScript sends when the Time Series
+    form is submitted, without starting a browser.
+
+    Args:
+        longitude (str): Longitude value
+        latitude (str): Latitude value
+        start_date (str): Start date in format DD/MM/YYYY
+        end_date (str): End date in format DD/MM/YYYY
+        session (requests.Session, optional): Pooled session from create_http_session;
+            without one, a session is opened for this request and closed after it
+        endpoint (str, optional): Data endpoint URL (default: SWI_DATA_ENDPOINT)
+        method (str, optional): "POST" or "GET" (default: REQUEST_METHOD)
+        timeout (float): Request timeout in seconds
+        fields (dict, optional): Request field name for each of longitude,
+            latitude, start_date and end_date (default: REQUEST_FIELDS)
+        date_format (str, optional): strftime format the endpoint expects
+            dates in (default: REQUEST_DATE_FORMAT)
+
+    Returns:
+        dict: Same structure as scrape_soil_wetness_data ("table", "all_tables",
+        "timings"). If the request failed, "error" is set along with
+        "retryable" and, when the server sent them, "status_code" and
+        "retry_after"
+    """
+    own_session = session is None
+    session = session or create_http_session(pool_size=1)
+    endpoint = endpoint or SWI_DATA_ENDPOINT
+    method = (method or REQUEST_METHOD).upper()
+    started = time.perf_counter()
+
+    try:
+        request_fields = build_request_fields(longitude, latitude, start_date, end_date, fields, date_format)
+        if method == "GET":
+            response = session.get(endpoint, params=request_fields, timeout=timeout)
+        else:
+            response = session.post(endpoint, data=request_fields, timeout=timeout)
+        request_seconds = time.perf_counter() - started
+
+        if response.status_code != 200:
+            raise HttpBackendError(f"SWI endpoint returned HTTP {response.status_code}",
+                                   status_code=response.status_code,
+                                   retry_after=response.headers.get("Retry-After"))
+
+        all_tables = parse_response(response.headers.get("Content-Type"), response.text)
+    except (requests.RequestException, HttpBackendError, ValueError) as e:
+        error = {
+            "error": str(e),
+            "backend": "http",
+            # Network failures and throttling/server errors are worth retrying;
+            # bad input and unparseable responses are not
+            "retryable": isinstance(e, requests.RequestException) or getattr(e, "retryable", False),
+            "timings": {"total": round(time.perf_counter() - started, 3)},
+        }
+        if getattr(e, "status_code", None):
+            error["status_code"] = e.status_code
+        if getattr(e, "retry_after", None):
+            error["retry_after"] = e.retry_after
+        return error
+    finally:
+        if own_session:
+            session.close()
+
+    data = {"backend": "http"}
+    if all_tables:
+        data["all_tables"] = all_tables
+        data["table"] = select_primary_table(all_tables)
+    data["timings"] = {
+        "request": round(request_seconds, 3),
+        "parse": round(time.perf_counter() - started - request_seconds, 3),
+        "total": round(time.perf_counter() - started, 3),
+    }
+    return data
+
+
+def has_table_data(data):
+    """Return True if a result dict holds a table with at least one data row."""
+    return bool(data) and "error" not in data and bool((data.get("table") or {}).get("data"))
+
+
+def fetch_with_browser_fallback(longitude, latitude, start_date, end_date, session=None, **kwargs):
+    """
+    Try the HTTP backend first and fall back to the browser scraper.
+
+    The browser path is used when the HTTP request fails or returns no table.
+
+    Args:
+        longitude (str): Longitude value
+        latitude (str): Latitude value
+        start_date (str): Start date in format DD/MM/YYYY
+        end_date (str): End date in format DD/MM/YYYY
+        session (requests.Session, optional): Pooled session from create_http_session
+        **kwargs: Passed on to fetch_soil_wetness_data
+
+    Returns:
+        dict: The scraped data
+    """
+    data = fetch_soil_wetness_data(longitude, latitude, start_date, end_date, session=session, **kwargs)
+    if has_table_data(data):
+        return data
+
+    log.info(f"HTTP backend gave no data ({data.get('error', 'empty table')}), falling back to browser...")
+    # Imported here so the HTTP path never loads Selenium
+    from scrape_mosdac import scrape_soil_wetness_data
+    return scrape_soil_wetness_data(longitude, latitude, start_date, end_date)
@@ -0,0 +1,213 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+from recovery import BAD_INPUT, COORDINATE_WORDS
+from swi_series import result_to_daily_values
+
+# Job states. pending and failed jobs are run by the next batch; dead jobs
+# (dead-lettered) are left alone until they are requeued by hand.
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+DEAD = "dead"
+STATES = (PENDING, RUNNING, DONE, FAILED, DEAD)
+
+DEFAULT_MAX_ATTEMPTS = 3
+# Jobs the site keeps rejecting with a coordinate alert won't succeed on retry
+DEFAULT_DEAD_LETTER_AFTER_ALERTS = 2
+
+
+def job_key(job):
+    """Return the key that identifies a job across runs of the same job file."""
+    return "|".join(str(job.get(field, "")) for field in ("job_id", "longitude", "latitude", "start_date", "end_date"))
+
+
+def is_coordinate_alert(data):
+    """
+    Return True if a result shows the site rejected the query's coordinates.
+
+    That is either a BAD_INPUT failure whose alert or error mentions the
+    coordinates, or a coordinate alert the scraper worked around without
+    getting any values.
+    """
+    if data.get("failure") == BAD_INPUT:
+        text = f"{data.get('coordinate_alert') or ''} {data.get('error', '')}".lower()
+        return any(word in text for word in COORDINATE_WORDS)
+    return bool(data.get("coordinate_alert")) and "error" not in data and not result_to_daily_values(data)
+
+
+class JobQueue:
+    """
+    Durable queue of batch jobs and their state, stored in SQLite.
+
+    Every job is recorded once with its state (pending, running, done,
+    failed or dead) and attempt count, and each state change is committed
+    straight away. After a crash, recover() puts the jobs that were running
+    back to pending, so a restarted run only repeats the jobs that were in
+    flight. Enqueueing the same jobs again is a no-op, so re-running a batch
+    skips the jobs that already finished.
+
+    Failed jobs are retried by later runs until they have used max_attempts.
+    Jobs that keep hitting the coordinate alert (dead_letter_after times) or
+    run out of attempts are dead-lettered.
+    """
+
+    def __init__(self, path, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 dead_letter_after=DEFAULT_DEAD_LETTER_AFTER_ALERTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.dead_letter_after = dead_letter_after
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_key TEXT PRIMARY KEY,
+                job TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                alerts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)")
+        self._conn.commit()
+
+    def enqueue(self, jobs):
+        """
+        Add jobs that are not in the queue yet.
+
+        Returns:
+            int: Number of jobs added
+        """
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (job_key, job, state, updated_at) VALUES (?, ?, ?, ?)",
+                [(job_key(job), json.dumps(job), PENDING, now) for job in jobs]
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def recover(self):
+        """
+        Put jobs left running by an interrupted run back to pending.
+
+        Returns:
+            int: Number of jobs recovered
+        """
+        with self._lock:
+            count = self._conn.execute("UPDATE jobs SET state = ?, updated_at = ? WHERE state = ?",
+                                       (PENDING, time.time(), RUNNING)).rowcount
+            self._conn.commit()
+        return count
+
+    def runnable(self):
+        """Return the pending and failed jobs, in the order they were added."""
+        with self._lock:
+            rows = self._conn.execute("SELECT job FROM jobs WHERE state IN (?, ?) ORDER BY rowid",
+                                      (PENDING, FAILED)).fetchall()
+        return [json.loads(job) for job, in rows]
+
+    def mark_running(self, jobs):
+        """Mark jobs as running and count the attempt."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, updated_at = ? WHERE job_key = ?",
+                [(RUNNING, time.time(), job_key(job)) for job in jobs]
+            )
+            self._conn.commit()
+
+    def record_result(self, job, data):
+        """
+        Store the outcome of a job's attempt.
+
+        Args:
+            job (dict): The job
+            data (dict): The job's scraper result
+
+        Returns:
+            str: The job's new state
+        """
+        key = job_key(job)
+        coordinate_alert = is_coordinate_alert(data)
+        error = data.get("error") or (f"Coordinate alert: {data['coordinate_alert']}" if coordinate_alert else None)
+
+        with self._lock:
+            row = self._conn.execute("SELECT attempts, alerts FROM jobs WHERE job_key = ?", (key,)).fetchone()
+            attempts, alerts = row if row else (1, 0)
+            alerts += 1 if coordinate_alert else 0
+            if error is None:
+                state = DONE
+            elif alerts >= self.dead_letter_after or attempts >= self.max_attempts:
+                state = DEAD
+            else:
+                state = FAILED
+            self._conn.execute("UPDATE jobs SET state = ?, alerts = ?, last_error = ?, updated_at = ? "
+                               "WHERE job_key = ?", (state, alerts, error, time.time(), key))
+            self._conn.commit()
+        return state
+
+    def requeue_dead(self):
+        """
+        Give dead-lettered jobs a fresh set of attempts.
+
+        Returns:
+            int: Number of jobs requeued
+        """
+        with self._lock:
+            count = self._conn.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, alerts = 0, updated_at = ? WHERE state = ?",
+                (PENDING, time.time(), DEAD)
+            ).rowcount
+            self._conn.commit()
+        return count
+
+    def counts(self):
+        """Return the number of jobs in each state."""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(rows)
+        return counts
+
+    def dead_letters(self):
+        """Return the dead-lettered jobs with their attempts and last error."""
+        with self._lock:
+            rows = self._conn.execute("SELECT job, attempts, alerts, last_error FROM jobs WHERE state = ? "
+                                      "ORDER BY rowid", (DEAD,)).fetchall()
+        return [dict(json.loads(job), attempts=attempts, alerts=alerts, last_error=error)
+                for job, attempts, alerts, error in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or manage a batch job queue.")
+    parser.add_argument("queue", help="SQLite queue file used with batch_scrape.py --queue")
+    parser.add_argument("--dead", action="store_true", help="List dead-lettered jobs")
+    parser.add_argument("--requeue-dead", action="store_true", help="Give dead-lettered jobs another chance")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.queue)
+    try:
+        if args.requeue_dead:
+            print(f"Requeued {queue.requeue_dead()} dead-lettered jobs")
+        if args.dead:
+            for job in queue.dead_letters():
+                print(json.dumps(job))
+        print(f"Jobs by state: {queue.counts()}")
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import csv
+import json
+import sys
+from datetime import datetime
+
+from grid import validate_coordinates
+
+JOB_FIELDS = ("longitude", "latitude", "start_date", "end_date")
+
+
+def validate_job(job):
+    """
+    Check that a job has usable coordinates and dates.
+
+    Args:
+        job (dict): Job with longitude, latitude, start_date and end_date keys
+
+    Returns:
+        str or None: A description of the problem, or None if the job is valid
+    """
+    for field in JOB_FIELDS:
+        if not str(job.get(field, "")).strip():
+            return f"Missing {field}"
+
+    problem = validate_coordinates(job["longitude"], job["latitude"])
+    if problem:
+        return problem
+
+    for field in ("start_date", "end_date"):
+        try:
+            datetime.strptime(job[field], "%d/%m/%Y")
+        except ValueError:
+            return f"Invalid {field} (expected DD/MM/YYYY): {job[field]}"
+
+    if datetime.strptime(job["start_date"], "%d/%m/%Y") > datetime.strptime(job["end_date"], "%d/%m/%Y"):
+        return "start_date is after end_date"
+
+    return None
+
+
+def load_jobs(path):
+    """
+    Read scraping jobs from a CSV or JSONL file, or from stdin.
+
+    CSV files need a header row with longitude, latitude, start_date and
+    end_date columns. JSONL files hold one JSON object per line with the
+    same keys. An optional job_id column/key is kept; otherwise jobs are
+    numbered in file order. Jobs read from stdin are taken as JSONL if the
+    input starts with "{", and as CSV otherwise.
+
+    Args:
+        path (str): Path to a .csv or .jsonl file, or "-" for stdin
+
+    Returns:
+        list: List of job dicts with string values
+    """
+    jobs = []
+    if path == "-":
+        text = sys.stdin.read()
+        if text.lstrip().startswith("{"):
+            jobs = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            jobs = list(csv.DictReader(text.splitlines()))
+    elif path.lower().endswith((".jsonl", ".ndjson", ".json")):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    jobs.append(json.loads(line))
+    else:
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                jobs.append(row)
+
+    normalized = []
+    for i, job in enumerate(jobs):
+        entry = {field: str(job.get(field, "")).strip() for field in JOB_FIELDS}
+        entry["job_id"] = str(job.get("job_id") or i + 1)
+        normalized.append(entry)
+    return normalized
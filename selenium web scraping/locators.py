@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import threading
+
+from logs import get_logger
+
+log = get_logger("locators")
+
+DEFAULT_LOCATOR_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".mosdac_swi_locators.json")
+
+# Elements the scraper needs, in the order they are used
+LOCATOR_NAMES = ("time_series", "longitude", "latitude", "start_date", "end_date", "submit")
+
+# Describes the page's build: title, script and stylesheet URLs and the
+# number of form controls. It changes when the site is redeployed with a
+# different layout, which is when cached selectors may stop matching.
+FINGERPRINT_SCRIPT = """
+    var scripts = Array.prototype.map.call(document.scripts, function (s) { return s.src; }).filter(Boolean);
+    var styles = Array.prototype.map.call(document.querySelectorAll('link[rel=stylesheet]'),
+                                          function (l) { return l.href; });
+    return {
+        title: document.title,
+        scripts: scripts.sort(),
+        styles: styles.sort(),
+        inputs: document.querySelectorAll('input').length,
+        buttons: document.querySelectorAll('button').length
+    };
+"""
+
+# Finds the elements for a {name: selector} map in one round trip
+RESOLVE_SCRIPT = """
+    var selectors = arguments[0], found = {};
+    Object.keys(selectors).forEach(function (name) {
+        try { found[name] = document.querySelector(selectors[name]); } catch (e) { found[name] = null; }
+    });
+    return found;
+"""
+
+# Builds a CSS selector that uniquely matches each element: its id when the
+# id is unique, otherwise a tag:nth-of-type path from the nearest unique id.
+# Elements inside a shadow root get null, as no document selector reaches them.
+SELECTOR_SCRIPT = """
+    function uniqueId(el) {
+        return el.id && document.querySelectorAll('#' + CSS.escape(el.id)).length === 1;
+    }
+    function cssPath(el) {
+        if (!el || el.getRootNode() !== document) return null;
+        var parts = [];
+        while (el && el.nodeType === 1) {
+            if (uniqueId(el)) { parts.unshift('#' + CSS.escape(el.id)); break; }
+            var tag = el.tagName.toLowerCase();
+            if (el === document.documentElement) { parts.unshift(tag); break; }
+            var index = 1, sibling = el;
+            while ((sibling = sibling.previousElementSibling)) {
+                if (sibling.tagName === el.tagName) index++;
+            }
+            parts.unshift(tag + ':nth-of-type(' + index + ')');
+            el = el.parentElement;
+        }
+        return parts.join(' > ');
+    }
+    return arguments[0].map(cssPath);
+"""
+
+
+class LocatorCache:
+    """
+    Selectors that located the form's elements, and the date format the
+    form accepted, keyed by page fingerprint.
+
+    Stored as a JSON file shared by every run (and process) on the machine.
+    With path=None the cache only lives in memory.
+    """
+
+    def __init__(self, path=DEFAULT_LOCATOR_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"Ignoring unreadable locator cache {self.path}: {str(e)}")
+            return {}
+
+    def _write(self, drop=None):
+        if not self.path:
+            return
+        # Merge with what other processes saved meanwhile, then replace the file atomically
+        merged = self._load()
+        merged.update(self._entries)
+        merged.pop(drop, None)
+        self._entries = merged
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(merged, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get(self, fingerprint):
+        """Return the entry for a page version: {name: selector, "date_format": ...} (empty if unknown)."""
+        with self._lock:
+            return dict(self._entries.get(fingerprint, {}))
+
+    def update(self, fingerprint, selectors):
+        """Add or replace selectors (or the date format) for a page version."""
+        with self._lock:
+            self._entries.setdefault(fingerprint, {}).update(selectors)
+            self._write()
+
+    def forget(self, fingerprint):
+        """Drop every selector cached for a page version."""
+        with self._lock:
+            self._entries.pop(fingerprint, None)
+            self._write(drop=fingerprint)
+
+    def clear(self):
+        """Drop every cached entry and delete the file. Returns the number of entries removed."""
+        with self._lock:
+            entries = self._load()
+            entries.update(self._entries)
+            removed = len(entries)
+            self._entries = {}
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+            return removed
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_locator_cache():
+    """Return the process-wide LocatorCache stored at DEFAULT_LOCATOR_CACHE_PATH."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LocatorCache()
+        return _default_cache
+
+
+def page_fingerprint(driver):
+    """Return a short hash identifying the version of the page the browser shows."""
+    description = json.dumps(driver.execute_script(FINGERPRINT_SCRIPT), sort_keys=True)
+    return hashlib.sha1(description.encode("utf-8")).hexdigest()[:16]
+
+
+class LocatorResolver:
+    """
+    Finds the form's elements from cached selectors, and learns new ones.
+
+    resolve() looks up every cached selector for the current page version in
+    a single call. Elements the scraper had to find with its fallback
+    cascade are passed to remember(); save() stores their selectors once
+    the query has produced results, so a wrong guess is never cached. If a
+    query that used cached selectors gets no results, invalidate() drops
+    them so the next run goes through the cascade again.
+    """
+
+    def __init__(self, driver, cache):
+        self.driver = driver
+        self.cache = cache
+        self.fingerprint = page_fingerprint(driver)
+        self.hits = []
+        self.date_format = None
+        self._learned = {}
+        self._date_format = None
+        self.saved = []
+
+    def resolve(self):
+        """
+        Find the elements cached for this page version.
+
+        Returns:
+            dict: name -> WebElement for every cached selector that still matches
+        """
+        entry = self.cache.get(self.fingerprint)
+        self.date_format = entry.get("date_format")
+        selectors = {name: entry[name] for name in LOCATOR_NAMES if name in entry}
+        if not selectors:
+            return {}
+        found = self.driver.execute_script(RESOLVE_SCRIPT, selectors) or {}
+        elements = {name: element for name, element in found.items() if element is not None}
+        self.hits = sorted(elements)
+        return elements
+
+    def remember(self, name, element):
+        """Note an element found by the fallback cascade, to be cached by save()."""
+        if element is not None and name not in self.hits:
+            self._learned[name] = element
+
+    def remember_date_format(self, date_format):
+        """Note the date format the form accepted, to be cached by save()."""
+        if date_format != self.date_format:
+            self._date_format = date_format
+
+    def save(self):
+        """
+        Cache the remembered elements' selectors and date format for this page version.
+
+        The names stored are kept in saved, and a new date format becomes
+        date_format, so stats() still reports them afterwards.
+        """
+        learned = {}
+        if self._learned:
+            names = list(self._learned)
+            selectors = self.driver.execute_script(SELECTOR_SCRIPT, [self._learned[name] for name in names])
+            learned = {name: selector for name, selector in zip(names, selectors) if selector}
+        if self._date_format:
+            learned["date_format"] = self._date_format
+        if learned:
+            self.cache.update(self.fingerprint, learned)
+            log.info(f"Cached locators for page version {self.fingerprint}: {', '.join(sorted(learned))}")
+        self.saved = sorted(name for name in learned if name != "date_format")
+        if self._date_format:
+            self.date_format = self._date_format
+        self._learned = {}
+        self._date_format = None
+
+    def invalidate(self):
+        """Forget this page version's cached selectors and date format if any were used."""
+        if self.hits or self.date_format:
+            log.warning(f"Cached locators for page version {self.fingerprint} led to no results; forgetting them")
+            self.cache.forget(self.fingerprint)
+            self.hits = []
+            self.date_format = None
+
+    def stats(self):
+        """Return the fingerprint and which locators came from the cache."""
+        return {"fingerprint": self.fingerprint, "cached": self.hits,
+                "learned": sorted(set(self._learned) | set(self.saved)),
+                "date_format": self._date_format or self.date_format}
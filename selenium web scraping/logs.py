@@ -0,0 +1,136 @@
+import contextlib
+import contextvars
+import json
+import logging
+import sys
+
+# Parent of every logger in this project; configure_logging() sets it up
+LOGGER_NAME = "mosdac_swi"
+LOG_FORMATS = ("json", "text")
+LOG_LEVELS = ("debug", "info", "warning", "error")
+
+# Fields (job id, coordinates...) added to every record logged while a job
+# runs. Kept in a context variable so concurrent jobs on other threads or
+# asyncio tasks don't see each other's fields.
+_job_fields = contextvars.ContextVar("mosdac_swi_job_fields", default={})
+
+
+def get_logger(name):
+    """Return the logger for one module, under the project's parent logger."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def bind_job(**fields):
+    """
+    Add fields to every record logged from the current thread or task.
+
+    Fields that are None are left out. Returns a token for unbind_job().
+    """
+    merged = dict(_job_fields.get())
+    merged.update({key: value for key, value in fields.items() if value is not None})
+    return _job_fields.set(merged)
+
+
+def unbind_job(token):
+    """Restore the fields that were bound before the matching bind_job()."""
+    _job_fields.reset(token)
+
+
+@contextlib.contextmanager
+def job_context(**fields):
+    """
+    Bind job fields for the duration of a with block.
+
+        with job_context(job_id="7", longitude="77.88", latitude="23.47"):
+            scrape_soil_wetness_data(...)
+    """
+    token = bind_job(**fields)
+    try:
+        yield
+    finally:
+        unbind_job(token)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON object per line, for log shipping.
+
+    Every line has ts, level, logger and message, then the bound job fields
+    and any fields passed with extra={"fields": {...}}.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_job_fields.get())
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formats records as plain messages, prefixed with the job they belong to."""
+
+    def format(self, record):
+        fields = _job_fields.get()
+        message = record.getMessage()
+        if record.levelno >= logging.WARNING:
+            message = f"{record.levelname}: {message}"
+        if "job_id" in fields:
+            message = f"[job {fields['job_id']}] {message}"
+        elif "longitude" in fields:
+            message = f"[{fields['longitude']}, {fields.get('latitude')}] {message}"
+        if record.exc_info:
+            message += "\n" + self.formatException(record.exc_info)
+        return message
+
+
+def configure_logging(level="info", fmt="json", stream=None):
+    """
+    Send the project's log records to a stream.
+
+    Calling it again replaces the previous configuration.
+
+    Args:
+        level (str): "debug", "info", "warning" or "error". Costly
+            diagnostics (such as dumping every form input's attributes)
+            are only collected at "debug"
+        fmt (str): "json" for one JSON object per line, or "text" for
+            plain messages
+        stream (file, optional): Where to write. Defaults to stderr, which
+            keeps stdout free for results
+
+    Returns:
+        Logger: The project's parent logger
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(level.upper())
+    logger.propagate = False
+    return logger
+
+
+def current_config():
+    """
+    Return the arguments configure_logging() was last called with.
+
+    Used to set up logging the same way in worker processes.
+
+    Returns:
+        dict or None: level and fmt, or None if logging was not configured
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in logger.handlers:
+        if isinstance(handler.formatter, (JsonFormatter, TextFormatter)):
+            return {"level": logging.getLevelName(logger.level).lower(),
+                    "fmt": "json" if isinstance(handler.formatter, JsonFormatter) else "text"}
+    return None
@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import time
+
+# Prefix of every exported Prometheus metric
+METRIC_PREFIX = "mosdac_swi"
+QUANTILES = (0.5, 0.95)
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def summarize(samples):
+    """Return count, mean, p50, p95 and max of a list of seconds."""
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean": round(sum(samples) / len(samples), 4),
+        "p50": round(percentile(samples, 0.5), 4),
+        "p95": round(percentile(samples, 0.95), 4),
+        "max": round(max(samples), 4),
+    }
+
+
+def add_fetch_stats(totals, data):
+    """
+    Add a result's step timings and event counters to running totals.
+
+    Used where one answer is assembled from several fetches (cache gaps,
+    date chunks).
+
+    Args:
+        totals (dict): "timings" and "counters" dicts, updated in place;
+            "backend" is set to the result's backend if it has one
+        data (dict): A fetch result
+    """
+    for key in ("timings", "counters"):
+        target = totals.setdefault(key, {})
+        for name, amount in data.get(key, {}).items():
+            target[name] = round(target.get(name, 0) + amount, 3)
+    if "backend" in data:
+        totals["backend"] = data["backend"]
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{str(value)}"' for key, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    """
+    Collects stage timings, event counters and per-fetch traces for a batch.
+
+    Every finished fetch is passed to record_fetch(), which files its step
+    timings under (backend, stage), adds up its event counters (fallbacks,
+    alerts, cache hits...) and, with trace_path set, appends a trace record
+    to a JSONL file straight away. At the end, report() prints p50/p95 per
+    stage and write_prometheus() exports everything in the Prometheus text
+    format (e.g. for node_exporter's textfile collector).
+
+        metrics = MetricsRegistry("traces.jsonl")
+        metrics.record_fetch(plan, data, elapsed)
+        metrics.report()
+        metrics.write_prometheus("swi.prom")
+    """
+
+    def __init__(self, trace_path=None):
+        self._lock = threading.Lock()
+        self.stage_samples = {}
+        self.counters = {}
+        self.jobs = {}
+        self._trace_out = open(trace_path, "a", encoding="utf-8") if trace_path else None
+
+    def observe(self, backend, stage, seconds):
+        """Add one timing sample for a stage."""
+        with self._lock:
+            self.stage_samples.setdefault((backend, stage), []).append(seconds)
+
+    def increment(self, name, amount=1):
+        """Add to an event counter."""
+        if not amount:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_steps(self, backend, timings):
+        """Add the samples of a StepTimer.as_dict(), e.g. from save_data_to_files."""
+        for stage, seconds in timings.items():
+            self.observe(backend, stage, seconds)
+
+    def record_fetch(self, query, data, elapsed, attempts=1):
+        """
+        Record one finished fetch.
+
+        Args:
+            query (dict): The fetch's longitude, latitude, start_date,
+                end_date and optionally jobs (the jobs it answers)
+            data (dict): The fetch's result (scraper, HTTP backend or cache)
+            elapsed (float): Seconds the fetch took
+            attempts (int): Tries it took, if it was retried
+        """
+        status = "error" if "error" in data else "ok"
+        # Only fetches answered wholly from the result cache count as "cache";
+        # cache misses are timed under the backend that filled the gaps
+        cache = data.get("cache")
+        if cache and not cache.get("fetched_ranges"):
+            backend = "cache"
+        else:
+            backend = data.get("backend") or "browser"
+        with self._lock:
+            self.jobs[status] = self.jobs.get(status, 0) + 1
+        self.record_steps(backend, data.get("timings", {}))
+        self.observe("batch", "fetch", elapsed)
+        for name, amount in data.get("counters", {}).items():
+            self.increment(name, amount)
+        self.increment("retries", attempts - 1)
+        if cache:
+            self.increment("result_cache_days", cache.get("cached_days", 0))
+            if cache.get("cached_days") and not cache.get("fetched_ranges"):
+                self.increment("result_cache_hits")
+        if data.get("coordinate_alert"):
+            self.increment("coordinate_alerts")
+
+        if self._trace_out is not None:
+            trace = {
+                "type": "trace",
+                "timestamp": round(time.time(), 3),
+                "job_ids": [job.get("job_id") for job in query.get("jobs", [])],
+                "longitude": query.get("longitude"),
+                "latitude": query.get("latitude"),
+                "start_date": query.get("start_date"),
+                "end_date": query.get("end_date"),
+                "status": status,
+                "backend": backend,
+                "elapsed_seconds": elapsed,
+                "attempts": attempts,
+                "stages": data.get("timings", {}),
+                "counters": data.get("counters", {}),
+            }
+            if "error" in data:
+                trace["error"] = data["error"]
+            with self._lock:
+                self._trace_out.write(json.dumps(trace) + "\n")
+                self._trace_out.flush()
+
+    def summary(self):
+        """Return fetch counts by status, p50/p95 per "backend.stage" and the counters."""
+        with self._lock:
+            return {
+                "fetches": dict(self.jobs),
+                "stages": {f"{backend}.{stage}": summarize(samples)
+                           for (backend, stage), samples in sorted(self.stage_samples.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def report(self):
+        """Print p50/p95 per stage, slowest first, and the counters."""
+        summary = self.summary()
+        stages = sorted(summary["stages"].items(), key=lambda item: -item[1].get("p50", 0))
+        print(f"Stage latency over {sum(summary['fetches'].values())} fetches (p50 / p95 / count):")
+        for name, stats in stages:
+            print(f"  {name:<28} {stats['p50']:>8.3f}s {stats['p95']:>8.3f}s {stats['count']:>6}")
+        if summary["counters"]:
+            print("Events: " + ", ".join(f"{name}={count}" for name, count in summary["counters"].items()))
+
+    def prometheus_text(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            stage_samples = {key: list(samples) for key, samples in self.stage_samples.items()}
+            counters = dict(self.counters)
+            jobs = dict(self.jobs)
+
+        lines = [f"# HELP {METRIC_PREFIX}_stage_seconds Seconds spent in each scraping stage",
+                 f"# TYPE {METRIC_PREFIX}_stage_seconds summary"]
+        for (backend, stage), samples in sorted(stage_samples.items()):
+            for quantile in QUANTILES:
+                lines.append(f"{METRIC_PREFIX}_stage_seconds"
+                             f"{_labels(backend=backend, stage=stage, quantile=quantile)} "
+                             f"{percentile(samples, quantile)}")
+            labels = _labels(backend=backend, stage=stage)
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_sum{labels} {round(sum(samples), 3)}")
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_count{labels} {len(samples)}")
+
+        lines += [f"# HELP {METRIC_PREFIX}_fetches_total Fetches finished, by status",
+                  f"# TYPE {METRIC_PREFIX}_fetches_total counter"]
+        lines += [f"{METRIC_PREFIX}_fetches_total{_labels(status=status)} {count}"
+                  for status, count in sorted(jobs.items())]
+
+        lines += [f"# HELP {METRIC_PREFIX}_events_total Fallbacks, alerts, retries and cache hits",
+                  f"# TYPE {METRIC_PREFIX}_events_total counter"]
+        lines += [f"{METRIC_PREFIX}_events_total{_labels(event=name)} {count}"
+                  for name, count in sorted(counters.items())]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write prometheus_text() to a file, replacing it atomically."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def close(self):
+        if self._trace_out is not None:
+            self._trace_out.close()
+            self._trace_out = None
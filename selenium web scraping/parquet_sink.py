@@ -0,0 +1,190 @@
+import os
+import uuid
+from datetime import date, datetime
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from grid import GRID_RESOLUTION, snap_to_grid
+from swi_series import result_to_daily_values
+
+# Columns stored in every Parquet file. The grid cell and year are not stored
+# in the files; they come from the folder names (cell_lon=.../cell_lat=.../year=...).
+FILE_SCHEMA = pa.schema([
+    ("date", pa.date32()),
+    ("lon", pa.float64()),
+    ("lat", pa.float64()),
+    ("swi", pa.float64()),
+    ("fetched_at", pa.timestamp("s")),
+])
+
+PARTITION_SCHEMA = pa.schema([
+    ("cell_lon", pa.float64()),
+    ("cell_lat", pa.float64()),
+    ("year", pa.int16()),
+])
+
+DEFAULT_BATCH_ROWS = 50_000
+
+
+def result_to_rows(data, longitude, latitude, resolution=GRID_RESOLUTION):
+    """
+    Convert a scraper result into typed rows for the dataset.
+
+    Args:
+        data (dict): Result from scrape_soil_wetness_data or the HTTP backend
+        longitude (str or float): Longitude of the query
+        latitude (str or float): Latitude of the query
+        resolution (float): Grid pixel size used for the cell partition
+
+    Returns:
+        list: Row dicts with date, lon, lat, swi, cell_lon, cell_lat and year.
+        Days without a value are left out.
+    """
+    cell_lon, cell_lat = snap_to_grid(longitude, latitude, resolution)
+    lon, lat = float(longitude), float(latitude)
+    return [{"date": day, "lon": lon, "lat": lat, "swi": value,
+             "cell_lon": cell_lon, "cell_lat": cell_lat, "year": day.year}
+            for day, value in result_to_daily_values(data) if value is not None]
+
+
+def observation_to_row(record, resolution=GRID_RESOLUTION):
+    """Convert an observation record from pipeline.job_records into a dataset row."""
+    day = date.fromisoformat(record["date"])
+    cell_lon, cell_lat = snap_to_grid(record["lon"], record["lat"], resolution)
+    return {"date": day, "lon": record["lon"], "lat": record["lat"], "swi": record["swi"],
+            "cell_lon": cell_lon, "cell_lat": cell_lat, "year": day.year}
+
+
+class ParquetSink:
+    """
+    Appends SWI observations to a Parquet dataset partitioned by grid cell and year.
+
+    Rows are buffered and written once batch_rows have accumulated (or on
+    flush/close), as one file per partition. Each file is written under a
+    hidden temporary name and renamed into place, so readers never see a
+    half-written file.
+
+        with ParquetSink("swi_dataset") as sink:
+            sink.add(data, longitude, latitude)
+    """
+
+    def __init__(self, root, batch_rows=DEFAULT_BATCH_ROWS, resolution=GRID_RESOLUTION):
+        self.root = root
+        self.batch_rows = batch_rows
+        self.resolution = resolution
+        self.rows_written = 0
+        self.files_written = 0
+        self._buffer = []
+
+    def add(self, data, longitude, latitude):
+        """
+        Buffer the daily values of one result.
+
+        Returns:
+            int: Number of rows added
+        """
+        rows = result_to_rows(data, longitude, latitude, self.resolution)
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.batch_rows:
+            self.flush()
+        return len(rows)
+
+    def write(self, record):
+        """Buffer one observation record from the streaming pipeline; other records are skipped."""
+        if record["type"] != "observation":
+            return
+        self._buffer.append(observation_to_row(record, self.resolution))
+        if len(self._buffer) >= self.batch_rows:
+            self.flush()
+
+    def _partition_dir(self, cell_lon, cell_lat, year):
+        return os.path.join(self.root, f"cell_lon={cell_lon}", f"cell_lat={cell_lat}", f"year={year}")
+
+    def _write_file(self, directory, rows, fetched_at):
+        table = pa.table({
+            "date": [row["date"] for row in rows],
+            "lon": [row["lon"] for row in rows],
+            "lat": [row["lat"] for row in rows],
+            "swi": [row["swi"] for row in rows],
+            "fetched_at": [fetched_at] * len(rows),
+        }, schema=FILE_SCHEMA)
+
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{fetched_at.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+        # Dataset discovery skips names starting with "." so the file only
+        # becomes visible once it is complete
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(directory, name))
+
+    def flush(self):
+        """Write all buffered rows, one file per partition."""
+        if not self._buffer:
+            return
+        partitions = {}
+        for row in self._buffer:
+            partitions.setdefault((row["cell_lon"], row["cell_lat"], row["year"]), []).append(row)
+
+        fetched_at = datetime.now().replace(microsecond=0)
+        for key, rows in partitions.items():
+            self._write_file(self._partition_dir(*key), sorted(rows, key=lambda r: r["date"]), fetched_at)
+            self.rows_written += len(rows)
+            self.files_written += 1
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_dataset(root):
+    """Open the dataset written by ParquetSink as a pyarrow Dataset."""
+    partitioning = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+    return ds.dataset(root, format="parquet", partitioning=partitioning)
+
+
+def read_swi(root, lon_range=None, lat_range=None, years=None, latest_only=True):
+    """
+    Read SWI observations for a region and years from the dataset.
+
+    Filters are pushed down to the dataset, so only the folders of matching
+    cells and years are opened.
+
+    Args:
+        root (str): Dataset folder
+        lon_range (tuple, optional): (min, max) longitude of grid cells to read
+        lat_range (tuple, optional): (min, max) latitude of grid cells to read
+        years (iterable, optional): Years to read
+        latest_only (bool): Keep only the most recently fetched value for
+            each point and day when the same range was stored more than once
+
+    Returns:
+        DataFrame: Columns date, lon, lat, swi, fetched_at, cell_lon, cell_lat
+        and year
+    """
+    conditions = []
+    if lon_range is not None:
+        conditions += [ds.field("cell_lon") >= lon_range[0], ds.field("cell_lon") <= lon_range[1]]
+    if lat_range is not None:
+        conditions += [ds.field("cell_lat") >= lat_range[0], ds.field("cell_lat") <= lat_range[1]]
+    if years is not None:
+        conditions.append(ds.field("year").isin([int(y) for y in years]))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    df = open_dataset(root).to_table(filter=expression).to_pandas()
+    if latest_only and not df.empty:
+        df = (df.sort_values("fetched_at")
+                .drop_duplicates(subset=["date", "lon", "lat"], keep="last")
+                .sort_values(["cell_lon", "cell_lat", "date"])
+                .reset_index(drop=True))
+    return df
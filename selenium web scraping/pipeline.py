@@ -0,0 +1,183 @@
+import csv
+import json
+import os
+import sqlite3
+import sys
+
+from swi_series import result_to_daily_values
+
+# A job's results are streamed as one "observation" record per day with a
+# value, followed by one "job" record describing how the job went.
+OBSERVATION = "observation"
+JOB = "job"
+
+# Result keys copied into job records; tables and page HTML are not
+JOB_METADATA_KEYS = ("timings", "cache", "backend", "screenshots", "error_screenshot", "chart_elements",
+                     "error_during_extraction", "coordinate_alert", "locators",
+                     "form_fill", "counters")
+
+
+def job_records(job, result):
+    """
+    Turn one finished job into normalised records.
+
+    Args:
+        job (dict): The job (longitude, latitude, start_date, end_date, job_id)
+        result (dict): status, elapsed_seconds and optionally error, attempts
+            and data (the scraper result)
+
+    Yields:
+        dict: Observation records ({"type": "observation", "job_id", "date",
+        "lon", "lat", "swi"}), then one job record with the job's fields,
+        status, timing and observation count
+    """
+    data = result.get("data") or {}
+    count = 0
+    if result.get("status") == "ok":
+        lon, lat = float(job["longitude"]), float(job["latitude"])
+        for day, value in result_to_daily_values(data):
+            if value is None:
+                continue
+            count += 1
+            yield {"type": OBSERVATION, "job_id": job.get("job_id"), "date": day.isoformat(),
+                   "lon": lon, "lat": lat, "swi": value}
+
+    event = {"type": JOB}
+    event.update(job)
+    event.update({k: v for k, v in result.items() if k not in ("data", "job")})
+    event.update({k: data[k] for k in JOB_METADATA_KEYS if k in data})
+    event["observations"] = count
+    yield event
+
+
+class JsonlSink:
+    """Writes every record as one JSON line, to a file or to stdout ("-")."""
+
+    def __init__(self, path="-"):
+        self._own_file = path != "-"
+        self._out = open(path, "a", encoding="utf-8") if self._own_file else sys.stdout
+
+    def write(self, record):
+        self._out.write(json.dumps(record) + "\n")
+        if record["type"] == JOB:
+            self._out.flush()
+
+    def close(self):
+        if self._own_file:
+            self._out.close()
+        else:
+            self._out.flush()
+
+
+class CsvSink:
+    """Appends observation records to a CSV file; job records are skipped."""
+
+    FIELDS = ("job_id", "date", "lon", "lat", "swi")
+
+    def __init__(self, path):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._out = open(path, "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._out, fieldnames=self.FIELDS, extrasaction="ignore")
+        if new_file:
+            self._writer.writeheader()
+
+    def write(self, record):
+        if record["type"] == OBSERVATION:
+            self._writer.writerow(record)
+        else:
+            self._out.flush()
+
+    def close(self):
+        self._out.close()
+
+
+class SqliteSink:
+    """
+    Stores observations and job records in a SQLite database.
+
+    Rows are committed at the end of every job, so a crash loses at most the
+    job in progress.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS observations (
+                job_id TEXT,
+                date TEXT NOT NULL,
+                lon REAL NOT NULL,
+                lat REAL NOT NULL,
+                swi REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT,
+                status TEXT NOT NULL,
+                elapsed_seconds REAL,
+                error TEXT,
+                observations INTEGER,
+                record TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def write(self, record):
+        if record["type"] == OBSERVATION:
+            self._conn.execute("INSERT INTO observations VALUES (?, ?, ?, ?, ?)",
+                               (record["job_id"], record["date"], record["lon"], record["lat"], record["swi"]))
+        else:
+            self._conn.execute("INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?)",
+                               (record.get("job_id"), record["status"], record.get("elapsed_seconds"),
+                                record.get("error"), record["observations"], json.dumps(record)))
+            self._conn.commit()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+
+def open_sink(target):
+    """
+    Open a sink from a target description.
+
+    "-" is JSONL on stdout; otherwise the extension picks the sink: .jsonl,
+    .csv, .sqlite/.db, or .parquet (or an existing folder) for a Parquet
+    dataset. An object that already has a write(record) method is used as
+    it is.
+    """
+    if hasattr(target, "write"):
+        return target
+    extension = os.path.splitext(target)[1].lower()
+    if target == "-" or extension in (".jsonl", ".json"):
+        return JsonlSink(target)
+    if extension == ".csv":
+        return CsvSink(target)
+    if extension in (".sqlite", ".db"):
+        return SqliteSink(target)
+    if extension == ".parquet" or os.path.isdir(target):
+        from parquet_sink import ParquetSink
+        return ParquetSink(target)
+    raise ValueError(f"Don't know which sink to use for {target!r}; "
+                     "use -, .jsonl, .csv, .sqlite, .db or .parquet")
+
+
+def drain(records, sinks):
+    """
+    Feed records to every sink as they are produced.
+
+    Args:
+        records (iterable): Records, typically a generator
+        sinks (list): Objects with a write(record) method
+
+    Returns:
+        int: Number of records written
+    """
+    count = 0
+    for record in records:
+        for sink in sinks:
+            sink.write(record)
+        count += 1
+    return count
+
@@ -0,0 +1,183 @@
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import time
+
+from capture import CapturePolicy
+from chunking import DEFAULT_CHUNK_ATTEMPTS
+from logs import configure_logging, current_config, get_logger
+
+log = get_logger("process_pool")
+
+# Seconds between checks that the workers are still alive while waiting for results
+POLL_SECONDS = 1.0
+
+
+def default_worker_count():
+    """Return the default number of worker processes: one per two CPU cores, as each Chrome uses several."""
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def _worker(worker_id, tasks, results, options):
+    """
+    Worker process: run fetches from the task queue until it is empty.
+
+    Each worker has its own browser pool (one browser), a temporary folder
+    holding that browser's profile, and its own artifact folder.
+    """
+    # Imported here so the parent process doesn't need the browser stack
+    from batch_scrape import Fetcher
+
+    # Log the way the parent does (spawned workers start unconfigured)
+    if options["log_config"]:
+        configure_logging(**options["log_config"])
+    started = time.time()
+    stats = {"worker": worker_id, "pid": os.getpid(), "fetches": 0, "ok": 0, "error": 0, "busy_seconds": 0.0}
+    profile_root = tempfile.mkdtemp(prefix=f"swi_worker{worker_id}_")
+    capture = options["capture"]
+    capture = CapturePolicy(capture.mode, capture.sample_rate, os.path.join(capture.output_dir, f"worker_{worker_id}"))
+    fetcher = Fetcher(options["backend"], pool_size=1, recycle_after=options["recycle_after"], capture=capture,
+                      cache_path=options["cache_path"], profile_root=profile_root, endpoint=options["endpoint"],
+                      browser_profile=options["browser_profile"], chunk=options["chunk"],
+                      chunk_attempts=options["chunk_attempts"])
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            index, plan = task
+            results.put(("start", worker_id, index))
+            data, elapsed = fetcher(plan)
+            # Only the parent's writers need the result; the page HTML is never sent back
+            data.pop("page_source", None)
+            stats["fetches"] += 1
+            stats["error" if "error" in data else "ok"] += 1
+            stats["busy_seconds"] += elapsed
+            results.put(("result", worker_id, index, data, elapsed))
+    finally:
+        if fetcher.cache is not None:
+            stats["cache"] = fetcher.cache.info()
+        fetcher.close()
+        shutil.rmtree(profile_root, ignore_errors=True)
+        stats["busy_seconds"] = round(stats["busy_seconds"], 3)
+        stats["elapsed_seconds"] = round(time.time() - started, 3)
+        stats["fetches_per_second"] = round(stats["fetches"] / stats["elapsed_seconds"], 3) \
+            if stats["elapsed_seconds"] else None
+        results.put(("done", worker_id, stats))
+
+
+class ShardedRunner:
+    """
+    Runs fetches in worker processes, each with its own browser.
+
+    Workers take fetches from a shared task queue, so a slow shard doesn't
+    hold the others up, and send results back to the parent, which does
+    all the writing. If a worker dies, the fetch it was running is reported
+    as failed and the other workers carry on with the rest.
+
+        runner = ShardedRunner(4, backend="browser")
+        for plan, data, elapsed in runner.run(fetches):
+            ...
+        print(runner.worker_stats)
+    """
+
+    def __init__(self, workers=None, backend="browser", recycle_after=50, capture=None, cache_path=None,
+                 endpoint=None, browser_profile="default", chunk=None, chunk_attempts=DEFAULT_CHUNK_ATTEMPTS):
+        self.workers = workers or default_worker_count()
+        self.options = {"backend": backend, "recycle_after": recycle_after, "endpoint": endpoint,
+                        "browser_profile": browser_profile, "chunk": chunk, "chunk_attempts": chunk_attempts,
+                        "capture": capture or CapturePolicy(), "cache_path": cache_path,
+                        "log_config": current_config()}
+        self.worker_stats = []
+
+    def run(self, plans, on_start=None):
+        """
+        Run planned fetches (see grid.plan_fetches) and yield their results.
+
+        Args:
+            plans (list): Fetch dicts with longitude, latitude, start_date,
+                end_date and jobs
+            on_start (callable, optional): Called with a plan when a worker
+                starts it
+
+        Yields:
+            tuple: (plan, result dict, elapsed seconds) as fetches finish
+        """
+        plans = list(plans)
+        if not plans:
+            return
+        # spawn gives each worker a clean interpreter, with no browser or lock state copied from the parent
+        context = multiprocessing.get_context("spawn")
+        tasks = context.Queue()
+        results = context.Queue()
+        for index, plan in enumerate(plans):
+            # Workers only need the query; the jobs stay in the parent
+            tasks.put((index, {k: v for k, v in plan.items() if k != "jobs"}))
+        count = min(self.workers, len(plans))
+        for _ in range(count):
+            tasks.put(None)
+
+        processes = {}
+        for worker_id in range(count):
+            process = context.Process(target=_worker, args=(worker_id, tasks, results, self.options), daemon=True)
+            process.start()
+            processes[worker_id] = process
+
+        running = {}
+        pending = set(range(len(plans)))
+        finished = set()
+        self.worker_stats = []
+        try:
+            while pending and len(finished) < count:
+                try:
+                    message = results.get(timeout=POLL_SECONDS)
+                except queue.Empty:
+                    for worker_id, process in processes.items():
+                        if worker_id not in finished and not process.is_alive():
+                            # The worker died without reporting; fail the fetch it was running
+                            finished.add(worker_id)
+                            index = running.pop(worker_id, None)
+                            log.error(f"Worker {worker_id} exited unexpectedly (exit code {process.exitcode})")
+                            if index is not None and index in pending:
+                                pending.discard(index)
+                                yield plans[index], {"error": f"Worker {worker_id} exited unexpectedly"}, 0.0
+                    continue
+
+                kind, worker_id = message[0], message[1]
+                if kind == "start":
+                    running[worker_id] = message[2]
+                    if on_start is not None:
+                        on_start(plans[message[2]])
+                elif kind == "result":
+                    _, _, index, data, elapsed = message
+                    running.pop(worker_id, None)
+                    pending.discard(index)
+                    yield plans[index], data, elapsed
+                else:
+                    finished.add(worker_id)
+                    self.worker_stats.append(message[2])
+
+            # Fetches no worker got to, because every worker died
+            for index in sorted(pending):
+                yield plans[index], {"error": "No worker process left to run this fetch"}, 0.0
+            pending.clear()
+
+            # Collect the remaining workers' stats
+            while len(finished) < count:
+                try:
+                    message = results.get(timeout=POLL_SECONDS)
+                except queue.Empty:
+                    if not any(processes[w].is_alive() for w in processes if w not in finished):
+                        break
+                    continue
+                if message[0] == "done":
+                    finished.add(message[1])
+                    self.worker_stats.append(message[2])
+        finally:
+            for process in processes.values():
+                process.join(timeout=30)
+                if process.is_alive():
+                    process.terminate()
+            self.worker_stats.sort(key=lambda stats: stats["worker"])
@@ -0,0 +1,196 @@
+import contextlib
+import time
+
+from logs import get_logger
+
+log = get_logger("recovery")
+
+# What went wrong with a browser query, as far as recovering from it goes
+BAD_INPUT = "bad_input"  # the site rejected a value (alert about coordinates, dates...)
+DATE_REJECTED = "date_rejected"  # the site rejected or misread the dates in the format they were typed in
+SITE_BUSY = "site_busy"  # the site asked to try again, or a wait timed out
+ELEMENT_MISSING = "element_missing"  # a form element is gone, stale or can't be used
+SESSION_DEAD = "session_dead"  # the browser stopped answering
+FAILURE_TYPES = (BAD_INPUT, DATE_REJECTED, SITE_BUSY, ELEMENT_MISSING, SESSION_DEAD)
+# Failures that come back the same way on every retry
+NOT_RETRYABLE = (BAD_INPUT, DATE_REJECTED)
+
+# The cheapest action that usually gets past each failure. None of them
+# reloads the page: the form is refilled (for DATE_REJECTED, in a date
+# format not tried yet) or resubmitted where it is, the elements are looked
+# up again, or the browser is replaced.
+RECOVERY_ACTIONS = {
+    BAD_INPUT: "refill",
+    DATE_REJECTED: "refill",
+    SITE_BUSY: "resubmit",
+    ELEMENT_MISSING: "relocate",
+    SESSION_DEAD: "recycle_session",
+}
+
+# Recoveries allowed per failure type and query. Input the site rejects
+# again after a refill is really bad, so the query fails fast. Rejected dates
+# get one refill per other format in form_fill.DATE_FORMATS.
+DEFAULT_BUDGET = {BAD_INPUT: 1, DATE_REJECTED: 3, SITE_BUSY: 2, ELEMENT_MISSING: 2, SESSION_DEAD: 1}
+
+# Seconds before resubmitting to a busy site, doubled on each further try
+BUSY_BASE_DELAY = 1.0
+
+# Words in an alert that mean the site rejected the coordinates, or the dates
+COORDINATE_WORDS = ("latitude", "longitude", "point")
+DATE_WORDS = ("date", "day", "month", "year")
+# Alert wording that means "not now" rather than "not this input"
+_BUSY_WORDS = ("try again", "busy", "later", "request failed", "unavailable", "timed out", "timeout")
+# WebDriver error messages that mean the browser (or its driver) is gone
+_SESSION_WORDS = ("invalid session id", "no such window", "not reachable", "disconnected",
+                  "session deleted", "target window already closed", "connection refused")
+
+
+class QueryFailure(Exception):
+    """
+    A classified failure of a browser query.
+
+    Raised by the scraper for failures it spots itself (an alert, a missing
+    submit button) so they go through the same recovery as exceptions.
+    """
+
+    def __init__(self, failure, message, alert_text=None):
+        super().__init__(message)
+        self.failure = failure
+        self.alert_text = alert_text
+
+
+def classify_alert(text):
+    """Return SITE_BUSY for alerts asking to try again later, and BAD_INPUT for any other alert."""
+    text = (text or "").lower()
+    return SITE_BUSY if any(word in text for word in _BUSY_WORDS) else BAD_INPUT
+
+
+def classify_exception(error):
+    """
+    Decide what kind of failure an exception from a browser query is.
+
+    Args:
+        error (Exception): Raised while driving the browser
+
+    Returns:
+        str or None: One of FAILURE_TYPES, or None for errors that no
+        recovery is known to help with
+    """
+    # Imported here so the failure types can be used without selenium
+    from selenium.common.exceptions import (ElementClickInterceptedException, ElementNotInteractableException,
+                                            InvalidElementStateException, InvalidSessionIdException,
+                                            NoSuchElementException, NoSuchWindowException,
+                                            StaleElementReferenceException, TimeoutException,
+                                            UnexpectedAlertPresentException, WebDriverException)
+
+    if isinstance(error, QueryFailure):
+        return error.failure
+    if isinstance(error, UnexpectedAlertPresentException):
+        return classify_alert(error.alert_text)
+    if isinstance(error, (InvalidSessionIdException, NoSuchWindowException)):
+        return SESSION_DEAD
+    if isinstance(error, (NoSuchElementException, StaleElementReferenceException, ElementNotInteractableException,
+                          ElementClickInterceptedException, InvalidElementStateException)):
+        return ELEMENT_MISSING
+    if isinstance(error, TimeoutException):
+        return SITE_BUSY
+    if isinstance(error, (WebDriverException, ConnectionError)):
+        message = str(error).lower()
+        if isinstance(error, ConnectionError) or any(word in message for word in _SESSION_WORDS):
+            return SESSION_DEAD
+    return None
+
+
+def accept_alert(driver):
+    """Accept the alert the browser is showing, if any, and return its text (or None)."""
+    try:
+        alert = driver.switch_to.alert
+        text = alert.text
+        alert.accept()
+        return text
+    except Exception:
+        return None
+
+
+def failure_fields(failure, message):
+    """
+    Return the fields that describe a failed query in its result.
+
+    Args:
+        failure (str or None): One of FAILURE_TYPES, or None if unknown
+        message (str): The error message
+
+    Returns:
+        dict: error, failure (if known), and retryable, which is False for
+        input the site rejected (NOT_RETRYABLE) since it fails the same way
+        every time
+    """
+    fields = {"error": message, "retryable": failure not in NOT_RETRYABLE}
+    if failure is not None:
+        fields["failure"] = failure
+    return fields
+
+
+class Recovery:
+    """
+    Recovery bookkeeping for one query: what is allowed, what was done and how long it took.
+
+    next_action() turns a failure into the action to take, or None once the
+    failure type has used up its budget. Actions are timed with timed().
+    Every recovery is counted in the query's StepTimer as
+    "recoveries_<failure>" and the time spent under the "recovery" timing,
+    so both end up in the result's counters and timings.
+
+        recovery = Recovery(timer)
+        action = recovery.next_action(classify_exception(error))
+        with recovery.timed():
+            ...
+    """
+
+    def __init__(self, timer, budget=None, busy_delay=BUSY_BASE_DELAY):
+        self.timer = timer
+        self.budget = dict(DEFAULT_BUDGET, **(budget or {}))
+        self.busy_delay = busy_delay
+        self.used = {}
+
+    def next_action(self, failure, reason=""):
+        """
+        Pick the recovery for a failure.
+
+        Args:
+            failure (str or None): One of FAILURE_TYPES
+            reason (str): What happened, for the log
+
+        Returns:
+            str or None: An action from RECOVERY_ACTIONS, or None if the
+            failure is unknown or its budget is used up
+        """
+        if failure not in RECOVERY_ACTIONS:
+            return None
+        used = self.used.get(failure, 0)
+        if used >= self.budget.get(failure, 0):
+            return None
+        self.used[failure] = used + 1
+        self.timer.count(f"recoveries_{failure}")
+        action = RECOVERY_ACTIONS[failure]
+        log.warning(f"Recovering from {failure} ({reason}) with {action}, "
+                    f"try {used + 1} of {self.budget[failure]}",
+                    extra={"fields": {"failure": failure, "action": action}})
+        return action
+
+    @contextlib.contextmanager
+    def timed(self):
+        """Add the time spent in the with block to the "recovery" timing."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(time.perf_counter() - started)
+
+    def add_time(self, seconds):
+        """Add seconds lost to a failure (e.g. an abandoned attempt) to the "recovery" timing."""
+        self.timer.add("recovery", seconds)
+
+    def backoff(self):
+        """Wait before resubmitting to a busy site, longer on each try."""
+        time.sleep(self.busy_delay * 2 ** (self.used.get(SITE_BUSY, 1) - 1))
@@ -0,0 +1,415 @@
+import argparse
+import glob
+import json
+import math
+import mimetypes
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from grid import GRID_BOUNDS, validate_coordinates
+
+# Where the stand-in serves the SWI page and the Time Series data endpoint
+PAGE_PATH = "/swi/"
+DATA_PATH = "/swi/timeseries"
+
+# Message the synthetic page alerts with (and the data endpoint returns) for
+# coordinates outside the product's coverage, worded like the live site's
+COORDINATE_ALERT = "Please select a valid point: latitude and longitude must be inside the SWI coverage"
+
+# A minimal page with the same controls as the SWI page: a Time Series panel
+# holding longitude, latitude and date inputs and a Submit button. Submitting
+# posts the form to the data endpoint and renders the series as a table;
+# coordinates outside the coverage raise an alert, as on the live site.
+SYNTHETIC_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Soil Wetness Index (local replay)</title></head>
+<body>
+<div class="panel-heading" onclick="togglePanel()">Time Series <span class="arrow">&#9660;</span></div>
+<div id="ts-panel" style="display: none">
+  <input id="lon" type="text" placeholder="Longitude">
+  <input id="lat" type="text" placeholder="Latitude">
+  <input id="start" type="date">
+  <input id="end" type="date">
+  <button id="submit" type="button" onclick="submitQuery()">Submit</button>
+</div>
+<div id="results"></div>
+<script>
+var BOUNDS = %(bounds)s;
+function togglePanel() {
+  var panel = document.getElementById('ts-panel');
+  panel.style.display = panel.style.display === 'none' ? 'block' : 'none';
+}
+function value(id) { return document.getElementById(id).value; }
+function toDmy(iso) { var p = iso.split('-'); return p[2] + '/' + p[1] + '/' + p[0]; }
+function submitQuery() {
+  var lon = parseFloat(value('lon')), lat = parseFloat(value('lat'));
+  if (isNaN(lon) || isNaN(lat) || lon < BOUNDS[0] || lon > BOUNDS[1] || lat < BOUNDS[2] || lat > BOUNDS[3]) {
+    alert(%(alert)s);
+    return;
+  }
+  if (!value('start') || !value('end')) { alert('Please select the start and end dates'); return; }
+  var xhr = new XMLHttpRequest();
+  xhr.open('POST', 'timeseries');
+  xhr.setRequestHeader('Content-Type', 'application/x-www-form-urlencoded');
+  xhr.onload = function () {
+    if (xhr.status !== 200) { alert('Request failed (HTTP ' + xhr.status + '), please try again later'); return; }
+    render(JSON.parse(xhr.responseText));
+  };
+  xhr.send('lon=' + encodeURIComponent(value('lon')) + '&lat=' + encodeURIComponent(value('lat')) +
+           '&start_date=' + encodeURIComponent(toDmy(value('start'))) +
+           '&end_date=' + encodeURIComponent(toDmy(value('end'))));
+}
+function render(payload) {
+  var html = '<table><tr><th>Date</th><th>SWI</th></tr>';
+  for (var i = 0; i < payload.dates.length; i++) {
+    html += '<tr><td>' + payload.dates[i] + '</td><td>' + payload.values[i] + '</td></tr>';
+  }
+  document.getElementById('results').innerHTML = html + '</table>';
+}
+</script>
+</body>
+</html>
+"""
+
+
+def load_recordings(directory):
+    """
+    Load recorded responses from a directory of JSON files.
+
+    Each file holds one recording:
+
+        {
+            "method": "POST",
+            "path": "/swi/timeseries",
+            "match": {"lon": "77.88", "lat": "23.47"},
+            "status": 200,
+            "headers": {"Content-Type": "application/json"},
+            "latency": 0.5,
+            "body": "..."
+        }
+
+    "match" is optional; a recording without it answers every request to
+    its method and path that no more specific recording matches. "latency"
+    (seconds) is optional and delays the response.
+
+    Args:
+        directory (str): Folder holding *.json recordings
+
+    Returns:
+        list: Recording dicts
+    """
+    recordings = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            recordings.append(json.load(f))
+    return recordings
+
+
+def synthetic_series(longitude, latitude, start_date, end_date):
+    """
+    Make up a deterministic daily SWI series for a query.
+
+    Values follow a seasonal curve offset by the point, so repeated queries
+    get identical answers and different points differ.
+
+    Args:
+        longitude (str): Longitude value
+        latitude (str): Latitude value
+        start_date (str): Start date in format DD/MM/YYYY
+        end_date (str): End date in format DD/MM/YYYY
+
+    Returns:
+        dict: {"dates": [...], "values": [...]}, the parallel-array shape the
+        HTTP backend parses
+    """
+    start = datetime.strptime(start_date, "%d/%m/%Y")
+    end = datetime.strptime(end_date, "%d/%m/%Y")
+    offset = (float(longitude) * 7 + float(latitude) * 13) % 1 * 0.1
+    dates, values = [], []
+    day = start
+    while day <= end:
+        season = math.sin(2 * math.pi * day.timetuple().tm_yday / 365.25)
+        dates.append(day.strftime("%Y-%m-%d"))
+        values.append(round(0.35 + 0.2 * season + offset, 4))
+        day += timedelta(days=1)
+    return {"dates": dates, "values": values}
+
+
+def record_response(response, directory, name, match=None):
+    """
+    Save a live requests.Response as a recording the replay server can serve.
+
+    Args:
+        response (requests.Response): Response to save
+        directory (str): Folder to write the recording to
+        name (str): File name (without extension)
+        match (dict, optional): Request fields that must match for this recording
+
+    Returns:
+        str: Path of the written recording
+    """
+    os.makedirs(directory, exist_ok=True)
+    recording = {
+        "method": response.request.method,
+        "path": urlparse(response.url).path,
+        "status": response.status_code,
+        "headers": {"Content-Type": response.headers.get("Content-Type", "text/plain")},
+        "body": response.text,
+    }
+    if match:
+        recording["match"] = match
+    path = os.path.join(directory, f"{name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(recording, f, indent=2)
+    return path
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, keep-alive
+    # clients wait on delayed ACKs and every request takes ~40 ms.
+    disable_nagle_algorithm = True
+
+    def _request_fields(self):
+        fields = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length).decode("utf-8", errors="replace")
+            if "json" in (self.headers.get("Content-Type") or ""):
+                try:
+                    fields.update({k: str(v) for k, v in json.loads(body).items()})
+                except (ValueError, AttributeError):
+                    pass
+            else:
+                fields.update({k: v[0] for k, v in parse_qs(body).items()})
+        return fields
+
+    def _find_recording(self, method, path, fields):
+        fallback = None
+        for recording in self.server.recordings:
+            if recording.get("method", "GET").upper() != method or recording.get("path") != path:
+                continue
+            match = recording.get("match")
+            if not match:
+                fallback = fallback or recording
+            elif all(fields.get(k) == str(v) for k, v in match.items()):
+                return recording
+        return fallback
+
+    def _injected_response(self, path, fields):
+        """Return a failure or bad-input response for the data endpoint, or None."""
+        server = self.server
+        if path != DATA_PATH:
+            return None
+        with server.lock:
+            fail = server.failure_rate and server.random.random() < server.failure_rate
+        if fail:
+            headers = {"Content-Type": "text/plain"}
+            if server.failure_status in (429, 503):
+                headers["Retry-After"] = "1"
+            return server.failure_status, headers, "Service temporarily unavailable (injected failure)"
+        if server.validate_input and ("lon" in fields or "lat" in fields):
+            problem = validate_coordinates(fields.get("lon"), fields.get("lat"), server.bounds)
+            if problem:
+                return 400, {"Content-Type": "text/plain"}, f"{COORDINATE_ALERT} ({problem})"
+        return None
+
+    def _generated_response(self, method, path, fields):
+        """Return the synthetic page or series, or a file from the static folder, or None."""
+        server = self.server
+        if server.synthetic and path == DATA_PATH:
+            try:
+                series = synthetic_series(fields["lon"], fields["lat"], fields["start_date"], fields["end_date"])
+            except (KeyError, ValueError) as e:
+                return 400, {"Content-Type": "text/plain"}, f"Bad request: {str(e)}"
+            return 200, {"Content-Type": "application/json"}, json.dumps(series)
+        if method != "GET":
+            return None
+        if server.static_dir:
+            relative = unquote(path).lstrip("/")
+            if not relative or relative.endswith("/"):
+                relative += "index.html"
+            file_path = os.path.realpath(os.path.join(server.static_dir, relative))
+            if file_path.startswith(os.path.realpath(server.static_dir) + os.sep) and os.path.isfile(file_path):
+                with open(file_path, "rb") as f:
+                    content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+                    return 200, {"Content-Type": content_type}, f.read()
+        if server.synthetic and path in (PAGE_PATH, PAGE_PATH + "index.html"):
+            page = SYNTHETIC_PAGE % {"bounds": json.dumps(list(server.bounds)), "alert": json.dumps(COORDINATE_ALERT)}
+            return 200, {"Content-Type": "text/html; charset=utf-8"}, page
+        return None
+
+    def _replay(self, method):
+        server = self.server
+        fields = self._request_fields()
+        path = urlparse(self.path).path
+        with server.lock:
+            server.request_count += 1
+            delay = server.latency + (server.random.uniform(0, server.jitter) if server.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+        response = self._injected_response(path, fields)
+        if response is None:
+            recording = self._find_recording(method, path, fields)
+            if recording is not None:
+                response = (recording.get("status", 200), recording.get("headers", {"Content-Type": "text/plain"}),
+                            recording.get("body", ""))
+                if recording.get("latency"):
+                    time.sleep(recording["latency"])
+            else:
+                response = self._generated_response(method, path, fields)
+        if response is None:
+            response = 404, {"Content-Type": "text/plain"}, "No recording for this request"
+        with server.lock:
+            server.status_counts[response[0]] = server.status_counts.get(response[0], 0) + 1
+
+        status, headers, body = response
+        payload = body if isinstance(body, bytes) else body.encode("utf-8")
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._replay("GET")
+
+    def do_POST(self):
+        self._replay("POST")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ReplayServer:
+    """
+    Local stand-in for the MOSDAC site that serves recorded responses.
+
+    Runs in a background thread; use it as a context manager and point the
+    HTTP backend at server.url instead of the live site:
+
+        with ReplayServer(load_recordings("recordings")) as server:
+            fetch_soil_wetness_data(..., endpoint=server.url + "/swi/timeseries")
+
+    Requests are answered from the recordings first, then from static_dir
+    (a saved copy of the page and its scripts), then, with synthetic=True,
+    from a built-in copy of the SWI form at /swi/ and made-up series from the
+    data endpoint, so the browser scraper can run end to end locally:
+
+        with ReplayServer([], synthetic=True, latency=0.2, failure_rate=0.1) as server:
+            scrape_soil_wetness_data(..., site_url=server.url + "/swi/")
+
+    Args:
+        recordings (list): Recording dicts (see load_recordings)
+        host (str): Interface to listen on
+        port (int): Port to listen on (0 picks a free one)
+        verbose (bool): Log every request
+        static_dir (str, optional): Folder of files to serve for GET requests
+            no recording matches
+        synthetic (bool): Serve the built-in SWI page and generated series
+        latency (float): Seconds added to every response
+        jitter (float): Up to this many more seconds, chosen at random per response
+        failure_rate (float): Fraction of data endpoint requests answered
+            with failure_status instead
+        failure_status (int): HTTP status of injected failures
+        validate_input (bool): Answer data requests whose coordinates are
+            outside bounds with HTTP 400 and the coordinate alert message
+        bounds (tuple): lon_min, lon_max, lat_min, lat_max accepted by the
+            synthetic page and input validation
+        seed (int, optional): Seed for latency jitter and failure injection
+    """
+
+    def __init__(self, recordings, host="127.0.0.1", port=0, verbose=False, static_dir=None, synthetic=False,
+                 latency=0.0, jitter=0.0, failure_rate=0.0, failure_status=503, validate_input=False,
+                 bounds=GRID_BOUNDS, seed=None):
+        self.httpd = ThreadingHTTPServer((host, port), _ReplayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.recordings = recordings
+        self.httpd.request_count = 0
+        self.httpd.status_counts = {}
+        self.httpd.lock = threading.Lock()
+        self.httpd.verbose = verbose
+        self.httpd.static_dir = static_dir
+        self.httpd.synthetic = synthetic
+        self.httpd.latency = latency
+        self.httpd.jitter = jitter
+        self.httpd.failure_rate = failure_rate
+        self.httpd.failure_status = failure_status
+        self.httpd.validate_input = validate_input
+        self.httpd.bounds = bounds
+        self.httpd.random = random.Random(seed)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self):
+        return self.httpd.request_count
+
+    @property
+    def status_counts(self):
+        """Responses sent so far, by HTTP status."""
+        with self.httpd.lock:
+            return dict(self.httpd.status_counts)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded MOSDAC SWI responses locally.")
+    parser.add_argument("recordings", nargs="?", help="Folder of recorded responses (*.json)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--static", help="Folder with a saved copy of the page to serve")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Serve a built-in SWI page at /swi/ and generated series")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra seconds, up to this much")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Fraction of data requests that fail with --failure-status")
+    parser.add_argument("--failure-status", type=int, default=503)
+    parser.add_argument("--validate-input", action="store_true",
+                        help="Reject data requests with coordinates outside the SWI coverage")
+    parser.add_argument("--seed", type=int, help="Seed for jitter and failure injection")
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.recordings) if args.recordings else []
+    server = ReplayServer(recordings, host=args.host, port=args.port, verbose=True, static_dir=args.static,
+                          synthetic=args.synthetic, latency=args.latency, jitter=args.jitter,
+                          failure_rate=args.failure_rate, failure_status=args.failure_status,
+                          validate_input=args.validate_input, seed=args.seed)
+    print(f"Replaying {len(recordings)} recordings on {server.url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from grid import GRID_RESOLUTION, snap_to_grid
+from logs import get_logger
+from metrics import add_fetch_stats
+from swi_series import daily_values_to_table, result_to_daily_values
+
+log = get_logger("result_cache")
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".mosdac_swi_cache.sqlite")
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_ROWS = 5_000_000
+# Eviction counts every row, so it runs once per this many writes
+EVICT_EVERY_PUTS = 100
+
+
+def _to_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, "%d/%m/%Y").date()
+    return value
+
+
+class ResultCache:
+    """
+    On-disk cache of daily SWI values per grid cell, stored in SQLite.
+
+    Coordinates are snapped to the SWI grid so that points in the same
+    pixel share entries. Every day between the first and last value a fetch
+    returned is stored, including days in between that the site had no
+    value for (stored as NULL), so those days are not fetched again. Days
+    before the first or after the last value are not stored, since the
+    site may simply not have published them yet. Entries expire after
+    ttl_seconds, and the least recently used rows are evicted once the
+    cache holds more than max_rows.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, resolution=GRID_RESOLUTION,
+                 ttl_seconds=DEFAULT_TTL_SECONDS, max_rows=DEFAULT_MAX_ROWS):
+        self.path = path
+        self.resolution = resolution
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS swi_daily (
+                cell_lon REAL NOT NULL,
+                cell_lat REAL NOT NULL,
+                day TEXT NOT NULL,
+                value REAL,
+                fetched_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (cell_lon, cell_lat, day)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS swi_daily_last_used ON swi_daily (last_used)")
+        self._conn.commit()
+
+    def cell(self, longitude, latitude):
+        """Return the grid pixel centre a coordinate pair is cached under."""
+        return snap_to_grid(longitude, latitude, self.resolution)
+
+    def _fresh_after(self):
+        return time.time() - self.ttl_seconds
+
+    def get(self, longitude, latitude, start_date, end_date):
+        """
+        Return the cached, unexpired days of a date range.
+
+        Args:
+            longitude (str or float): Longitude value
+            latitude (str or float): Latitude value
+            start_date (str or date): Start date (DD/MM/YYYY if a string)
+            end_date (str or date): End date (DD/MM/YYYY if a string)
+
+        Returns:
+            dict: date -> float or None for every cached day in the range
+        """
+        cell_lon, cell_lat = self.cell(longitude, latitude)
+        start, end = _to_date(start_date), _to_date(end_date)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day, value FROM swi_daily WHERE cell_lon = ? AND cell_lat = ? "
+                "AND day BETWEEN ? AND ? AND fetched_at >= ?",
+                (cell_lon, cell_lat, start.isoformat(), end.isoformat(), self._fresh_after())
+            ).fetchall()
+            if rows:
+                self._conn.execute(
+                    "UPDATE swi_daily SET last_used = ? WHERE cell_lon = ? AND cell_lat = ? AND day BETWEEN ? AND ?",
+                    (time.time(), cell_lon, cell_lat, start.isoformat(), end.isoformat())
+                )
+                self._conn.commit()
+        return {datetime.strptime(day, "%Y-%m-%d").date(): value for day, value in rows}
+
+    def missing_ranges(self, longitude, latitude, start_date, end_date, cached=None):
+        """
+        Split a date range into the sub-ranges that are not cached.
+
+        Args:
+            longitude (str or float): Longitude value
+            latitude (str or float): Latitude value
+            start_date (str or date): Start date (DD/MM/YYYY if a string)
+            end_date (str or date): End date (DD/MM/YYYY if a string)
+            cached (dict, optional): Result of get() for the same range, to
+                avoid querying twice
+
+        Returns:
+            list: (start, end) date tuples, inclusive, in order
+        """
+        start, end = _to_date(start_date), _to_date(end_date)
+        if cached is None:
+            cached = self.get(longitude, latitude, start, end)
+
+        gaps = []
+        gap_start = None
+        day = start
+        while day <= end:
+            if day in cached:
+                if gap_start is not None:
+                    gaps.append((gap_start, day - timedelta(days=1)))
+                    gap_start = None
+            elif gap_start is None:
+                gap_start = day
+            day += timedelta(days=1)
+        if gap_start is not None:
+            gaps.append((gap_start, end))
+        return gaps
+
+    def put(self, longitude, latitude, start_date, end_date, values):
+        """
+        Store the result of fetching a date range.
+
+        Only the span the response covered is stored, from its first to its
+        last day with a value. Days in that span missing from values are
+        stored as NULL so that they count as fetched. Values without any
+        number store nothing.
+
+        Args:
+            longitude (str or float): Longitude value
+            latitude (str or float): Latitude value
+            start_date (str or date): Start of the fetched range
+            end_date (str or date): End of the fetched range
+            values (list): (date, float or None) tuples
+
+        Returns:
+            int: Number of days stored
+        """
+        cell_lon, cell_lat = self.cell(longitude, latitude)
+        start, end = _to_date(start_date), _to_date(end_date)
+        by_day = {day: value for day, value in values if start <= day <= end}
+        covered = [day for day, value in by_day.items() if value is not None]
+        if not covered:
+            return 0
+        now = time.time()
+        rows = []
+        day, end = min(covered), max(covered)
+        while day <= end:
+            rows.append((cell_lon, cell_lat, day.isoformat(), by_day.get(day), now, now))
+            day += timedelta(days=1)
+
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO swi_daily VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._puts_since_evict += 1
+            due = self._puts_since_evict >= EVICT_EVERY_PUTS
+        if due:
+            self.evict()
+        return len(rows)
+
+    def forget_missing(self, longitude, latitude, start_date, end_date):
+        """
+        Drop the days of a range cached without a value, so they are fetched again.
+
+        Args:
+            longitude (str or float): Longitude value
+            latitude (str or float): Latitude value
+            start_date (str or date): Start date (DD/MM/YYYY if a string)
+            end_date (str or date): End date (DD/MM/YYYY if a string)
+
+        Returns:
+            int: Number of rows removed
+        """
+        cell_lon, cell_lat = self.cell(longitude, latitude)
+        start, end = _to_date(start_date), _to_date(end_date)
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM swi_daily WHERE cell_lon = ? AND cell_lat = ? AND day BETWEEN ? AND ? "
+                "AND value IS NULL",
+                (cell_lon, cell_lat, start.isoformat(), end.isoformat())
+            ).rowcount
+            self._conn.commit()
+        return removed
+
+    def evict(self):
+        """
+        Drop expired rows, then the least recently used rows above max_rows.
+
+        Returns:
+            int: Number of rows removed
+        """
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM swi_daily WHERE fetched_at < ?",
+                                         (self._fresh_after(),)).rowcount
+            count = self._conn.execute("SELECT COUNT(*) FROM swi_daily").fetchone()[0]
+            if count > self.max_rows:
+                removed += self._conn.execute(
+                    "DELETE FROM swi_daily WHERE rowid IN "
+                    "(SELECT rowid FROM swi_daily ORDER BY last_used LIMIT ?)",
+                    (count - self.max_rows,)
+                ).rowcount
+            self._conn.commit()
+            self.stats["evictions"] += removed
+            self._puts_since_evict = 0
+        return removed
+
+    def record_lookup(self, hits, misses):
+        """Add to the hit/miss counters (counted in days)."""
+        with self._lock:
+            self.stats["hits"] += hits
+            self.stats["misses"] += misses
+
+    def clear(self):
+        """Remove every cached row."""
+        with self._lock:
+            self._conn.execute("DELETE FROM swi_daily")
+            self._conn.commit()
+
+    def info(self):
+        """Return row count, file size and hit/miss counters."""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM swi_daily").fetchone()[0]
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return dict(self.stats, rows=count, size_bytes=size)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def fetch_with_cache(cache, fetch, longitude, latitude, start_date, end_date):
+    """
+    Answer a query from the cache, fetching only the days it doesn't have.
+
+    The requested range is split into cached days and missing sub-ranges.
+    Each missing sub-range is fetched with fetch(), stored, and merged with
+    the cached days into one table. A fetch that returned no values, or
+    whose browser wait for results timed out, is not stored, so an empty
+    or cut-short answer is never served from the cache later.
+
+    Args:
+        cache (ResultCache): Cache to read from and write to
+        fetch (callable): fetch(longitude, latitude, start_date, end_date)
+            returning a result dict like scrape_soil_wetness_data; dates are
+            passed as DD/MM/YYYY strings
+        longitude (str): Longitude value
+        latitude (str): Latitude value
+        start_date (str): Start date in format DD/MM/YYYY
+        end_date (str): End date in format DD/MM/YYYY
+
+    Returns:
+        dict: Result with "table"/"all_tables" covering the whole range and
+        "cache" describing what was served from the cache, plus the
+        "timings" and "counters" of the fetches (summed over gaps) and the
+        backend that fetched them. If a fetch failed, "error" is set, along
+        with the failed fetch's coordinate_alert, failure and retryable
+        fields, and the table holds whatever was available.
+    """
+    started = time.perf_counter()
+    cached = cache.get(longitude, latitude, start_date, end_date)
+    gaps = cache.missing_ranges(longitude, latitude, start_date, end_date, cached=cached)
+
+    merged = dict(cached)
+    failed = None
+    # Step timings and event counts of the fetches, summed over the gaps
+    fetch_stats = {"timings": {}, "counters": {}}
+    fetched_days = 0
+    for gap_start, gap_end in gaps:
+        data = fetch(longitude, latitude, gap_start.strftime("%d/%m/%Y"), gap_end.strftime("%d/%m/%Y"))
+        add_fetch_stats(fetch_stats, data)
+        fetched_days += (gap_end - gap_start).days + 1
+        if "error" in data:
+            failed = data
+            break
+        # Keep only the gap's own days, in case the site pads the range
+        values = [(day, value) for day, value in result_to_daily_values(data) if gap_start <= day <= gap_end]
+        if data.get("counters", {}).get("result_timeouts"):
+            log.warning(f"Not caching {gap_start} to {gap_end}: the results did not finish loading")
+        else:
+            cache.put(longitude, latitude, gap_start, gap_end, values)
+        merged.update(values)
+
+    cache.record_lookup(len(cached), fetched_days)
+
+    # Days the site had no value for are remembered but not reported
+    table = daily_values_to_table(sorted((day, value) for day, value in merged.items() if value is not None))
+    result = {
+        "table": table,
+        "all_tables": [table],
+        "cache": {
+            "cached_days": len(cached),
+            "fetched_ranges": [[s.strftime("%d/%m/%Y"), e.strftime("%d/%m/%Y")] for s, e in gaps],
+            "seconds": round(time.perf_counter() - started, 3),
+        },
+    }
+    result.update({key: value for key, value in fetch_stats.items() if value})
+    if failed is not None:
+        result.update({key: failed[key] for key in ("error", "coordinate_alert", "failure", "retryable")
+                       if key in failed})
+    return result
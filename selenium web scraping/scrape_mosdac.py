@@ -1,768 +1,871 @@
-import time
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+import logging
+
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 from datetime import datetime
 import os
+import sys
 import json
+import argparse
+import time
 from selenium.webdriver.common.action_chains import ActionChains
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementNotInteractableException, UnexpectedAlertPresentException
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.alert import Alert
+from selenium.common.exceptions import ElementNotInteractableException, JavascriptException, UnexpectedAlertPresentException, WebDriverException
+from driver_manager import BROWSER_PROFILES, SWI_URL, DriverManager, get_default_manager
+from capture import CapturePolicy
+from extractors import extract_chart_series, extract_tables, parse_html_tables, select_primary_table
+from form_fill import check_date_format, fill_query_form
+from jobs import validate_job
+from locators import LocatorResolver, get_default_locator_cache
+from logs import LOG_LEVELS, bind_job, configure_logging, get_logger, job_context, unbind_job
+from pipeline import job_records
+from recovery import (BAD_INPUT, COORDINATE_WORDS, DATE_REJECTED, DATE_WORDS, ELEMENT_MISSING, SESSION_DEAD,
+                      SITE_BUSY, QueryFailure, Recovery, accept_alert, classify_alert, classify_exception,
+                      failure_fields)
+from swi_series import result_to_daily_values
+from waits import (StepTimer, page_ready, panel_expanded, resolve_timeouts,
+                   results_populated, snapshot_results, submit_outcome, wait_for)
+
+log = get_logger("scraper")
+
+# Every input's attributes in one call, for the debug log
+INPUT_DUMP_SCRIPT = """
+    return Array.prototype.map.call(document.querySelectorAll('input'), function (el) {
+        return {type: el.type, id: el.id, name: el.name, placeholder: el.placeholder, class: el.className};
+    });
+"""
+
+# Placeholders of a list of inputs in one call
+PLACEHOLDERS_SCRIPT = "return arguments[0].map(function (el) { return el.placeholder || ''; });"
+
+# Sets the first two inputs found in any shadow DOM to the longitude and
+# latitude given as arguments, for pages that hide the form in web components
+SHADOW_DOM_FILL_SCRIPT = """
+    function findInputsInShadowDOM(root, results) {
+        if (!results) results = [];
+        if (!root) return results;
+
+        // Check for shadow root
+        if (root.shadowRoot) {
+            var shadowInputs = root.shadowRoot.querySelectorAll('input');
+            for (var i = 0; i < shadowInputs.length; i++) {
+                results.push(shadowInputs[i]);
+            }
+
+            // Continue searching in shadow DOM children
+            var shadowChildren = root.shadowRoot.querySelectorAll('*');
+            for (var i = 0; i < shadowChildren.length; i++) {
+                findInputsInShadowDOM(shadowChildren[i], results);
+            }
+        }
+
+        // Search regular children
+        var children = root.querySelectorAll('*');
+        for (var i = 0; i < children.length; i++) {
+            findInputsInShadowDOM(children[i], results);
+        }
+
+        return results;
+    }
 
-def scrape_soil_wetness_data(longitude, latitude, start_date, end_date):
+    var shadowInputs = findInputsInShadowDOM(document.documentElement);
+    for (var i = 0; i < Math.min(2, shadowInputs.length); i++) {
+        shadowInputs[i].value = arguments[i];
+        shadowInputs[i].dispatchEvent(new Event('change'));
+    }
+    return shadowInputs.length;
+"""
+
+def scrape_soil_wetness_data(longitude, latitude, start_date, end_date, driver=None, timeouts=None,
+                             table_extraction="script", capture=None, artifacts_dir=None,
+                             locator_cache=None, site_url=SWI_URL, driver_manager=None, recovery_budget=None):
     """
     Scrape soil wetness index data from MOSDAC website.
     
+    The query is checked before a browser is touched, so invalid input fails
+    at once. Failures on the page are classified (see recovery.py) and each
+    kind gets its own cheap recovery instead of a page refresh: rejected
+    input is refilled in place, a busy site is resubmitted after a short
+    backoff, missing elements are looked up again without the cached
+    locators, and a dead browser is replaced.
+    
     Args:
         longitude (str): Longitude value
         latitude (str): Latitude value
         start_date (str): Start date in format DD/MM/YYYY
         end_date (str): End date in format DD/MM/YYYY
+        driver (WebDriver, optional): An already running WebDriver to reuse.
+            If omitted, a warm browser is taken from driver_manager and
+            handed back to it after the query.
+        timeouts (dict, optional): Maximum seconds for each readiness wait,
+            keyed like waits.DEFAULT_TIMEOUTS. Waits end as soon as the page
+            is ready, so these only cap slow steps.
+        table_extraction (str): "script" to serialise all tables in the browser
+            with one JavaScript call, or "page_source" to parse the page HTML
+            in Python
+        capture (CapturePolicy, optional): Which screenshots and page source
+            to keep. Defaults to CapturePolicy(), which only captures the page
+            state when the query fails.
+        artifacts_dir (str, optional): Folder to write this query's
+            screenshots to. Defaults to a new folder chosen by the policy.
+        locator_cache (LocatorCache, optional): Where the selectors that
+            found the form's elements are remembered per page version.
+            Defaults to the shared cache in the user's home folder; pass
+            LocatorCache(None) to keep it in memory only.
+        site_url (str): Page holding the Time Series form. Defaults to the
+            live SWI page; point it at a replay_server.ReplayServer to run
+            against a local stand-in.
+        driver_manager (DriverManager, optional): Where to take a browser
+            from when driver is omitted, and where a dead one is replaced.
+            Defaults to the process-wide manager. A browser passed in as
+            driver can't be replaced here, so its death fails the query
+            (as retryable)
+        recovery_budget (dict, optional): Recoveries allowed per failure
+            type, keyed like recovery.DEFAULT_BUDGET
         
     Returns:
-        DataFrame or dict: The scraped data
+        DataFrame or dict: The scraped data. Per-step elapsed seconds are
+        included under "timings", and recoveries under "counters"
+        ("recoveries_<failure>") and the "recovery" timing. A failed query
+        has "error", "failure" (the failure type, if known) and "retryable".
     """
-    # Set up Chrome options
-    chrome_options = Options()
-    # Uncomment the line below to run Chrome in headless mode
-    # chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--disable-notifications")
-    chrome_options.add_argument("--disable-popup-blocking")
-    
-    # Initialize the WebDriver
-    print("Initializing WebDriver...")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+    problem = validate_job({"longitude": longitude, "latitude": latitude,
+                            "start_date": start_date, "end_date": end_date})
+    if problem:
+        log.warning(f"Invalid query, not opening a browser: {problem}")
+        return failure_fields(BAD_INPUT, problem)
+    
+    # Tag every log record of this query with its point
+    log_token = bind_job(longitude=longitude, latitude=latitude)
+    timeouts = resolve_timeouts(timeouts)
+    timer = StepTimer()
+    artifacts = (capture or CapturePolicy()).recorder(artifacts_dir)
+    recovery = Recovery(timer, recovery_budget)
+    locator_cache = locator_cache or get_default_locator_cache()
+    manager = None
+    if driver is None:
+        manager = driver_manager or get_default_manager()
+        driver = manager.acquire()
+    crashed = False
+    use_cached_locators = True
+    # Date formats the page rejected or misread; later attempts move on to the next one
+    rejected_formats = []
     
     try:
-        # Open the website
-        print("Opening the MOSDAC website...")
-        driver.get("https://mosdac.gov.in/swi/")
-        
-        # Take a screenshot of the initial page
-        initial_screenshot = "initial_page.png"
-        driver.save_screenshot(initial_screenshot)
-        print(f"Saved initial page screenshot to {initial_screenshot}")
-        
-        # Wait for the page to load completely
-        print("Waiting for page to fully load...")
-        time.sleep(10)  # Increased wait time for page to fully load
-        
-        # Click on the arrow icon beside "Time Series"
-        print("Trying to locate and click on Time Series panel...")
-        
-        # Multiple approaches to find and click the Time Series element
-        time_series_clicked = False
+        while True:
+            attempt_started = time.perf_counter()
+            try:
+                return _run_query(driver, longitude, latitude, start_date, end_date, timeouts, timer, artifacts,
+                                  recovery, table_extraction, locator_cache, site_url, use_cached_locators,
+                                  rejected_formats)
+            except Exception as e:
+                failure = classify_exception(e)
+                alert_text = getattr(e, "alert_text", None)
+                if failure in (BAD_INPUT, SITE_BUSY) and not isinstance(e, QueryFailure):
+                    # An alert interrupted a step: take it off the page so the form can be used again
+                    alert_text = accept_alert(driver) or alert_text
+                    timer.count("alerts")
+                    log.warning(f"Alert interrupted the query: {alert_text}")
+                message = str(e) if isinstance(e, QueryFailure) else f"{type(e).__name__}: {getattr(e, 'msg', None) or e}"
+                
+                # A browser passed in by the caller can't be replaced here
+                action = None
+                if failure != SESSION_DEAD or manager is not None:
+                    action = recovery.next_action(failure, message)
+                if action is None:
+                    if failure == SESSION_DEAD:
+                        crashed = True
+                    log.error(f"Query failed ({failure or 'unrecoverable'}): {message}")
+                    return _error_result(driver, artifacts, timer, message, failure, alert_text)
+                recovery.add_time(time.perf_counter() - attempt_started)
+                
+                with recovery.timed():
+                    if action == "recycle_session":
+                        manager.release(driver, crashed=True)
+                        # Cleared first so a failed acquire() doesn't release the dead browser twice
+                        driver = None
+                        driver = manager.acquire()
+                    elif action == "resubmit":
+                        recovery.backoff()
+                    elif action == "relocate":
+                        # The cached selectors may point at elements that are gone
+                        use_cached_locators = False
+                # "refill" needs nothing more: the next attempt fills the form where it is
+    
+    finally:
+        # Hand the browser back to the manager it came from
+        if manager is not None and driver is not None:
+            manager.release(driver, crashed=crashed)
+        unbind_job(log_token)
+
+
+def _run_query(driver, longitude, latitude, start_date, end_date, timeouts, timer, artifacts, recovery,
+               table_extraction, locator_cache, site_url, use_cached_locators, rejected_formats):
+    """
+    One attempt at the query on the page the browser shows.
+
+    Alerts after submitting are recovered in place (refill or resubmit);
+    any other failure is raised for scrape_soil_wetness_data to classify.
+    A date format the page rejects with an alert, or reads as other days,
+    is added to rejected_formats and raised as DATE_REJECTED, so the next
+    attempt types the dates in a format not tried yet.
+
+    Returns:
+        dict: The scraped data, as returned by scrape_soil_wetness_data
+    """
+    # Open the website unless the session is already sitting on it
+    if not driver.current_url.startswith(site_url):
+        log.debug("Opening the MOSDAC website...")
+        driver.get(site_url)
+    
+    # Take a screenshot of the initial page
+    artifacts.step(driver, "initial_page")
+    
+    # Wait for the page to load completely
+    log.debug("Waiting for page to fully load...")
+    if wait_for(driver, page_ready, timeouts["page_load"], "page load") is None:
+        raise QueryFailure(SITE_BUSY, "The page did not finish loading")
+    timer.mark("page_load")
+    
+    # Look up the elements cached for this version of the page in one call;
+    # the search cascades below only run for the ones that aren't cached
+    locators = LocatorResolver(driver, locator_cache)
+    cached = locators.resolve() if use_cached_locators else {}
+    timer.count("locator_cache_hits", len(cached))
+    
+    _open_time_series(driver, cached, locators, timer, timeouts, artifacts)
+    
+    # Take a screenshot of the form
+    artifacts.step(driver, "form_view")
+    
+    inputs = _find_form_inputs(driver, cached, locators, timer)
+    
+    # Process dates
+    start_date_obj = datetime.strptime(start_date, "%d/%m/%Y")
+    end_date_obj = datetime.strptime(end_date, "%d/%m/%Y")
+    
+    form_fill = _fill_form(driver, inputs, longitude, latitude, start_date_obj, end_date_obj, locators, timer,
+                           timeouts, rejected_formats)
+    
+    # Take screenshot after filling in the form
+    artifacts.step(driver, "after_form_fill")
+    timer.mark("fill_form")
+    
+    submit_button = _find_submit_button(driver, cached, timer)
+    locators.remember("submit", submit_button)
+    
+    coordinate_alert = None
+    while True:
+        # Remember what the page shows before submitting so new results can be detected
+        results_baseline = snapshot_results(driver)
+        outcome = _submit_form(driver, submit_button, results_baseline, timeouts, timer)
+        if not outcome or outcome[0] != "alert":
+            break
         
-        # Method 1: Try to find by XPath containing 'Time Series' text
+        alert_text = outcome[1]
+        failure = classify_alert(alert_text)
+        if failure == BAD_INPUT and any(word in alert_text.lower() for word in COORDINATE_WORDS):
+            coordinate_alert = alert_text
+        elif (failure == BAD_INPUT and form_fill["date_format"]
+              and any(word in alert_text.lower() for word in DATE_WORDS)):
+            # Typing the same format again would be rejected the same way
+            rejected_formats.append(form_fill["date_format"])
+            raise QueryFailure(DATE_REJECTED, f"Site rejected the dates typed as {form_fill['date_format']}: "
+                                              f"{alert_text}", alert_text)
+        action = recovery.next_action(failure, f"alert: {alert_text}")
+        if action is None:
+            if failure == BAD_INPUT:
+                raise QueryFailure(failure, f"Site rejected the query: {alert_text}", alert_text)
+            raise QueryFailure(failure, f"Site did not answer: {alert_text}", alert_text)
+        
+        with recovery.timed():
+            if action == "refill":
+                if coordinate_alert:
+                    timer.count("coordinate_alert_retries")
+                # The page may have missed the typed values' events: set them again where they are
+                form_fill = _fill_form(driver, inputs, longitude, latitude, start_date_obj, end_date_obj,
+                                       locators, timer, timeouts, rejected_formats)
+            else:
+                recovery.backoff()
+    
+    # Take screenshot after clicking submit
+    artifacts.step(driver, "after_submit")
+    
+    timer.mark("submit")
+    
+    # Wait for a result table or chart to appear
+    log.debug("Waiting for results to load...")
+    if wait_for(driver, results_populated(results_baseline), timeouts["results"], "results") is None:
+        timer.count("result_timeouts")
+    timer.mark("wait_results")
+    
+    # Take final screenshot 
+    artifacts.step(driver, "final_results")
+    
+    # Extract data from the page
+    log.debug("Extracting data...")
+    data = {}
+    if artifacts.screenshots:
+        data["screenshots"] = artifacts.screenshots
+    if coordinate_alert:
+        data["coordinate_alert"] = coordinate_alert
+    data["form_fill"] = {key: form_fill[key] for key in ("coordinates_ok", "dates_ok", "date_format",
+                                                         "date_confirmed", "script_calls")}
+    
+    # Try to extract actual data
+    try:
+        # Extract all tables in one round trip (or from the page source offline)
+        page_source = None
+        if table_extraction == "page_source":
+            page_source = driver.page_source
+            all_table_data = parse_html_tables(page_source)
+        else:
+            all_table_data = extract_tables(driver)
+        
+        # Use the first table with data as the primary table
+        if all_table_data:
+            log.info(f"Found {len(all_table_data)} tables")
+            data["all_tables"] = all_table_data
+            data["table"] = select_primary_table(all_table_data)
+        
+        # Read the series behind any chart (dates and values) in one call
+        chart_elements, chart_series = extract_chart_series(driver)
+        if chart_elements:
+            log.debug(f"Found {chart_elements} chart/graph elements")
+            data["chart_elements"] = chart_elements
+        if chart_series:
+            log.info(f"Found {len(chart_series)} chart series with "
+                     f"{sum(len(series['points']) for series in chart_series)} dated values")
+            data["chart_series"] = chart_series
+        
+        # Keep the page source for later analysis if the capture policy asks for it
+        if artifacts.keep_page_source():
+            data["page_source"] = page_source or driver.page_source
+        
+    except UnexpectedAlertPresentException:
+        raise
+    except Exception as e:
+        log.error(f"Error during data extraction: {str(e)}")
+        data["error_during_extraction"] = str(e)
+    
+    # Dates left exactly as typed are judged by the days that came back: a
+    # misread format is dropped for the next one, and the format is cached
+    # only once the returned days show the page read it as meant
+    date_check = None
+    if form_fill["dates_ok"]:
+        date_check = "confirmed" if form_fill["date_confirmed"] else check_date_format(
+            form_fill["date_format"], [day for day, _ in result_to_daily_values(data)], start_date_obj, end_date_obj)
+    if date_check == "wrong":
+        rejected_formats.append(form_fill["date_format"])
+        raise QueryFailure(DATE_REJECTED, f"The page read the dates typed as {form_fill['date_format']} "
+                                          f"as other days")
+    
+    # Cache what the cascades found only once it has produced results, and
+    # forget cached selectors that led nowhere
+    try:
+        if date_check == "confirmed":
+            locators.remember_date_format(form_fill["date_format"])
+        if data.get("table") or data.get("chart_series"):
+            locators.save()
+        else:
+            locators.invalidate()
+        data["locators"] = locators.stats()
+    except Exception as e:
+        log.warning(f"Could not update the locator cache: {str(e)}")
+    
+    if date_check == "unconfirmed":
+        # The days may be right, but nothing shows the page read the dates as meant
+        log.warning(f"Could not confirm the page read the dates typed as {form_fill['date_format']} as meant")
+        data.update(failure_fields(None, f"Could not confirm the page read the dates typed as "
+                                         f"{form_fill['date_format']} as meant"))
+    
+    timer.mark("extract")
+    data["timings"] = timer.as_dict()
+    data["counters"] = timer.counters
+    timer.report()
+    log.info("Data extraction complete!", extra={"fields": {"timings": data["timings"],
+                                                           "counters": data["counters"]}})
+    return data
+
+
+def _open_time_series(driver, cached, locators, timer, timeouts, artifacts):
+    """Expand the Time Series panel, unless it already shows its inputs (e.g. when retrying in place)."""
+    if panel_expanded()(driver):
+        log.debug("Time Series panel is already open")
+        return
+    
+    # Click on the arrow icon beside "Time Series"
+    log.debug("Trying to locate and click on Time Series panel...")
+    
+    # Multiple approaches to find and click the Time Series element
+    time_series_clicked = False
+    
+    time_series_element = cached.get("time_series")
+    if time_series_element is not None:
+        try:
+            driver.execute_script("arguments[0].click();", time_series_element)
+            time_series_clicked = True
+            log.debug("Clicked on Time Series (cached locator)")
+        except WebDriverException as e:
+            log.warning(f"Cached Time Series locator failed: {str(e)}")
+    
+    # Method 1: Try to find by XPath containing 'Time Series' text
+    if not time_series_clicked:
         try:
             time_series_elements = driver.find_elements(By.XPATH, "//*[contains(text(), 'Time Series')]")
             if time_series_elements:
-                print(f"Found {len(time_series_elements)} elements containing 'Time Series' text")
+                log.debug(f"Found {len(time_series_elements)} elements containing 'Time Series' text")
                 # Try clicking the first element
-                driver.execute_script("arguments[0].click();", time_series_elements[0])
+                time_series_element = time_series_elements[0]
+                driver.execute_script("arguments[0].click();", time_series_element)
                 time_series_clicked = True
-                print("Clicked on Time Series (Method 1)")
-        except Exception as e:
-            print(f"Method 1 failed: {str(e)}")
-        
-        # Method 2: Try to find the arrow element
-        if not time_series_clicked:
-            try:
-                arrows = driver.find_elements(By.XPATH, "//div[contains(@class, 'arrow')]")
-                if arrows:
-                    print(f"Found {len(arrows)} possible arrow elements")
-                    driver.execute_script("arguments[0].click();", arrows[0])
-                    time_series_clicked = True
-                    print("Clicked on arrow (Method 2)")
-            except Exception as e:
-                print(f"Method 2 failed: {str(e)}")
-        
-        # Method 3: Try to find by class name that might contain expandable panels
-        if not time_series_clicked:
-            try:
-                panels = driver.find_elements(By.CSS_SELECTOR, ".panel, .accordion, .expandable, .collapsible")
-                if panels:
-                    print(f"Found {len(panels)} possible panel elements")
-                    driver.execute_script("arguments[0].click();", panels[0])
-                    time_series_clicked = True
-                    print("Clicked on panel (Method 3)")
-            except Exception as e:
-                print(f"Method 3 failed: {str(e)}")
-        
-        # Take a screenshot after attempting to click Time Series
-        time_series_screenshot = "after_time_series_click.png"
-        driver.save_screenshot(time_series_screenshot)
-        print(f"Saved screenshot after Time Series click attempt to {time_series_screenshot}")
-        
-        # Wait for any animation to complete
-        time.sleep(5)
-        
-        # Look for form elements or inputs
-        print("Analyzing form structure...")
-        
-        # Execute JavaScript to print out all input fields in the console (for debugging)
-        driver.execute_script("""
-            var inputs = document.querySelectorAll('input');
-            console.log('Found ' + inputs.length + ' input elements:');
-            for (var i = 0; i < inputs.length; i++) {
-                console.log('Input #' + i + ': type=' + inputs[i].type + 
-                          ', id=' + inputs[i].id + 
-                          ', name=' + inputs[i].name + 
-                          ', placeholder=' + inputs[i].placeholder);
-            }
-        """)
-        
-        # Try multiple ways to find and interact with the longitude and latitude inputs
-        print("Looking for longitude and latitude inputs...")
-        
-        # Look for all input fields
-        input_fields = driver.find_elements(By.TAG_NAME, "input")
-        print(f"Found {len(input_fields)} input fields")
-        
-        # Take a screenshot of the form
-        form_screenshot = "form_view.png"
-        driver.save_screenshot(form_screenshot)
-        print(f"Saved form view screenshot to {form_screenshot}")
-        
-        # Print details of each input field
-        for i, inp in enumerate(input_fields):
-            inp_type = inp.get_attribute("type") or "unknown"
-            inp_id = inp.get_attribute("id") or "no-id"
-            inp_name = inp.get_attribute("name") or "no-name"
-            inp_placeholder = inp.get_attribute("placeholder") or "no-placeholder"
-            inp_class = inp.get_attribute("class") or "no-class"
-            print(f"Input #{i}: type={inp_type}, id={inp_id}, name={inp_name}, placeholder={inp_placeholder}, class={inp_class}")
-        
-        # Based on the alert message, we need to handle the floating point numbers correctly
-        # Try using JavaScript directly to set the coordinates
-        try:
-            print("Attempting to set coordinates using JavaScript...")
-            
-            # Try to find specific inputs for longitude and latitude
-            longitude_input = None
-            latitude_input = None
-            
-            # Method 1: Look by placeholder
-            for inp in input_fields:
-                placeholder = inp.get_attribute("placeholder") or ""
-                if "longitude" in placeholder.lower():
-                    longitude_input = inp
-                elif "latitude" in placeholder.lower():
-                    latitude_input = inp
-            
-            # Method 2: Look by input order (usually first two are longitude/latitude)
-            if not longitude_input and len(input_fields) >= 1:
-                longitude_input = input_fields[0]
-            
-            if not latitude_input and len(input_fields) >= 2:
-                latitude_input = input_fields[1]
-            
-            # Try direct JavaScript injection first
-            if longitude_input:
-                print(f"Setting longitude to {longitude} using JavaScript")
-                driver.execute_script(f"arguments[0].value = '{longitude}';", longitude_input)
-                driver.execute_script("arguments[0].dispatchEvent(new Event('change'));", longitude_input)
-                print("Longitude set successfully with JavaScript")
-            
-            if latitude_input:
-                print(f"Setting latitude to {latitude} using JavaScript")
-                driver.execute_script(f"arguments[0].value = '{latitude}';", latitude_input)
-                driver.execute_script("arguments[0].dispatchEvent(new Event('change'));", latitude_input)
-                print("Latitude set successfully with JavaScript")
-                
-            # Additional method: Try to set values through shadow DOM if applicable
-            try:
-                driver.execute_script(f"""
-                    // Try to find inputs in any shadow DOM
-                    function findInputsInShadowDOM(root, results) {{
-                        if (!results) results = [];
-                        if (!root) return results;
-                        
-                        // Check for shadow root
-                        if (root.shadowRoot) {{
-                            var shadowInputs = root.shadowRoot.querySelectorAll('input');
-                            for (var i = 0; i < shadowInputs.length; i++) {{
-                                results.push(shadowInputs[i]);
-                            }}
-                            
-                            // Continue searching in shadow DOM children
-                            var shadowChildren = root.shadowRoot.querySelectorAll('*');
-                            for (var i = 0; i < shadowChildren.length; i++) {{
-                                findInputsInShadowDOM(shadowChildren[i], results);
-                            }}
-                        }}
-                        
-                        // Search regular children
-                        var children = root.querySelectorAll('*');
-                        for (var i = 0; i < children.length; i++) {{
-                            findInputsInShadowDOM(children[i], results);
-                        }}
-                        
-                        return results;
-                    }}
-                    
-                    var shadowInputs = findInputsInShadowDOM(document.documentElement);
-                    console.log('Found ' + shadowInputs.length + ' inputs in shadow DOM');
-                    
-                    // Try to set the first two inputs as longitude and latitude
-                    if (shadowInputs.length >= 1) {{
-                        shadowInputs[0].value = '{longitude}';
-                        shadowInputs[0].dispatchEvent(new Event('change'));
-                        console.log('Set longitude in shadow DOM');
-                    }}
-                    
-                    if (shadowInputs.length >= 2) {{
-                        shadowInputs[1].value = '{latitude}';
-                        shadowInputs[1].dispatchEvent(new Event('change'));
-                        console.log('Set latitude in shadow DOM');
-                    }}
-                """)
-                print("Attempted to set coordinates through shadow DOM")
-            except Exception as e:
-                print(f"Shadow DOM approach failed: {str(e)}")
-            
-            # Additional method: Try to interact with map element if present
-            try:
-                map_elements = driver.find_elements(By.XPATH, "//div[contains(@class, 'map')] | //div[contains(@class, 'leaflet')]")
-                if map_elements:
-                    print(f"Found {len(map_elements)} potential map elements")
-                    # Try clicking on the map to set the coordinates
-                    driver.execute_script("arguments[0].click();", map_elements[0])
-                    print("Clicked on map element")
-                    # After clicking, check if any input was populated
-                    for inp in input_fields:
-                        val = inp.get_attribute("value")
-                        if val:
-                            print(f"Input now has value: {val}")
-            except Exception as e:
-                print(f"Map interaction failed: {str(e)}")
-            
-        except Exception as e:
-            print(f"Error setting coordinates with JavaScript: {str(e)}")
-        
-        # Take screenshot after attempting to enter coordinates
-        coords_screenshot = "after_coordinates.png"
-        driver.save_screenshot(coords_screenshot)
-        print(f"Saved screenshot after setting coordinates to {coords_screenshot}")
-        
-        # Handle date inputs
-        date_inputs = []
-        for inp in input_fields:
-            if longitude_input and inp != longitude_input and latitude_input and inp != latitude_input:
-                date_inputs.append(inp)
-        
-        print(f"Found {len(date_inputs)} potential date input fields")
-        
-        # Process dates
-        start_date_obj = datetime.strptime(start_date, "%d/%m/%Y")
-        end_date_obj = datetime.strptime(end_date, "%d/%m/%Y")
-        
-        # Try multiple date formats for compatibility
-        start_date_formats = {
-            "MM/DD/YYYY": start_date_obj.strftime("%m/%d/%Y"),
-            "YYYY-MM-DD": start_date_obj.strftime("%Y-%m-%d"),
-            "DD-MM-YYYY": start_date_obj.strftime("%d-%m-%Y"),
-            "DD/MM/YYYY": start_date_obj.strftime("%d/%m/%Y")
-        }
-        
-        end_date_formats = {
-            "MM/DD/YYYY": end_date_obj.strftime("%m/%d/%Y"),
-            "YYYY-MM-DD": end_date_obj.strftime("%Y-%m-%d"),
-            "DD-MM-YYYY": end_date_obj.strftime("%d-%m-%Y"),
-            "DD/MM/YYYY": end_date_obj.strftime("%d/%m/%Y")
-        }
-        
-        # Enter start date if we found date inputs
-        if len(date_inputs) >= 1:
-            start_date_input = date_inputs[0]
-            print(f"Setting start date: {start_date}")
-            
-            # Try each format
-            date_set = False
-            for format_name, formatted_date in start_date_formats.items():
-                if date_set:
-                    break
-                try:
-                    print(f"Trying start date format: {format_name} = {formatted_date}")
-                    driver.execute_script(f"arguments[0].value = '{formatted_date}';", start_date_input)
-                    driver.execute_script("arguments[0].dispatchEvent(new Event('change'));", start_date_input)
-                    print(f"Set start date with format {format_name}")
-                    date_set = True
-                except Exception as e:
-                    print(f"Failed with format {format_name}: {str(e)}")
-            
-            # If all formats failed, try clicking to open date picker
-            if not date_set:
-                try:
-                    start_date_input.click()
-                    time.sleep(2)  # Wait for date picker to open
-                    # Look for day element in date picker
-                    day_elements = driver.find_elements(By.XPATH, 
-                        f"//td[contains(@class, 'day') and text()='{start_date_obj.day}']")
-                    if day_elements:
-                        driver.execute_script("arguments[0].click();", day_elements[0])
-                        print("Selected start date from date picker")
-                except Exception as e:
-                    print(f"Failed to use date picker for start date: {str(e)}")
-        
-        # Enter end date if we found enough date inputs
-        if len(date_inputs) >= 2:
-            end_date_input = date_inputs[1]
-            print(f"Setting end date: {end_date}")
-            
-            # Try each format
-            date_set = False
-            for format_name, formatted_date in end_date_formats.items():
-                if date_set:
-                    break
-                try:
-                    print(f"Trying end date format: {format_name} = {formatted_date}")
-                    driver.execute_script(f"arguments[0].value = '{formatted_date}';", end_date_input)
-                    driver.execute_script("arguments[0].dispatchEvent(new Event('change'));", end_date_input)
-                    print(f"Set end date with format {format_name}")
-                    date_set = True
-                except Exception as e:
-                    print(f"Failed with format {format_name}: {str(e)}")
-            
-            # If all formats failed, try clicking to open date picker
-            if not date_set:
-                try:
-                    end_date_input.click()
-                    time.sleep(2)  # Wait for date picker to open
-                    # Look for day element in date picker
-                    day_elements = driver.find_elements(By.XPATH, 
-                        f"//td[contains(@class, 'day') and text()='{end_date_obj.day}']")
-                    if day_elements:
-                        driver.execute_script("arguments[0].click();", day_elements[0])
-                        print("Selected end date from date picker")
-                except Exception as e:
-                    print(f"Failed to use date picker for end date: {str(e)}")
-        
-        # Take screenshot after entering dates
-        dates_screenshot = "after_dates.png"
-        driver.save_screenshot(dates_screenshot)
-        print(f"Saved screenshot after entering dates to {dates_screenshot}")
-        
-        # Find and click the submit button
-        print("Looking for submit button...")
-        submit_button = None
-        
-        # Method 1: Look by button text
-        try:
-            submit_buttons = driver.find_elements(By.XPATH, "//button[contains(translate(text(), 'SUBMIT', 'submit'), 'submit')]")
-            if submit_buttons:
-                submit_button = submit_buttons[0]
-                print("Found submit button by text")
-        except Exception as e:
-            print(f"Error finding submit button by text: {str(e)}")
-        
-        # Method 2: Look by common button classes
-        if not submit_button:
-            try:
-                submit_buttons = driver.find_elements(By.CSS_SELECTOR, ".submit, .btn-submit, .submitButton")
-                if submit_buttons:
-                    submit_button = submit_buttons[0]
-                    print("Found submit button by class")
-            except Exception as e:
-                print(f"Error finding submit button by class: {str(e)}")
-        
-        # Method 3: Look for any button
-        if not submit_button:
-            try:
-                buttons = driver.find_elements(By.TAG_NAME, "button")
-                if buttons:
-                    submit_button = buttons[0]
-                    print("Using first button as submit button")
-            except Exception as e:
-                print(f"Error finding buttons: {str(e)}")
-        
-        # Click the submit button if found
-        if submit_button:
-            try:
-                print("Clicking submit button...")
-                driver.execute_script("arguments[0].scrollIntoView(true);", submit_button)
-                time.sleep(1)  # Give time to scroll into view
-                
-                # Check and handle any alerts before clicking
-                try:
-                    alert = Alert(driver)
-                    alert_text = alert.text
-                    print(f"Alert present before clicking: {alert_text}")
-                    alert.accept()
-                except:
-                    pass  # No alert present
-                
-                # Click the button
-                driver.execute_script("arguments[0].click();", submit_button)
-                print("Clicked submit button using JavaScript")
-                
-                # Handle any alerts that pop up after clicking
-                try:
-                    time.sleep(2)  # Wait for alert to appear
-                    alert = Alert(driver)
-                    alert_text = alert.text
-                    print(f"Alert appeared after clicking: {alert_text}")
-                    alert.accept()
-                    
-                    # If the alert complained about coordinates, try to fix and resubmit
-                    if "latitude" in alert_text.lower() or "longitude" in alert_text.lower() or "point" in alert_text.lower():
-                        print("Alert mentioned coordinates issue. Trying alternative approach...")
-                        
-                        # Try using a different way to input coordinates
-                        try:
-                            print("Searching for coordinate inputs again...")
-                            # Refresh page and try again
-                            driver.refresh()
-                            time.sleep(5)
-                            
-                            # Try to click Time Series again
-                            time_series_elements = driver.find_elements(By.XPATH, "//*[contains(text(), 'Time Series')]")
-                            if time_series_elements:
-                                driver.execute_script("arguments[0].click();", time_series_elements[0])
-                                print("Clicked Time Series again after refresh")
-                                time.sleep(2)
-                            
-                            # Try using the map interface if available
-                            map_elements = driver.find_elements(By.TAG_NAME, "canvas")
-                            if map_elements:
-                                print("Found canvas element, trying to click on map")
-                                ActionChains(driver).move_to_element(map_elements[0]).click().perform()
-                                print("Clicked on map canvas")
-                            
-                            # Re-get the input fields after refresh
-                            input_fields = driver.find_elements(By.TAG_NAME, "input")
-                            
-                            # Try sending the values directly with ActionChains
-                            if len(input_fields) >= 2:
-                                print("Trying ActionChains to send values to first two inputs")
-                                ActionChains(driver).click(input_fields[0]).send_keys(Keys.CONTROL, "a").send_keys(Keys.DELETE).send_keys(longitude).perform()
-                                time.sleep(1)
-                                ActionChains(driver).click(input_fields[1]).send_keys(Keys.CONTROL, "a").send_keys(Keys.DELETE).send_keys(latitude).perform()
-                                time.sleep(1)
-                                print("Used ActionChains to set coordinates")
-                                
-                                # Re-submit
-                                submit_buttons = driver.find_elements(By.XPATH, "//button[contains(translate(text(), 'SUBMIT', 'submit'), 'submit')]")
-                                if submit_buttons:
-                                    driver.execute_script("arguments[0].click();", submit_buttons[0])
-                                    print("Re-clicked submit after fixing coordinates")
-                            
-                        except Exception as e:
-                            print(f"Alternative coordinates approach failed: {str(e)}")
-                except:
-                    pass  # No alert present
-                
-            except Exception as e:
-                print(f"Error clicking submit button with JavaScript: {str(e)}")
-                try:
-                    ActionChains(driver).move_to_element(submit_button).click().perform()
-                    print("Clicked submit button with ActionChains")
-                    
-                    # Handle any alerts after clicking
-                    try:
-                        time.sleep(2)  # Wait for alert to appear
-                        alert = Alert(driver)
-                        print(f"Alert after ActionChains click: {alert.text}")
-                        alert.accept()
-                    except:
-                        pass  # No alert present
-                    
-                except Exception as e2:
-                    print(f"Error clicking submit button with ActionChains: {str(e2)}")
-        else:
-            print("Could not find a submit button")
-        
-        # Take screenshot after clicking submit
-        submit_screenshot = "after_submit.png"
-        driver.save_screenshot(submit_screenshot)
-        print(f"Saved screenshot after submit to {submit_screenshot}")
-        
-        # Wait for results to load
-        print("Waiting for results to load...")
-        time.sleep(20)  # Extended wait time for results
-        
-        # Take final screenshot 
-        final_screenshot = "final_results.png"
-        driver.save_screenshot(final_screenshot)
-        print(f"Saved final screenshot to {final_screenshot}")
-        
-        # Extract data from the page
-        print("Extracting data...")
-        data = {
-            "screenshots": {
-                "initial_page": initial_screenshot,
-                "after_time_series": time_series_screenshot,
-                "form_view": form_screenshot,
-                "after_coordinates": coords_screenshot,
-                "after_dates": dates_screenshot,
-                "after_submit": submit_screenshot,
-                "final_results": final_screenshot
-            }
-        }
-        
-        # Try to extract actual data
+                log.debug("Clicked on Time Series (Method 1)")
+        except WebDriverException as e:
+            log.debug(f"Method 1 failed: {str(e)}")
+    
+    # Method 2: Try to find the arrow element
+    if not time_series_clicked:
         try:
-            # Look for tables
-            tables = driver.find_elements(By.TAG_NAME, "table")
-            if tables:
-                print(f"Found {len(tables)} tables")
-                all_table_data = []
-                
-                # Process each table
-                for table_idx, table in enumerate(tables):
-                    table_data = []
-                    headers = []
-                    
-                    try:
-                        rows = table.find_elements(By.TAG_NAME, "tr")
-                        for i, row in enumerate(rows):
-                            cells = row.find_elements(By.TAG_NAME, "td")
-                            if not cells:  # Might be header row with th
-                                cells = row.find_elements(By.TAG_NAME, "th")
-                            
-                            row_data = [cell.text for cell in cells]
-                            
-                            if i == 0:  # Assuming first row is headers
-                                headers = row_data
-                            else:
-                                if row_data:  # Only add non-empty rows
-                                    table_data.append(row_data)
-                        
-                        # Only add tables with actual data
-                        if headers or table_data:
-                            all_table_data.append({
-                                "table_index": table_idx,
-                                "headers": headers,
-                                "data": table_data
-                            })
-                    except Exception as e:
-                        print(f"Error processing table {table_idx}: {str(e)}")
-                
-                # Use the first table with data as the primary table
-                if all_table_data:
-                    data["all_tables"] = all_table_data
-                    # Find the first table with actual data
-                    for table_info in all_table_data:
-                        if table_info["data"]:
-                            data["table"] = table_info
-                            break
-                    if "table" not in data and all_table_data:
-                        data["table"] = all_table_data[0]  # Just use the first table if none have data
-            
-            # Look for chart/graph elements
-            charts = driver.find_elements(By.TAG_NAME, "canvas")
-            charts.extend(driver.find_elements(By.TAG_NAME, "svg"))
-            if charts:
-                print(f"Found {len(charts)} chart/graph elements")
-                data["chart_elements"] = len(charts)
-            
-            # Look for any numeric content that might be soil wetness data
-            number_elements = driver.find_elements(By.XPATH, "//*[contains(text(), '.')]")
-            potential_data = []
-            for elem in number_elements:
-                text = elem.text
-                if text and any(c.isdigit() for c in text):
-                    try:
-                        # Check if it's a number
-                        float(text.replace(',', ''))
-                        potential_data.append(text)
-                    except ValueError:
-                        # If multiple numbers in text, extract them
-                        import re
-                        numbers = re.findall(r"[-+]?\d*\.\d+|\d+", text)
-                        if numbers:
-                            potential_data.extend(numbers)
-            
-            if potential_data:
-                print(f"Found {len(potential_data)} potential numeric data points")
-                data["numeric_data"] = potential_data[:30]  # Limit to first 30 values
-            
-            # Capture page source in case we need to analyze it further
-            data["page_source"] = driver.page_source
-            
-        except Exception as e:
-            print(f"Error during data extraction: {str(e)}")
-            data["error_during_extraction"] = str(e)
-        
-        print("Data extraction complete!")
-        return data
-        
-    except UnexpectedAlertPresentException as alert_error:
-        print(f"Alert interrupted execution: {str(alert_error)}")
+            arrows = driver.find_elements(By.XPATH, "//div[contains(@class, 'arrow')]")
+            if arrows:
+                log.debug(f"Found {len(arrows)} possible arrow elements")
+                time_series_element = arrows[0]
+                driver.execute_script("arguments[0].click();", time_series_element)
+                time_series_clicked = True
+                log.debug("Clicked on arrow (Method 2)")
+                timer.count("time_series_fallback")
+        except WebDriverException as e:
+            log.debug(f"Method 2 failed: {str(e)}")
+    
+    # Method 3: Try to find by class name that might contain expandable panels
+    if not time_series_clicked:
         try:
-            # Try to get the alert text
-            alert = Alert(driver)
-            alert_text = alert.text
-            print(f"Alert text: {alert_text}")
-            alert.accept()
-            
-            # Take a screenshot
-            alert_screenshot = "alert_state.png"
-            driver.save_screenshot(alert_screenshot)
-            print(f"Saved alert state screenshot to {alert_screenshot}")
-            
-            return {
-                "error": f"Alert interrupted execution: {alert_text}",
-                "error_screenshot": alert_screenshot,
-                "page_source": driver.page_source
-            }
-        except:
-            # If we can't get the alert text
-            error_screenshot = "error_state.png"
-            driver.save_screenshot(error_screenshot)
-            print(f"Saved error state screenshot to {error_screenshot}")
-            return {
-                "error": str(alert_error),
-                "error_screenshot": error_screenshot,
-                "page_source": driver.page_source
-            }
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
-        # Try to capture a screenshot of the error state
+            panels = driver.find_elements(By.CSS_SELECTOR, ".panel, .accordion, .expandable, .collapsible")
+            if panels:
+                log.debug(f"Found {len(panels)} possible panel elements")
+                time_series_element = panels[0]
+                driver.execute_script("arguments[0].click();", time_series_element)
+                time_series_clicked = True
+                log.debug("Clicked on panel (Method 3)")
+                timer.count("time_series_fallback")
+        except WebDriverException as e:
+            log.debug(f"Method 3 failed: {str(e)}")
+    
+    if time_series_clicked:
+        locators.remember("time_series", time_series_element)
+    
+    # Take a screenshot after attempting to click Time Series
+    artifacts.step(driver, "after_time_series")
+    
+    # Wait for the panel to expand and show its input fields
+    if wait_for(driver, panel_expanded(), timeouts["panel"], "Time Series panel inputs") is None:
+        raise QueryFailure(ELEMENT_MISSING, "The Time Series panel did not open")
+    timer.mark("open_time_series")
+
+
+def _find_form_inputs(driver, cached, locators, timer):
+    """Return the longitude, latitude, start_date and end_date inputs, cached ones first."""
+    form_inputs = {name: cached.get(name) for name in ("longitude", "latitude", "start_date", "end_date")}
+    if all(element is not None for element in form_inputs.values()):
+        # Every input is cached for this page version: skip the form analysis
+        log.debug("Using the form inputs cached for this page version")
+        return form_inputs
+    
+    # Look for form elements or inputs
+    log.debug("Analyzing form structure...")
+    timer.count("form_analysis")
+
+    # Try multiple ways to find the longitude and latitude inputs
+    log.debug("Looking for longitude and latitude inputs...")
+
+    # Look for all input fields
+    input_fields = driver.find_elements(By.TAG_NAME, "input")
+    log.debug(f"Found {len(input_fields)} input fields")
+
+    # Log details of each input field; collecting them costs a script
+    # call, so only when debug logging is on
+    if log.isEnabledFor(logging.DEBUG):
+        for i, attributes in enumerate(driver.execute_script(INPUT_DUMP_SCRIPT)):
+            log.debug(f"Input #{i}: " + ", ".join(f"{key}={value or 'none'}"
+                                                 for key, value in attributes.items()))
+
+    # Try to find specific inputs for longitude and latitude
+    longitude_input = None
+    latitude_input = None
+
+    # Method 1: Look by placeholder (read for all inputs in one call)
+    placeholders = driver.execute_script(PLACEHOLDERS_SCRIPT, input_fields) if input_fields else []
+    for inp, placeholder in zip(input_fields, placeholders):
+        if "longitude" in placeholder.lower():
+            longitude_input = inp
+        elif "latitude" in placeholder.lower():
+            latitude_input = inp
+
+    # Method 2: Look by input order (usually first two are longitude/latitude)
+    if not longitude_input and len(input_fields) >= 1:
+        longitude_input = input_fields[0]
+
+    if not latitude_input and len(input_fields) >= 2:
+        latitude_input = input_fields[1]
+
+    if longitude_input is None or latitude_input is None:
+        raise QueryFailure(ELEMENT_MISSING, "Could not find the longitude and latitude inputs")
+
+    # The other inputs are the date inputs
+    date_inputs = [inp for inp in input_fields if inp != longitude_input and inp != latitude_input]
+    log.debug(f"Found {len(date_inputs)} potential date input fields")
+    start_date_input = date_inputs[0] if len(date_inputs) >= 1 else None
+    end_date_input = date_inputs[1] if len(date_inputs) >= 2 else None
+    
+    locators.remember("longitude", longitude_input)
+    locators.remember("latitude", latitude_input)
+    if end_date_input is not None:
+        locators.remember("start_date", start_date_input)
+        locators.remember("end_date", end_date_input)
+    return {"longitude": longitude_input, "latitude": latitude_input,
+            "start_date": start_date_input, "end_date": end_date_input}
+
+
+def _fill_form(driver, inputs, longitude, latitude, start_date_obj, end_date_obj, locators, timer, timeouts,
+               rejected_formats=()):
+    """Set the coordinates and dates, falling back to other ways of setting them. Returns fill_query_form's result."""
+    # Set the coordinates and both dates in one call and read back what the
+    # page kept. The date format that worked last time is tried first, and
+    # formats the page already rejected in this query are skipped.
+    log.info(f"Setting coordinates ({longitude}, {latitude}) and dates "
+             f"{start_date_obj:%d/%m/%Y} to {end_date_obj:%d/%m/%Y}...")
+    form_fill = fill_query_form(driver, inputs, longitude, latitude, start_date_obj, end_date_obj,
+                                date_format=locators.date_format, exclude=rejected_formats)
+    
+    timer.count("date_format_retries", form_fill["script_calls"] - 1)
+    
+    if not form_fill["coordinates_ok"]:
+        timer.count("coordinate_fallback")
+        # Additional method: Try to set values through shadow DOM if applicable
         try:
-            error_screenshot = "error_state.png"
-            driver.save_screenshot(error_screenshot)
-            print(f"Saved error state screenshot to {error_screenshot}")
-            return {
-                "error": str(e),
-                "error_screenshot": error_screenshot,
-                "page_source": driver.page_source
-            }
-        except:
-            return {"error": str(e)}
+            driver.execute_script(SHADOW_DOM_FILL_SCRIPT, str(longitude), str(latitude))
+            log.debug("Attempted to set coordinates through shadow DOM")
+        except WebDriverException as e:
+            log.warning(f"Shadow DOM approach failed: {str(e)}")
     
-    finally:
-        # Close the browser
-        print("Closing WebDriver...")
+        # Additional method: Try to interact with map element if present
         try:
-            driver.quit()
-        except Exception as e:
-            print(f"Error closing browser: {str(e)}")
+            map_elements = driver.find_elements(By.XPATH, "//div[contains(@class, 'map')] | //div[contains(@class, 'leaflet')]")
+            if map_elements:
+                log.debug(f"Found {len(map_elements)} potential map elements")
+                # Try clicking on the map to set the coordinates
+                driver.execute_script("arguments[0].click();", map_elements[0])
+                log.debug("Clicked on map element")
+        except WebDriverException as e:
+            log.warning(f"Map interaction failed: {str(e)}")
+    
+    if not form_fill["dates_ok"]:
+        # No typed format was kept: pick the days from the date picker
+        timer.count("date_picker_fallback")
+        for label, date_input, date_obj in (("start", inputs["start_date"], start_date_obj),
+                                            ("end", inputs["end_date"], end_date_obj)):
+            if date_input is None:
+                continue
+            try:
+                date_input.click()
+                # Wait for the date picker to open and show the day
+                day_xpath = f"//td[contains(@class, 'day') and text()='{date_obj.day}']"
+                day_elements = wait_for(driver, lambda d: d.find_elements(By.XPATH, day_xpath),
+                                        timeouts["date_picker"], "date picker") or []
+                if day_elements:
+                    driver.execute_script("arguments[0].click();", day_elements[0])
+                    log.debug(f"Selected {label} date from date picker")
+            except WebDriverException as e:
+                if isinstance(e, UnexpectedAlertPresentException):
+                    raise
+                log.warning(f"Failed to use date picker for {label} date: {str(e)}")
+    return form_fill
+
+
+def _find_submit_button(driver, cached, timer):
+    """Return the form's submit button, cached one first."""
+    log.debug("Looking for submit button...")
+    submit_button = cached.get("submit")
+    if submit_button is not None:
+        log.debug("Using the submit button cached for this page version")
+        return submit_button
+    
+    # Method 1: Look by button text
+    submit_buttons = driver.find_elements(By.XPATH, "//button[contains(translate(text(), 'SUBMIT', 'submit'), 'submit')]")
+    if submit_buttons:
+        log.debug("Found submit button by text")
+        return submit_buttons[0]
+    
+    # Method 2: Look by common button classes
+    submit_buttons = driver.find_elements(By.CSS_SELECTOR, ".submit, .btn-submit, .submitButton")
+    if submit_buttons:
+        log.debug("Found submit button by class")
+        timer.count("submit_fallback")
+        return submit_buttons[0]
+    
+    # Method 3: Look for any button
+    buttons = driver.find_elements(By.TAG_NAME, "button")
+    if buttons:
+        log.debug("Using first button as submit button")
+        timer.count("submit_fallback")
+        return buttons[0]
+    
+    raise QueryFailure(ELEMENT_MISSING, "Could not find a submit button")
+
+
+def _submit_form(driver, submit_button, results_baseline, timeouts, timer):
+    """
+    Click submit and wait briefly for an alert or new results.
+
+    Returns:
+        tuple or None: ("alert", text) with the alert accepted,
+        ("results", snapshot), or None if neither showed up yet
+    """
+    # An alert left open from before would block the click
+    stale_alert = accept_alert(driver)
+    if stale_alert is not None:
+        log.warning(f"Alert present before clicking: {stale_alert}")
+        timer.count("alerts")
+    
+    log.debug("Clicking submit button...")
+    try:
+        driver.execute_script("arguments[0].scrollIntoView(true); arguments[0].click();", submit_button)
+        log.debug("Clicked submit button using JavaScript")
+    except (ElementNotInteractableException, JavascriptException) as e:
+        log.warning(f"Error clicking submit button with JavaScript: {str(e)}")
+        ActionChains(driver).move_to_element(submit_button).click().perform()
+        log.debug("Clicked submit button with ActionChains")
+    
+    # New results showing up first means the form was accepted
+    outcome = wait_for(driver, submit_outcome(results_baseline), timeouts["alert"], "alert or results", quiet=True)
+    if outcome and outcome[0] == "alert":
+        alert_text = outcome[1].text
+        log.warning(f"Alert appeared after clicking: {alert_text}")
+        timer.count("alerts")
+        outcome[1].accept()
+        return ("alert", alert_text)
+    return outcome
 
-def save_data_to_files(data, longitude, latitude):
-    """Save the scraped data to files."""
+def scrape_soil_wetness_records(longitude, latitude, start_date, end_date, job_id=None, **kwargs):
+    """
+    Scrape one query and yield it as normalised records (see pipeline.job_records).
+
+    Only the daily values and a small job record leave this function; the
+    page's tables, screenshots list and HTML are dropped as soon as the
+    records are produced. Keyword arguments are passed to
+    scrape_soil_wetness_data.
+
+    Yields:
+        dict: One "observation" record per day with a value, then one "job" record
+    """
+    job = {"job_id": job_id, "longitude": longitude, "latitude": latitude,
+           "start_date": start_date, "end_date": end_date}
+    started = time.time()
+    with job_context(job_id=job_id):
+        data = scrape_soil_wetness_data(longitude, latitude, start_date, end_date, **kwargs)
+    result = {"status": "error" if "error" in data else "ok",
+              "elapsed_seconds": round(time.time() - started, 3), "data": data}
+    if "error" in data:
+        result["error"] = data["error"]
+    del data
+    yield from job_records(job, result)
+
+def _error_result(driver, artifacts, timer, message, failure=None, alert_text=None):
+    """Build the result of a failed query, with whatever the capture policy keeps."""
+    result = failure_fields(failure, message)
+    result.update({"timings": timer.as_dict(), "counters": timer.counters})
+    if alert_text and any(word in alert_text.lower() for word in COORDINATE_WORDS):
+        result["coordinate_alert"] = alert_text
+    if failure == SESSION_DEAD:
+        # Nothing to capture from a browser that is gone
+        return result
+    try:
+        error_screenshot = artifacts.error(driver, "alert_state" if alert_text else "error_state")
+        if error_screenshot:
+            result["error_screenshot"] = error_screenshot
+        if artifacts.keep_page_source(error=True):
+            result["page_source"] = driver.page_source
+    except WebDriverException as e:
+        log.warning(f"Could not capture the error state: {str(e)}")
+    return result
+
+def output_folder_name(longitude, latitude):
+    """Return a new, timestamped output folder name for a query."""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    folder_name = f"soil_wetness_data_{longitude}_{latitude}_{timestamp}"
+    return f"soil_wetness_data_{longitude}_{latitude}_{timestamp}"
+
+def save_data_to_files(data, longitude, latitude, folder_name=None, metrics=None):
+    """
+    Save the scraped data to files.
+    
+    Args:
+        data (dict): Result of scrape_soil_wetness_data
+        longitude (str): Longitude value
+        latitude (str): Latitude value
+        folder_name (str, optional): Output folder (default: a new timestamped one)
+        metrics (MetricsRegistry, optional): Receives the time spent on each
+            file, as stages of the "save" backend
+        
+    Returns:
+        str or None: The output folder, or None if saving failed
+    """
+    if folder_name is None:
+        folder_name = output_folder_name(longitude, latitude)
+    timer = StepTimer()
     
     try:
         # Create directory if it doesn't exist
         if not os.path.exists(folder_name):
             os.makedirs(folder_name)
         
-        # Copy screenshots to folder (but don't delete originals)
+        # Copy screenshots to folder (but don't delete originals); screenshots
+        # already written into the folder are left where they are
         if "screenshots" in data:
             for name, path in data["screenshots"].items():
-                if os.path.exists(path):
+                if os.path.exists(path) and not _in_folder(path, folder_name):
                     new_path = os.path.join(folder_name, f"{name}.png")
                     import shutil
                     shutil.copy(path, new_path)
-                    print(f"Copied screenshot {path} to {new_path}")
+                    log.debug(f"Copied screenshot {path} to {new_path}")
         
         # Copy error screenshot if present (but don't delete original)
-        if "error_screenshot" in data and os.path.exists(data["error_screenshot"]):
+        if ("error_screenshot" in data and os.path.exists(data["error_screenshot"])
+                and not _in_folder(data["error_screenshot"], folder_name)):
             import shutil
             error_path = os.path.join(folder_name, "error.png")
             shutil.copy(data["error_screenshot"], error_path)
-            print(f"Copied error screenshot to {error_path}")
+            log.debug(f"Copied error screenshot to {error_path}")
+        timer.mark("screenshots")
         
         # Save raw data as JSON
         with open(os.path.join(folder_name, "raw_data.json"), "w") as f:
             # Create a copy of data without page_source to make the JSON more readable
             data_copy = {k: v for k, v in data.items() if k != "page_source"}
             json.dump(data_copy, f, indent=4)
+        timer.mark("raw_json")
         
         # Save page source separately
         if "page_source" in data:
             with open(os.path.join(folder_name, "page_source.html"), "w", encoding="utf-8") as f:
                 f.write(data["page_source"])
+            timer.mark("page_source")
         
         # If there's table data, save as CSV
         if "table" in data and data["table"]["headers"] and data["table"]["data"]:
             try:
+                import pandas as pd
                 df = pd.DataFrame(data["table"]["data"], columns=data["table"]["headers"])
                 df.to_csv(os.path.join(folder_name, "table_data.csv"), index=False)
-                print(f"Table data saved to {folder_name}/table_data.csv")
+                log.info(f"Table data saved to {folder_name}/table_data.csv")
             except Exception as e:
-                print(f"Error saving table data to CSV: {str(e)}")
+                log.warning(f"Error saving table data to CSV: {str(e)}")
                 # Try a more robust approach
                 try:
                     # If headers and data don't match, create a simple DataFrame
-                    print("Trying alternative CSV saving approach...")
+                    log.debug("Trying alternative CSV saving approach...")
                     with open(os.path.join(folder_name, "table_data.txt"), "w") as f:
                         if data["table"]["headers"]:
                             f.write(",".join(data["table"]["headers"]) + "\n")
                         for row in data["table"]["data"]:
                             f.write(",".join(str(cell) for cell in row) + "\n")
-                    print(f"Table data saved to {folder_name}/table_data.txt")
+                    log.info(f"Table data saved to {folder_name}/table_data.txt")
                 except Exception as e2:
-                    print(f"Alternative approach also failed: {str(e2)}")
-        
-        # If we found numeric data, save it
-        if "numeric_data" in data and data["numeric_data"]:
-            with open(os.path.join(folder_name, "numeric_data.txt"), "w") as f:
-                f.write("\n".join(data["numeric_data"]))
-        
-        print(f"All data saved to folder: {folder_name}")
+                    log.error(f"Alternative approach also failed: {str(e2)}")
+            timer.mark("table_csv")
+        
+        # If we found chart series, save them as date/value CSV
+        if data.get("chart_series"):
+            with open(os.path.join(folder_name, "chart_series.csv"), "w") as f:
+                f.write("series,date,value\n")
+                for series in data["chart_series"]:
+                    name = series["name"] or series["source"]
+                    for day, value in series["points"]:
+                        f.write(f"{name},{day},{value}\n")
+            timer.mark("chart_csv")
+        
+        if metrics is not None:
+            metrics.record_steps("save", timer.as_dict())
+        log.info(f"All data saved to folder: {folder_name}")
         return folder_name
     
     except Exception as e:
-        print(f"Error saving data: {str(e)}")
+        log.error(f"Error saving data: {str(e)}")
         return None
 
+def _in_folder(path, folder_name):
+    return os.path.dirname(os.path.abspath(path)) == os.path.abspath(folder_name)
+
 def main():
+    parser = argparse.ArgumentParser(description="Scrape soil wetness index data for one point from MOSDAC. "
+                                                 "Values not given as arguments are asked for; for scripts "
+                                                 "and batches use swi_cli.py.")
+    parser.add_argument("longitude", nargs="?", help="e.g. 77.88")
+    parser.add_argument("latitude", nargs="?", help="e.g. 23.47")
+    parser.add_argument("start_date", nargs="?", help="DD/MM/YYYY")
+    parser.add_argument("end_date", nargs="?", help="DD/MM/YYYY")
+    parser.add_argument("--browser-profile", choices=BROWSER_PROFILES, default="default",
+                        help="Chrome settings; 'fast' runs headless and skips images, fonts, map tiles and analytics")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="info",
+                        help="How much progress to show; 'debug' lists every step and form input")
+    args = parser.parse_args()
+    if args.end_date is not None:
+        problem = validate_job(vars(args))
+        if problem:
+            parser.error(problem)
+    longitude, latitude, start_date, end_date = args.longitude, args.latitude, args.start_date, args.end_date
+    # Progress goes to the console as plain text, like the prompts
+    configure_logging(args.log_level, "text", sys.stdout)
+    
     print("\n" + "="*50)
     print("Soil Wetness Index Data Scraper for MOSDAC")
     print("="*50 + "\n")
     
     # Get user inputs with validation to ensure they're floating point numbers
-    while True:
+    while longitude is None:
         longitude = input("Enter longitude (e.g., 77.88): ")
         try:
             float(longitude)
-            break
         except ValueError:
             print("Please enter a valid floating point number for longitude.")
+            longitude = None
     
-    while True:
+    while latitude is None:
         latitude = input("Enter latitude (e.g., 23.47): ")
         try:
             float(latitude)
-            break
         except ValueError:
             print("Please enter a valid floating point number for latitude.")
+            latitude = None
     
     # Date inputs with validation
-    while True:
+    while start_date is None:
         start_date = input("Enter start date (DD/MM/YYYY): ")
         try:
             datetime.strptime(start_date, "%d/%m/%Y")
-            break
         except ValueError:
             print("Invalid date format. Please use DD/MM/YYYY.")
+            start_date = None
     
-    while True:
+    while end_date is None:
         end_date = input("Enter end date (DD/MM/YYYY): ")
         try:
             datetime.strptime(end_date, "%d/%m/%Y")
-            break
         except ValueError:
             print("Invalid date format. Please use DD/MM/YYYY.")
+            end_date = None
     
     print("\nStarting web scraping process...")
     print("-"*40)
     
-    # Scrape the data
-    data = scrape_soil_wetness_data(longitude, latitude, start_date, end_date)
+    # Scrape the data, writing screenshots of every step straight into the output folder
+    output_folder = output_folder_name(longitude, latitude)
+    manager = DriverManager(browser_profile=args.browser_profile)
+    try:
+        data = scrape_soil_wetness_data(longitude, latitude, start_date, end_date, driver_manager=manager,
+                                        capture=CapturePolicy("always"), artifacts_dir=output_folder)
+    finally:
+        manager.shutdown()
     
     # Process and display the data
-    if "error" in data and not any(k != "error" and k != "error_screenshot" and k != "page_source" for k in data.keys()):
+    if "error" in data:
         print(f"\nFailed to scrape data: {data['error']}")
         if "error_screenshot" in data:
             print(f"Error state screenshot saved to: {data['error_screenshot']}")
@@ -771,7 +874,7 @@ def main():
         
         # Save the data
         try:
-            output_folder = save_data_to_files(data, longitude, latitude)
+            output_folder = save_data_to_files(data, longitude, latitude, output_folder)
             
             # Display a summary of what we found
             print("\nSummary of scraped data:")
@@ -791,8 +894,9 @@ def main():
             if "chart_elements" in data:
                 print(f"• Chart elements: Detected {data['chart_elements']} chart/graph elements on the page")
             
-            if "numeric_data" in data:
-                print(f"• Numeric data: Found {len(data['numeric_data'])} potential soil wetness values")
+            if "chart_series" in data:
+                values_count = sum(len(series["points"]) for series in data["chart_series"])
+                print(f"• Chart series: Found {len(data['chart_series'])} series with {values_count} dated values")
             
             if "error_during_extraction" in data:
                 print(f"• Note: Some errors occurred during data extraction: {data['error_during_extraction']}")
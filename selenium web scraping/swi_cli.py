@@ -0,0 +1,286 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from capture import CAPTURE_MODES
+from chunking import CHUNK_SIZES, DEFAULT_CHUNK_ATTEMPTS
+from driver_manager import BROWSER_PROFILES
+from logs import LOG_FORMATS, LOG_LEVELS, configure_logging, get_logger
+
+log = get_logger("cli")
+
+# Exit codes
+EXIT_OK = 0
+EXIT_FAILED = 1  # the query, or some jobs of a batch, failed
+EXIT_USAGE = 2  # bad arguments or invalid input (argparse uses 2 as well)
+EXIT_INTERRUPTED = 130
+
+QUERY_FORMATS = ("json", "jsonl", "csv")
+BACKENDS = ("browser", "http", "auto")
+
+
+class UsageError(Exception):
+    """Invalid input found after argument parsing (exit code 2)."""
+
+
+def _open_output(path):
+    if path in (None, "-"):
+        return sys.stdout
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def _write_summary(path, summary):
+    """Append one summary line to a JSONL file."""
+    if path:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary, default=str) + "\n")
+
+
+def _capture_policy(args):
+    from capture import CapturePolicy
+    return CapturePolicy(args.capture, args.sample_rate, args.artifacts_dir)
+
+
+def write_query_result(data, longitude, latitude, fmt, out):
+    """
+    Write one query's result in a machine-readable format.
+
+    Args:
+        data (dict): Result from the scraper, HTTP backend or cache
+        longitude (str): Longitude value
+        latitude (str): Latitude value
+        fmt (str): "json" for the whole result as one object, "jsonl" for
+            one {date, lon, lat, swi} object per day, or "csv" for
+            date,lon,lat,swi rows
+        out (file): Where to write
+    """
+    if fmt == "json":
+        out.write(json.dumps({k: v for k, v in data.items() if k != "page_source"}, default=str) + "\n")
+        return
+    from swi_series import result_to_daily_values
+    rows = [(day.isoformat(), longitude, latitude, value) for day, value in result_to_daily_values(data)]
+    if fmt == "jsonl":
+        for day, lon, lat, value in rows:
+            out.write(json.dumps({"date": day, "lon": float(lon), "lat": float(lat), "swi": value}) + "\n")
+    else:
+        writer = csv.writer(out)
+        writer.writerow(["date", "lon", "lat", "swi"])
+        writer.writerows((day, lon, lat, "" if value is None else value) for day, lon, lat, value in rows)
+
+
+def cmd_query(args):
+    from jobs import validate_job
+    job = {"job_id": "query", "longitude": args.longitude, "latitude": args.latitude,
+           "start_date": args.start_date, "end_date": args.end_date}
+    problem = validate_job(job)
+    if problem:
+        raise UsageError(problem)
+
+    from batch_scrape import Fetcher
+    started = time.time()
+    fetcher = Fetcher(args.backend, args.concurrency, capture=_capture_policy(args), cache_path=args.cache,
+                      endpoint=args.endpoint, browser_profile=args.browser_profile, chunk=args.chunk,
+                      chunk_attempts=args.chunk_attempts)
+    try:
+        data, elapsed = fetcher(dict(job, jobs=[job]))
+    finally:
+        fetcher.close()
+
+    out = _open_output(args.output)
+    try:
+        write_query_result(data, args.longitude, args.latitude, args.format, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    status = "error" if "error" in data else "ok"
+    summary = {"command": "query", "status": status, "elapsed_seconds": round(time.time() - started, 3),
+               "fetch_seconds": elapsed, "backend": data.get("backend")}
+    if "error" in data:
+        summary["error"] = data["error"]
+        log.error(f"Query failed: {data['error']}")
+    _write_summary(args.summary, summary)
+    return EXIT_OK if status == "ok" else EXIT_FAILED
+
+
+def cmd_batch(args):
+    from jobs import load_jobs
+    try:
+        jobs = load_jobs(args.jobs_file)
+    except (OSError, ValueError, UnicodeDecodeError) as e:
+        raise UsageError(f"Can't read jobs from {args.jobs_file}: {str(e)}")
+    if not jobs:
+        raise UsageError(f"No jobs in {args.jobs_file}")
+
+    processes = args.processes
+    if processes == 0:
+        from process_pool import default_worker_count
+        processes = default_worker_count()
+
+    from batch_scrape import run_batch
+    summary = run_batch(jobs, pool_size=args.concurrency, output_path=args.output,
+                        recycle_after=args.recycle_after, backend=args.backend, endpoint=args.endpoint,
+                        cache_path=args.cache, dedupe=not args.no_dedupe, capture=_capture_policy(args),
+                        sinks=args.sink,
+                        queue_path=args.queue, processes=processes, browser_profile=args.browser_profile,
+                        metrics_path=args.metrics, chunk=args.chunk, chunk_attempts=args.chunk_attempts,
+                        report=False)
+    failed = sum(count for status, count in summary["by_status"].items() if status != "ok")
+    summary = dict(summary, command="batch", status="ok" if not failed else "error", failed=failed)
+    # The summary is the only thing on stdout, unless a sink streams there too
+    if "-" not in args.sink:
+        print(json.dumps(summary, default=str))
+    _write_summary(args.summary, summary)
+    return EXIT_OK if not failed else EXIT_FAILED
+
+
+def cmd_cache(args):
+    if args.action == "clear-locators":
+        from locators import DEFAULT_LOCATOR_CACHE_PATH, LocatorCache
+        cache = LocatorCache(args.locators or DEFAULT_LOCATOR_CACHE_PATH)
+        removed = cache.clear()
+        result = {"action": args.action, "path": cache.path, "entries_removed": removed}
+    else:
+        from result_cache import DEFAULT_CACHE_PATH, ResultCache
+        cache = ResultCache(args.cache or DEFAULT_CACHE_PATH)
+        try:
+            result = {"action": args.action, "path": cache.path}
+            if args.action == "evict":
+                result["rows_removed"] = cache.evict()
+            elif args.action == "clear":
+                cache.clear()
+            result.update(cache.info())
+        finally:
+            cache.close()
+    print(json.dumps(result))
+    _write_summary(args.summary, dict(result, command="cache"))
+    return EXIT_OK
+
+
+def cmd_bench(args):
+    import benchmark_suite
+    started = time.time()
+    try:
+        benchmark_suite.main(args.bench_args)
+        code = EXIT_OK
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else EXIT_FAILED
+    _write_summary(args.summary, {"command": "bench", "status": "ok" if code == EXIT_OK else "error",
+                                  "elapsed_seconds": round(time.time() - started, 3)})
+    return code
+
+
+def _add_fetch_options(parser):
+    parser.add_argument("--backend", choices=BACKENDS, default="browser",
+                        help="Drive Chrome, call the SWI data endpoint directly, or try HTTP then Chrome")
+    parser.add_argument("--endpoint", metavar="URL",
+                        help="SWI data endpoint for the http and auto backends (e.g. a replay_server.py URL)")
+    parser.add_argument("-c", "--concurrency", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Browser sessions (and HTTP connections) to use at once")
+    parser.add_argument("--browser-profile", choices=BROWSER_PROFILES, default="default",
+                        help="Chrome settings; 'fast' runs headless and skips images, fonts, map tiles and analytics")
+    parser.add_argument("--cache", metavar="PATH",
+                        help="SQLite result cache; only days missing from it are fetched")
+    parser.add_argument("--capture", choices=CAPTURE_MODES, default="on_error",
+                        help="Which fetches save screenshots and page source")
+    parser.add_argument("--sample-rate", type=float, default=0.05,
+                        help="Share of fetches fully captured with --capture sampled")
+    parser.add_argument("--artifacts-dir", default="artifacts",
+                        help="Folder that receives one subfolder of screenshots per captured fetch")
+    parser.add_argument("--chunk", choices=CHUNK_SIZES,
+                        help="Split long date ranges into calendar chunks fetched in parallel")
+    parser.add_argument("--chunk-attempts", type=int, default=DEFAULT_CHUNK_ATTEMPTS,
+                        help="Tries per chunk before it is reported as failed")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Fetch MOSDAC soil wetness index data without prompts.",
+        epilog="Exit codes: 0 all ok, 1 the query or some jobs failed, 2 bad usage or input, 130 interrupted.")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="warning",
+                        help="Least severe log records to write to stderr")
+    parser.add_argument("--log-format", choices=LOG_FORMATS, default="json",
+                        help="Write log records as JSON lines or plain text")
+    parser.add_argument("--summary", metavar="PATH",
+                        help="Append a JSON summary line (status, counts, timings) for the run to this file")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+
+    query = commands.add_parser("query", help="Fetch one point and date range")
+    query.add_argument("longitude")
+    query.add_argument("latitude")
+    query.add_argument("start_date", help="DD/MM/YYYY")
+    query.add_argument("end_date", help="DD/MM/YYYY")
+    _add_fetch_options(query)
+    query.add_argument("-f", "--format", choices=QUERY_FORMATS, default="json",
+                       help="json: the whole result; jsonl or csv: one row per day")
+    query.add_argument("-o", "--output", default="-", help="File to write, or - for stdout")
+    query.set_defaults(handler=cmd_query)
+
+    batch = commands.add_parser("batch", help="Run the jobs of a CSV or JSONL file, or of stdin")
+    batch.add_argument("jobs_file", help="CSV or JSONL file with longitude, latitude, start_date, end_date, "
+                                         "or - to read jobs from stdin")
+    _add_fetch_options(batch)
+    batch.add_argument("-o", "--output", default="batch_results.jsonl",
+                       help="JSONL file to append per-job results to")
+    batch.add_argument("--recycle-after", type=int, default=50, help="Replace each browser after this many jobs")
+    batch.add_argument("--no-dedupe", action="store_true",
+                       help="Fetch every job as given instead of merging jobs in the same grid pixel")
+    batch.add_argument("--sink", action="append", default=[], metavar="TARGET",
+                       help="Stream daily observations and job records to a .csv, .sqlite, .jsonl "
+                            "or .parquet target, or - for stdout (repeatable)")
+    batch.add_argument("--queue", metavar="PATH", help="SQLite job queue to checkpoint progress in")
+    batch.add_argument("-p", "--processes", type=int, nargs="?", const=0, metavar="N",
+                       help="Run in N worker processes (default N: half the CPU cores)")
+    batch.add_argument("--metrics", metavar="PATH", help="Append a trace record per fetch to this JSONL file")
+    batch.set_defaults(handler=cmd_batch)
+
+    cache = commands.add_parser("cache", help="Inspect or clean the result and locator caches")
+    cache.add_argument("action", choices=("info", "evict", "clear", "clear-locators"),
+                       help="info: size and counters; evict: drop stale and excess rows; clear: empty the "
+                            "result cache; clear-locators: forget the cached form selectors")
+    cache.add_argument("--cache", metavar="PATH", help="Result cache file (default: ~/.mosdac_swi_cache.sqlite)")
+    cache.add_argument("--locators", metavar="PATH",
+                       help="Locator cache file (default: ~/.mosdac_swi_locators.json)")
+    cache.set_defaults(handler=cmd_cache)
+
+    # Everything after "bench" (including --help) is left for benchmark_suite's own parser
+    bench = commands.add_parser("bench", help="Run benchmark_suite.py; the remaining arguments are passed on",
+                                add_help=False)
+    bench.set_defaults(handler=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    """
+    Run one command and return its exit code.
+
+    Results and summaries go to stdout as JSON, logs to stderr, and nothing
+    asks for input, so the CLI can be scheduled or run from scripts and
+    pipelines. Selenium, requests and pandas are only imported by the
+    commands that need them.
+    """
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == "bench":
+        args.bench_args = extra
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    configure_logging(args.log_level, args.log_format)
+    try:
+        return args.handler(args)
+    except UsageError as e:
+        log.error(str(e))
+        _write_summary(args.summary, {"command": args.command, "status": "invalid", "error": str(e)})
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        log.error("Interrupted")
+        _write_summary(args.summary, {"command": args.command, "status": "interrupted"})
+        return EXIT_INTERRUPTED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from swi_series import DATE_FORMATS, find_columns
+
+# Columns of the long format: one row per point and day
+LONG_COLUMNS = ["date", "lon", "lat", "swi"]
+
+
+def _parse_dates(text):
+    """Parse a Series of date strings, trying each known format on the cells still unparsed."""
+    dates = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+    text = text.str.strip()
+    for fmt in DATE_FORMATS:
+        missing = dates.isna()
+        if not missing.any():
+            break
+        dates[missing] = pd.to_datetime(text[missing], format=fmt, errors="coerce")
+    return dates
+
+
+def _parse_numbers(text):
+    """Parse a Series of numeric strings (thousands separators allowed); anything else becomes NaN."""
+    cleaned = text.str.replace(",", "", regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors="coerce").astype("float64")
+
+
+def _parse_unique(cells, parse):
+    """
+    Parse each distinct cell once and spread the results back.
+
+    Many points share the same dates (and often the same values), so this
+    parses far fewer strings than there are cells.
+    """
+    codes, uniques = pd.factorize(pd.Series(cells, dtype="object"))
+    parsed = parse(pd.Series(uniques, dtype="object").astype(str)).to_numpy()
+    result = parsed.take(np.where(codes < 0, 0, codes)) if len(parsed) else np.empty(len(codes), parsed.dtype)
+    missing = np.datetime64("NaT") if parsed.dtype.kind == "M" else np.nan
+    result[codes < 0] = missing
+    return result
+
+
+def results_to_long(results):
+    """
+    Collect the daily values of many scraper results into one typed table.
+
+    The raw cells of every table are gathered first and converted in one
+    vectorised pass (numbers with pd.to_numeric, dates format by format),
+    parsing each distinct string once, instead of parsing each cell in
+    Python. Results without a usable table fall back to their first chart
+    series, as swi_series does.
+
+    Args:
+        results (iterable): (longitude, latitude, data) tuples, data being a
+            result from scrape_soil_wetness_data, the HTTP backend or the cache
+
+    Returns:
+        DataFrame: Columns date (datetime64), lon, lat and swi (float64),
+        sorted by point and date. Days without a value are left out, and a
+        point's day seen twice keeps the later value.
+    """
+    dates, values, lons, lats = [], [], [], []
+    charts = []
+    for longitude, latitude, data in results:
+        table = data.get("table") or {}
+        date_col, value_col = find_columns(table)
+        rows = [row for row in table.get("data") or []
+                if date_col is not None and value_col is not None and len(row) > max(date_col, value_col)]
+        if rows:
+            dates += [row[date_col] for row in rows]
+            values += [row[value_col] for row in rows]
+            lons += [float(longitude)] * len(rows)
+            lats += [float(latitude)] * len(rows)
+        elif data.get("chart_series"):
+            points = data["chart_series"][0]["points"]
+            charts.append(pd.DataFrame({"date": pd.to_datetime([day for day, _ in points]),
+                                        "lon": float(longitude), "lat": float(latitude),
+                                        "swi": pd.to_numeric([value for _, value in points], errors="coerce")}))
+
+    frame = pd.DataFrame({
+        "date": pd.Series(_parse_unique(dates, _parse_dates), dtype="datetime64[ns]"),
+        "lon": np.asarray(lons, dtype="float64"),
+        "lat": np.asarray(lats, dtype="float64"),
+        "swi": pd.Series(_parse_unique(values, _parse_numbers), dtype="float64"),
+    })
+    frame = pd.concat([frame] + charts, ignore_index=True) if charts else frame
+    frame = frame.dropna(subset=["date", "swi"])
+    frame = frame.drop_duplicates(subset=["lon", "lat", "date"], keep="last")
+    return frame.sort_values(["lon", "lat", "date"]).reset_index(drop=True)[LONG_COLUMNS]
+
+
+def read_batch_results(path):
+    """
+    Load the successful jobs of a batch_results.jsonl file as a long table.
+
+    Args:
+        path (str): JSONL file written by batch_scrape.run_batch
+
+    Returns:
+        DataFrame: See results_to_long
+    """
+    def results():
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("status") == "ok":
+                    yield record["longitude"], record["latitude"], record.get("data") or {}
+    return results_to_long(results())
+
+
+def to_wide(long_frame):
+    """
+    Pivot a long table into a daily, date-indexed frame with one column per point.
+
+    Every calendar day between the first and last observation gets a row,
+    so missing days show up as NaN.
+
+    Args:
+        long_frame (DataFrame): Columns date, lon, lat and swi (see
+            results_to_long, or parquet_sink.read_swi)
+
+    Returns:
+        DataFrame: DatetimeIndex "date" at daily frequency, columns a
+        (lon, lat) MultiIndex, float64 values
+    """
+    series = long_frame.drop_duplicates(subset=["date", "lon", "lat"], keep="last").set_index(
+        ["date", "lon", "lat"])["swi"]
+    wide = series.unstack(["lon", "lat"]).sort_index(axis=1)
+    if wide.empty:
+        return wide
+    wide = wide.asfreq("D")
+    wide.index.name = "date"
+    return wide.astype("float64")
+
+
+def to_long(wide):
+    """Turn a wide frame back into the long table (date, lon, lat, swi), leaving out NaN."""
+    long_frame = wide.stack(["lon", "lat"]).rename("swi").reset_index()
+    return long_frame.dropna(subset=["swi"])[LONG_COLUMNS].reset_index(drop=True)
+
+
+def resample(wide, rule="W", how="mean"):
+    """
+    Aggregate every point's series to a coarser period.
+
+    Args:
+        wide (DataFrame): Daily frame from to_wide
+        rule (str): pandas offset alias, e.g. "W" (weekly) or "MS" (monthly)
+        how (str): Aggregation, e.g. "mean", "min", "max" or "median"
+
+    Returns:
+        DataFrame: One row per period; periods without any value are NaN
+    """
+    return getattr(wide.resample(rule), how)()
+
+
+def _gap_lengths(mask):
+    """For a 2D boolean array of missing days, the length of the run each missing day is in (0 elsewhere)."""
+    counts = mask.cumsum(axis=0)
+    # Consecutive missing days up to and including each row, then from each row on
+    forward = counts - np.maximum.accumulate(np.where(mask, 0, counts), axis=0)
+    flipped = mask[::-1]
+    counts = flipped.cumsum(axis=0)
+    backward = (counts - np.maximum.accumulate(np.where(flipped, 0, counts), axis=0))[::-1]
+    return np.where(mask, forward + backward - 1, 0)
+
+
+def find_gaps(wide):
+    """
+    List every run of missing days, for all points at once.
+
+    Args:
+        wide (DataFrame): Daily frame from to_wide
+
+    Returns:
+        DataFrame: One row per gap with lon, lat, start, end, days and
+        edge (True when the gap runs to the start or end of the frame, so
+        there is no value on one side to interpolate from)
+    """
+    mask = wide.isna().to_numpy().T
+    padded = np.pad(mask.astype(np.int8), ((0, 0), (1, 1)))
+    steps = np.diff(padded, axis=1)
+    # Rows of argwhere come out ordered by point, then day, so starts and ends pair up
+    starts = np.argwhere(steps == 1)
+    ends = np.argwhere(steps == -1)[:, 1] - 1
+    return pd.DataFrame({
+        "lon": wide.columns.get_level_values("lon")[starts[:, 0]],
+        "lat": wide.columns.get_level_values("lat")[starts[:, 0]],
+        "start": wide.index[starts[:, 1]],
+        "end": wide.index[ends],
+        "days": ends - starts[:, 1] + 1,
+        "edge": (starts[:, 1] == 0) | (ends == len(wide.index) - 1),
+    })
+
+
+def fill_gaps(wide, max_gap=3, method="time"):
+    """
+    Interpolate short runs of missing days, leaving longer gaps missing.
+
+    Only gaps with a value on both sides and at most max_gap days long are
+    filled, and they are filled completely (a longer gap is not partly
+    filled, which pandas' limit argument would do).
+
+    Args:
+        wide (DataFrame): Daily frame from to_wide
+        max_gap (int): Longest gap, in days, to fill
+        method (str): pandas interpolation method, e.g. "time" or "linear"
+
+    Returns:
+        DataFrame: Copy of wide with the short gaps filled
+    """
+    mask = wide.isna().to_numpy()
+    fillable = mask & (_gap_lengths(mask) <= max_gap)
+    interpolated = wide.interpolate(method=method, limit_area="inside")
+    return wide.mask(fillable, interpolated)
+
+
+def rolling_anomaly(wide, window=30, standardize=False, min_periods=None):
+    """
+    Deviation of each day from its centred rolling mean.
+
+    Args:
+        wide (DataFrame): Daily frame from to_wide
+        window (int): Window length in days
+        standardize (bool): Divide by the rolling standard deviation
+            (a rolling z-score)
+        min_periods (int, optional): Values a window needs; default half
+            the window
+
+    Returns:
+        DataFrame: Same shape as wide
+    """
+    rolling = wide.rolling(window, center=True, min_periods=min_periods or max(1, window // 2))
+    anomaly = wide - rolling.mean()
+    if standardize:
+        anomaly = anomaly / rolling.std()
+    return anomaly
+
+
+def _period_keys(index, period):
+    if period == "dayofyear":
+        return index.dayofyear
+    if period == "month":
+        return index.month
+    raise ValueError(f"Unknown climatology period {period!r}; expected 'dayofyear' or 'month'")
+
+
+def climatology(wide, period="dayofyear", how="mean"):
+    """
+    Per-point climatology: every point's average value for each day of year or month.
+
+    Args:
+        wide (DataFrame): Daily frame from to_wide, ideally several years
+        period (str): "dayofyear" or "month"
+        how (str): Aggregation, e.g. "mean" or "median"
+
+    Returns:
+        DataFrame: Index 1-366 (or 1-12), one column per point
+    """
+    keys = _period_keys(wide.index, period)
+    return getattr(wide.groupby(keys), how)().rename_axis(period)
+
+
+def climatology_anomaly(wide, clim=None, period="dayofyear"):
+    """
+    Deviation of each day from the point's climatology for that day of year or month.
+
+    Args:
+        wide (DataFrame): Daily frame from to_wide
+        clim (DataFrame, optional): Climatology to compare against (e.g.
+            from a longer record); computed from wide if omitted
+        period (str): "dayofyear" or "month"
+
+    Returns:
+        DataFrame: Same shape as wide
+    """
+    if clim is None:
+        clim = climatology(wide, period)
+    baseline = clim.reindex(index=_period_keys(wide.index, period), columns=wide.columns)
+    return wide - baseline.to_numpy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn batch results into a typed SWI series per point, "
+                                                 "with optional gap filling and resampling.")
+    parser.add_argument("results", help="batch_results.jsonl written by batch_scrape.py")
+    parser.add_argument("-o", "--output", default="swi_series.csv",
+                        help="CSV file to write (long format: date, lon, lat, swi)")
+    parser.add_argument("--fill-gaps", type=int, default=0, metavar="DAYS",
+                        help="Interpolate gaps of up to this many days")
+    parser.add_argument("--resample", metavar="RULE", help="Aggregate to a coarser period, e.g. W or MS")
+    parser.add_argument("--gaps", metavar="PATH", help="Also write a CSV listing every gap")
+    args = parser.parse_args()
+
+    wide = to_wide(read_batch_results(args.results))
+    print(f"Loaded {wide.shape[1]} points over {wide.shape[0]} days")
+    if args.gaps:
+        gaps = find_gaps(wide)
+        gaps.to_csv(args.gaps, index=False)
+        print(f"Found {len(gaps)} gaps ({int(gaps['days'].sum()) if len(gaps) else 0} missing days)")
+    if args.fill_gaps:
+        wide = fill_gaps(wide, args.fill_gaps)
+    if args.resample:
+        wide = resample(wide, args.resample)
+    to_long(wide).to_csv(args.output, index=False)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+from datetime import datetime
+
+# Date formats seen in SWI tables, tried in order
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%Y/%m/%d", "%d %b %Y", "%d-%b-%Y", "%Y-%m-%dT%H:%M:%S")
+
+# Header words that identify the soil wetness column
+VALUE_HEADER_HINTS = ("swi", "wetness", "soil", "index", "value")
+
+
+def parse_date(text):
+    """
+    Parse a date cell in any of the known formats.
+
+    Args:
+        text (str): Cell text
+
+    Returns:
+        date or None: The parsed date, or None if the text is not a date
+    """
+    text = str(text).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_float(text):
+    """Parse a numeric cell, returning None for blanks and non-numbers."""
+    try:
+        return float(str(text).replace(",", "").strip())
+    except ValueError:
+        return None
+
+
+def find_columns(table):
+    """
+    Work out which columns of a table hold the date and the SWI value.
+
+    The date column is the first one whose first data cell parses as a
+    date. The value column is the first numeric column whose header looks
+    like an SWI/wetness header, or failing that the first numeric column.
+
+    Args:
+        table (dict): Table dict with headers and data
+
+    Returns:
+        tuple: (date_column, value_column), either of which may be None
+    """
+    rows = table.get("data") or []
+    headers = [str(h).lower() for h in (table.get("headers") or [])]
+    if not rows:
+        return None, None
+    sample = rows[0]
+
+    date_col = next((i for i, cell in enumerate(sample) if parse_date(cell)), None)
+    numeric = [i for i, cell in enumerate(sample) if i != date_col and parse_float(cell) is not None]
+    value_col = next((i for i in numeric if i < len(headers) and any(h in headers[i] for h in VALUE_HEADER_HINTS)),
+                     numeric[0] if numeric else None)
+    return date_col, value_col
+
+
+def table_to_daily_values(table):
+    """
+    Convert a scraped table into (date, value) pairs.
+
+    Rows whose date can't be parsed are skipped; rows with a blank or
+    non-numeric value keep the date with a value of None.
+
+    Args:
+        table (dict): Table dict with headers and data
+
+    Returns:
+        list: (date, float or None) tuples sorted by date
+    """
+    date_col, value_col = find_columns(table or {})
+    if date_col is None or value_col is None:
+        return []
+
+    values = {}
+    for row in table["data"]:
+        if len(row) <= max(date_col, value_col):
+            continue
+        day = parse_date(row[date_col])
+        if day is not None:
+            values[day] = parse_float(row[value_col])
+    return sorted(values.items())
+
+
+def daily_values_to_table(values):
+    """
+    Build a table dict (as returned by the scrapers) from (date, value) pairs.
+
+    Args:
+        values (list): (date, float or None) tuples
+
+    Returns:
+        dict: Table dict with table_index, headers and data
+    """
+    return {
+        "table_index": 0,
+        "headers": ["Date", "SWI"],
+        "data": [[day.strftime("%d/%m/%Y"), "" if value is None else str(value)] for day, value in values],
+    }
+
+
+def chart_series_to_daily_values(series):
+    """Convert a chart series from extract_chart_series into (date, value) pairs."""
+    return [(datetime.strptime(day, "%Y-%m-%d").date(), value) for day, value in series["points"]]
+
+
+def result_to_daily_values(data):
+    """
+    Get the daily SWI values out of a scraper result.
+
+    Uses the primary table when it has dated rows, and otherwise the first
+    chart series.
+
+    Args:
+        data (dict): Result from scrape_soil_wetness_data or the HTTP backend
+
+    Returns:
+        list: (date, float or None) tuples sorted by date
+    """
+    values = table_to_daily_values(data.get("table"))
+    if not values and data.get("chart_series"):
+        values = chart_series_to_daily_values(data["chart_series"][0])
+    return values
@@ -0,0 +1,268 @@
+import time
+
+from selenium.common.exceptions import NoAlertPresentException, TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from logs import get_logger
+
+log = get_logger("waits")
+
+# Upper bounds in seconds for each readiness condition. Every wait returns
+# as soon as its condition holds, so these only matter when the page is slow
+# or the condition never becomes true.
+DEFAULT_TIMEOUTS = {
+    "page_load": 30,
+    "panel": 10,
+    "date_picker": 3,
+    "alert": 3,
+    "results": 30,
+}
+
+POLL_INTERVAL = 0.2
+# Seconds the result counts must stay unchanged before the results count as
+# loaded, so a table that is still streaming in isn't read half-way
+RESULTS_SETTLE = 0.5
+
+# Counts what shows a result has been rendered: data rows of tables and the
+# data points held by the charting libraries extractors.CHART_SERIES_SCRIPT
+# reads (or bound to SVG elements by d3). Anything inside a map widget is
+# left out, since markers and paths appear there whenever the map is
+# clicked or panned.
+_RESULT_SNAPSHOT_JS = """
+    var MAPS = '.leaflet-container, .ol-viewport, .mapboxgl-map, .gm-style';
+    function outsideMap(el) { return !el.closest(MAPS); }
+    var rows = 0, points = 0;
+    document.querySelectorAll('table tr').forEach(function (row) {
+        if (row.querySelector('td') && outsideMap(row)) rows++;
+    });
+    try {
+        if (window.Highcharts && Highcharts.charts) {
+            Highcharts.charts.forEach(function (chart) {
+                if (!chart) return;
+                chart.series.forEach(function (s) { points += ((s.options && s.options.data) || []).length; });
+            });
+        }
+    } catch (e) {}
+    try {
+        if (window.Chart && Chart.instances) {
+            Object.keys(Chart.instances).forEach(function (key) {
+                var chart = Chart.instances[key];
+                var cfg = chart.data || (chart.config && chart.config.data) || {};
+                (cfg.datasets || []).forEach(function (ds) { points += (ds.data || []).length; });
+            });
+        }
+    } catch (e) {}
+    try {
+        document.querySelectorAll('.js-plotly-plot').forEach(function (el) {
+            (el.data || []).forEach(function (trace) { points += (trace.y || []).length; });
+        });
+    } catch (e) {}
+    try {
+        if (window.echarts) {
+            document.querySelectorAll('[_echarts_instance_]').forEach(function (el) {
+                (echarts.getInstanceByDom(el).getOption().series || []).forEach(function (s) {
+                    points += (s.data || []).length;
+                });
+            });
+        }
+    } catch (e) {}
+    document.querySelectorAll('svg circle, svg rect, svg path').forEach(function (el) {
+        if (el.__data__ !== undefined && el.__data__ !== null && outsideMap(el)) points++;
+    });
+    return {rows: rows, points: points};
+"""
+
+_VISIBLE_INPUTS_JS = """
+    var count = 0;
+    var inputs = document.querySelectorAll('input');
+    for (var i = 0; i < inputs.length; i++) {
+        if (inputs[i].type !== 'hidden' && inputs[i].offsetParent !== null) count++;
+    }
+    return count;
+"""
+
+
+def resolve_timeouts(overrides=None):
+    """
+    Merge caller supplied timeouts with the defaults.
+
+    Args:
+        overrides (dict, optional): Step name to timeout in seconds
+
+    Returns:
+        dict: Timeout for every known step
+    """
+    timeouts = dict(DEFAULT_TIMEOUTS)
+    if overrides:
+        timeouts.update(overrides)
+    return timeouts
+
+
+class StepTimer:
+    """Records how long each step of a scraping job takes, and counts notable events (fallbacks, alerts)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.steps = {}
+        self.counters = {}
+
+    def mark(self, name):
+        """
+        Close the current step and start the next one.
+
+        Args:
+            name (str): Name of the step that just finished
+
+        Returns:
+            float: Seconds spent in that step
+        """
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.steps[name] = round(self.steps.get(name, 0.0) + elapsed, 3)
+        return elapsed
+
+    def add(self, name, seconds):
+        """
+        Add time to a named timing without closing the current step.
+
+        For time that overlaps the steps, such as recoveries.
+
+        Args:
+            name (str): Timing name
+            seconds (float): Seconds to add
+        """
+        self.steps[name] = round(self.steps.get(name, 0.0) + seconds, 3)
+
+    def count(self, name, amount=1):
+        """
+        Count an event, such as a fallback being used or an alert.
+
+        Args:
+            name (str): Event name
+            amount (int): How many times it happened
+        """
+        if amount:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def as_dict(self):
+        """Return per-step seconds plus the total so far."""
+        timings = dict(self.steps)
+        timings["total"] = round(time.perf_counter() - self.started, 3)
+        return timings
+
+    def report(self):
+        """Log per-step timings, slowest first, as one line."""
+        timings = self.as_dict()
+        total = timings.pop("total")
+        steps = ", ".join(f"{name} {seconds:.2f}s"
+                          for name, seconds in sorted(timings.items(), key=lambda item: -item[1]))
+        log.info(f"Step timings (total {total:.2f}s): {steps}", extra={"fields": {"timings": self.as_dict()}})
+
+
+def wait_for(driver, condition, timeout, description="condition", quiet=False):
+    """
+    Wait until a condition holds, returning as soon as it does.
+
+    Args:
+        driver (WebDriver): Browser to poll
+        condition (callable): Takes the driver and returns a truthy value when satisfied
+        timeout (float): Maximum seconds to wait
+        description (str): Used in the message logged on timeout
+        quiet (bool): Don't log on timeout, for conditions that are
+            usually expected not to happen (such as alerts)
+
+    Returns:
+        The condition's truthy return value, or None if it timed out
+    """
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(condition)
+    except TimeoutException:
+        if not quiet:
+            log.warning(f"Timed out after {timeout}s waiting for {description}")
+        return None
+
+
+def page_ready(driver):
+    """
+    Condition: the document has finished loading.
+
+    With the eager page-load strategy (the fast browser profile) a parsed
+    DOM is enough; subresources that are still loading are not waited for.
+    """
+    state = driver.execute_script("return document.readyState")
+    if state == "complete":
+        return True
+    capabilities = getattr(driver, "capabilities", None) or {}
+    return state == "interactive" and capabilities.get("pageLoadStrategy") == "eager"
+
+
+def panel_expanded(min_inputs=2):
+    """Condition: the Time Series panel shows at least min_inputs visible input fields."""
+    def condition(driver):
+        return driver.execute_script(_VISIBLE_INPUTS_JS) >= min_inputs
+    return condition
+
+
+def snapshot_results(driver):
+    """
+    Count the table data rows and chart data points currently on the page.
+
+    Taken before submitting the form so that results_populated can tell new
+    results apart from whatever the page showed already.
+    """
+    return driver.execute_script(_RESULT_SNAPSHOT_JS)
+
+
+def results_populated(baseline, settle=RESULTS_SETTLE):
+    """
+    Condition: table rows or chart data have appeared since the baseline snapshot and stopped changing.
+
+    Args:
+        baseline (dict): snapshot_results() taken before submitting
+        settle (float): Seconds the counts must stay the same once they
+            have grown; 0 returns as soon as anything new appears
+
+    Returns:
+        callable: Condition returning the snapshot once results are in
+    """
+    last = {"snapshot": None, "since": 0.0}
+
+    def condition(driver):
+        current = snapshot_results(driver)
+        if not any(current[key] > baseline.get(key, 0) for key in current):
+            last["snapshot"] = None
+            return False
+        now = time.perf_counter()
+        if current != last["snapshot"]:
+            last["snapshot"], last["since"] = current, now
+        return current if now - last["since"] >= settle else False
+    return condition
+
+
+def alert_present(driver):
+    """Condition: a JavaScript alert is open. Returns the alert."""
+    try:
+        alert = driver.switch_to.alert
+        alert.text
+        return alert
+    except NoAlertPresentException:
+        return False
+
+
+def submit_outcome(baseline):
+    """
+    Condition for the moment after submitting: an alert or new results.
+
+    Returns ("alert", alert) or ("results", snapshot), whichever shows up first.
+    """
+    def condition(driver):
+        alert = alert_present(driver)
+        if alert:
+            return ("alert", alert)
+        populated = results_populated(baseline, settle=0)(driver)
+        if populated:
+            return ("results", populated)
+        return False
+    return condition
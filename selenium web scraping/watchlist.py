@@ -0,0 +1,341 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from grid import validate_coordinates
+from logs import LOG_FORMATS, LOG_LEVELS, configure_logging, get_logger
+from pipeline import JOB, OBSERVATION
+
+log = get_logger("watchlist")
+
+DEFAULT_WATCHLIST_PATH = os.path.join(os.path.expanduser("~"), ".mosdac_swi_watchlist.sqlite")
+DEFAULT_OUTPUT_DIR = "watch_output"
+# A day's SWI is published after the day ends, so the newest days asked for
+# stop this many days before today
+DEFAULT_LAG_DAYS = 1
+
+
+def _parse_day(text):
+    return datetime.strptime(text, "%d/%m/%Y").date()
+
+
+def load_points(path):
+    """
+    Read points to watch from a CSV or JSONL file.
+
+    Each point needs longitude, latitude and start_date (DD/MM/YYYY, the
+    first day to fetch). An optional point_id (or job_id) names it;
+    otherwise points are named after their coordinates.
+
+    Args:
+        path (str): Path to a .csv or .jsonl file
+
+    Returns:
+        list: Point dicts with point_id, longitude, latitude and start_date
+    """
+    if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+
+    points = []
+    for row in rows:
+        longitude, latitude = str(row.get("longitude", "")).strip(), str(row.get("latitude", "")).strip()
+        point_id = str(row.get("point_id") or row.get("job_id") or f"{longitude}_{latitude}").strip()
+        points.append({"point_id": point_id, "longitude": longitude, "latitude": latitude,
+                       "start_date": str(row.get("start_date", "")).strip()})
+    return points
+
+
+class WatchList:
+    """
+    Points monitored day by day, and the last day already fetched for each.
+
+    Stored in SQLite next to the result cache and job queue. A point's
+    last_fetched date only moves forward, and only once that day's value
+    has been written to the point's output.
+    """
+
+    def __init__(self, path=DEFAULT_WATCHLIST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS points (
+                point_id TEXT PRIMARY KEY,
+                longitude TEXT NOT NULL,
+                latitude TEXT NOT NULL,
+                start_date TEXT NOT NULL,
+                last_fetched TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def add(self, point_id, longitude, latitude, start_date):
+        """
+        Start watching a point. A point already on the list is left as it is.
+
+        Args:
+            point_id (str): Name of the point, used as the job id and in logs
+            longitude (str): Longitude value
+            latitude (str): Latitude value
+            start_date (str): First day to fetch, DD/MM/YYYY
+
+        Returns:
+            bool: True if the point was added
+
+        Raises:
+            ValueError: If the coordinates or the date are invalid
+        """
+        problem = validate_coordinates(longitude, latitude)
+        if problem:
+            raise ValueError(f"Point {point_id}: {problem}")
+        try:
+            first_day = _parse_day(start_date)
+        except ValueError:
+            raise ValueError(f"Point {point_id}: invalid start_date (expected DD/MM/YYYY): {start_date}")
+        with self._lock:
+            added = self._conn.execute(
+                "INSERT OR IGNORE INTO points (point_id, longitude, latitude, start_date, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (point_id, longitude, latitude, first_day.isoformat(), time.time())
+            ).rowcount
+            self._conn.commit()
+        return bool(added)
+
+    def remove(self, point_id):
+        """Stop watching a point. Returns True if it was on the list."""
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM points WHERE point_id = ?", (point_id,)).rowcount
+            self._conn.commit()
+        return bool(removed)
+
+    def points(self):
+        """Return every watched point with its start_date and last_fetched (ISO dates)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT point_id, longitude, latitude, start_date, last_fetched FROM points ORDER BY point_id"
+            ).fetchall()
+        return [{"point_id": point_id, "longitude": longitude, "latitude": latitude,
+                 "start_date": start_date, "last_fetched": last_fetched}
+                for point_id, longitude, latitude, start_date, last_fetched in rows]
+
+    def last_fetched(self, point_id):
+        """Return the last day fetched for a point as an ISO date string, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT last_fetched FROM points WHERE point_id = ?", (point_id,)).fetchone()
+        return row[0] if row else None
+
+    def mark_fetched(self, point_id, day):
+        """Move a point's last_fetched date forward to day (ISO date string); never back."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE points SET last_fetched = ?, updated_at = ? "
+                "WHERE point_id = ? AND (last_fetched IS NULL OR last_fetched < ?)",
+                (day, time.time(), point_id, day)
+            )
+            self._conn.commit()
+
+    def due_jobs(self, until):
+        """
+        Build the jobs that bring every point up to a day.
+
+        Args:
+            until (date): Last day to fetch
+
+        Returns:
+            list: Job dicts (see jobs.load_jobs) covering the day after each
+            point's last_fetched (or its start_date) to until. Points already
+            up to date get no job.
+        """
+        jobs = []
+        for point in self.points():
+            if point["last_fetched"]:
+                first = date.fromisoformat(point["last_fetched"]) + timedelta(days=1)
+            else:
+                first = date.fromisoformat(point["start_date"])
+            if first <= until:
+                jobs.append({"job_id": point["point_id"], "longitude": point["longitude"],
+                             "latitude": point["latitude"], "start_date": first.strftime("%d/%m/%Y"),
+                             "end_date": until.strftime("%d/%m/%Y")})
+        return jobs
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def point_output_path(output_dir, longitude, latitude):
+    """Return the CSV a point's days are appended to: one stable folder per point, no timestamp."""
+    return os.path.join(output_dir, f"soil_wetness_data_{longitude}_{latitude}", "table_data.csv")
+
+
+class WatchOutput:
+    """
+    Pipeline sink that appends each point's new days to its own CSV.
+
+    Observation records are held per job until the job's record arrives.
+    If the job succeeded, the days after the point's last_fetched date are
+    appended in date order and last_fetched moves to the newest of them, so
+    an interrupted run never skips a day and a rerun never writes one twice.
+    """
+
+    def __init__(self, watchlist, output_dir=DEFAULT_OUTPUT_DIR):
+        self.watchlist = watchlist
+        self.output_dir = output_dir
+        self.rows_appended = 0
+        self.points_updated = 0
+        self._pending = {}
+
+    def write(self, record):
+        if record["type"] == OBSERVATION:
+            self._pending.setdefault(record["job_id"], []).append((record["date"], record["swi"]))
+            return
+        if record["type"] != JOB:
+            return
+        point_id = record.get("job_id")
+        rows = self._pending.pop(point_id, [])
+        if record.get("status") != "ok" or not rows:
+            return
+        last = self.watchlist.last_fetched(point_id)
+        new_rows = sorted(row for row in dict(rows).items() if last is None or row[0] > last)
+        if not new_rows:
+            return
+
+        path = point_output_path(self.output_dir, record["longitude"], record["latitude"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["Date", "SWI"])
+            writer.writerows([date.fromisoformat(day).strftime("%d/%m/%Y"), value] for day, value in new_rows)
+        self.watchlist.mark_fetched(point_id, new_rows[-1][0])
+        self.rows_appended += len(new_rows)
+        self.points_updated += 1
+        log.info(f"Appended {len(new_rows)} days to {path}",
+                 extra={"fields": {"job_id": point_id, "last_fetched": new_rows[-1][0]}})
+
+    def close(self):
+        pass
+
+
+def update_watchlist(watchlist, output_dir=DEFAULT_OUTPUT_DIR, until=None, lag_days=DEFAULT_LAG_DAYS,
+                     **batch_options):
+    """
+    Fetch only the days each watched point is missing and append them to its output.
+
+    Every point is brought up to until (default: today minus lag_days) in
+    one batch run, so hundreds of points each missing a day or two make
+    hundreds of one- or two-day fetches, deduplicated per grid pixel.
+
+    With a result cache, days in each point's missing range that the cache
+    holds without a value are dropped from it first. Those are usually days
+    the site had not published yet, and serving them from the cache would
+    leave the point stuck behind them.
+
+    Args:
+        watchlist (WatchList): Points to update
+        output_dir (str): Folder holding one soil_wetness_data_<lon>_<lat>
+            folder per point, plus watch_runs.jsonl with each run's job results
+        until (date, optional): Last day to fetch
+        lag_days (int): Days before today to stop at when until is not given
+        **batch_options: Passed to batch_scrape.run_batch (backend,
+            pool_size, cache_path, chunk, ...)
+
+    Returns:
+        dict: The batch summary, with "watch" counting points, due points,
+        points updated and rows appended
+    """
+    until = until or date.today() - timedelta(days=lag_days)
+    watched = len(watchlist.points())
+    jobs = watchlist.due_jobs(until)
+    if not jobs:
+        log.info(f"All {watched} watched points are up to date (until {until.isoformat()})")
+        return {"jobs": 0, "watch": {"points": watched, "due": 0, "points_updated": 0, "rows_appended": 0}}
+
+    # Imported here so listing and editing the watch list doesn't load the browser stack
+    from batch_scrape import run_batch
+
+    if batch_options.get("cache_path"):
+        from result_cache import ResultCache
+        cache = ResultCache(batch_options["cache_path"])
+        try:
+            forgotten = sum(cache.forget_missing(job["longitude"], job["latitude"], job["start_date"],
+                                                 job["end_date"]) for job in jobs)
+        finally:
+            cache.close()
+        if forgotten:
+            log.info(f"Dropped {forgotten} cached days without a value so they are fetched again")
+
+    os.makedirs(output_dir, exist_ok=True)
+    output = WatchOutput(watchlist, output_dir)
+    sinks = list(batch_options.pop("sinks", ())) + [output]
+    log.info(f"Updating {len(jobs)} of {watched} watched points up to {until.isoformat()}")
+    summary = run_batch(jobs, output_path=os.path.join(output_dir, "watch_runs.jsonl"), sinks=sinks,
+                        **batch_options)
+    summary["watch"] = {"points": watched, "due": len(jobs), "points_updated": output.points_updated,
+                        "rows_appended": output.rows_appended}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep a list of points up to date, fetching only new days.")
+    parser.add_argument("--watchlist", default=DEFAULT_WATCHLIST_PATH, help="SQLite file holding the watch list")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="info")
+    parser.add_argument("--log-format", choices=LOG_FORMATS, default="text")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Watch the points in a CSV or JSONL file "
+                                          "(point_id, longitude, latitude, start_date)")
+    add.add_argument("points_file")
+    remove = commands.add_parser("remove", help="Stop watching points")
+    remove.add_argument("point_ids", nargs="+")
+    commands.add_parser("list", help="Show every point and the last day fetched for it")
+
+    update = commands.add_parser("update", help="Fetch the days each point is missing and append them")
+    update.add_argument("-o", "--output-dir", default=DEFAULT_OUTPUT_DIR,
+                        help="Folder with one output folder per point")
+    update.add_argument("--until", type=_parse_day, metavar="DD/MM/YYYY",
+                        help="Last day to fetch (default: today minus --lag-days)")
+    update.add_argument("--lag-days", type=int, default=DEFAULT_LAG_DAYS)
+    update.add_argument("--backend", choices=("browser", "http", "auto"), default="browser")
+    update.add_argument("--endpoint", metavar="URL", help="SWI data endpoint for the http and auto backends")
+    update.add_argument("-n", "--pool-size", type=int, default=2, help="Browser sessions to run at once")
+    update.add_argument("--cache", metavar="PATH", help="SQLite result cache to answer days from")
+    args = parser.parse_args()
+    configure_logging(args.log_level, args.log_format)
+
+    watchlist = WatchList(args.watchlist)
+    try:
+        if args.command == "add":
+            added = 0
+            for point in load_points(args.points_file):
+                added += watchlist.add(**point)
+            print(f"Watching {added} new points ({len(watchlist.points())} in total)")
+        elif args.command == "remove":
+            removed = sum(watchlist.remove(point_id) for point_id in args.point_ids)
+            print(f"Stopped watching {removed} points")
+        elif args.command == "list":
+            for point in watchlist.points():
+                print(json.dumps(point))
+        else:
+            summary = update_watchlist(watchlist, args.output_dir, args.until, args.lag_days,
+                                       backend=args.backend, endpoint=args.endpoint, pool_size=args.pool_size,
+                                       cache_path=args.cache)
+            print(f"Watch list updated: {summary['watch']}")
+    finally:
+        watchlist.close()
+
+
+if __name__ == "__main__":
+    main()